@@ -1,20 +1,43 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, Response, session
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, Response, session, \
+    stream_with_context, g, has_app_context, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
 from flask_migrate import Migrate
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from functools import wraps
 import os
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from io import BytesIO
-from reportlab.graphics.barcode import createBarcodeDrawing
-from reportlab.graphics.shapes import Drawing
+import sys
+import threading
+import time
+import uuid
+import click
 from dotenv import load_dotenv
 import json
 import csv
-from io import TextIOWrapper
+import logging
+import random
+import base64
+import heapq
+import itertools
+import sqlite3
+from io import BytesIO, StringIO, TextIOWrapper
+from sqlalchemy.dialects import postgresql as postgresql_dialect, sqlite as sqlite_dialect
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from pdf_renderer import render_document
+from pdf_cache import PDFCache
+from render_jobs import RenderQueue, RenderQueueFull
+from bulk_export import ExportBusy, ExportPool, ExportProgress, render_in_parallel, stream_zip
+from tiered_cache import TieredCache, store_from_url
+from sql_timing import QueryStats, QueryTimer
+import metrics
+import numpy as np
+import replenishment
+from werkzeug.utils import secure_filename
 
 # Load environment variables
 load_dotenv()
@@ -25,10 +48,247 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///erp.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['PDF_CACHE_DIR'] = os.environ.get('PDF_CACHE_DIR', os.path.join(app.instance_path, 'pdf_cache'))
+app.config['PDF_CACHE_MAX_BYTES'] = int(os.environ.get('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+app.config['IMPORT_DIR'] = os.environ.get('IMPORT_DIR', os.path.join(app.instance_path, 'imports'))
+# 'thread' runs background imports inside the web worker; 'external' leaves them for `flask resume-imports`
+app.config['IMPORT_WORKER'] = os.environ.get('IMPORT_WORKER', 'thread')
+# Render PDFs on a process pool instead of the request thread (per request with ?async=1)
+app.config['PDF_ASYNC_RENDER'] = os.environ.get('PDF_ASYNC_RENDER', '').lower() in ('1', 'true', 'yes')
+app.config['PDF_RENDER_WORKERS'] = int(os.environ.get('PDF_RENDER_WORKERS', 2))
+app.config['PDF_RENDER_QUEUE_SIZE'] = int(os.environ.get('PDF_RENDER_QUEUE_SIZE', 16))
+# Failed render jobs report their error for this many seconds, then are forgotten
+app.config['PDF_RENDER_FAILED_TTL'] = int(os.environ.get('PDF_RENDER_FAILED_TTL', 3600))
+# Bulk invoice exports share one render pool per worker process; more concurrent exports get a 503
+app.config['EXPORT_RENDER_WORKERS'] = int(os.environ.get('EXPORT_RENDER_WORKERS', 2))
+app.config['EXPORT_MAX_CONCURRENT'] = int(os.environ.get('EXPORT_MAX_CONCURRENT', 2))
+# Export progress files are deleted this many seconds after their last update
+app.config['EXPORT_PROGRESS_TTL'] = int(os.environ.get('EXPORT_PROGRESS_TTL', 3600))
+# Optional cache tier shared by all workers for settings and dropdown lists: sqlite:///path or redis://...
+app.config['CACHE_URL'] = os.environ.get('CACHE_URL', '')
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+app.config['CACHE_KEY_PREFIX'] = os.environ.get('CACHE_KEY_PREFIX', 'erp:')
+# Precomputed report summaries kept per table; the least recently computed are dropped beyond this
+app.config['SUMMARY_CACHE_MAX_ROWS'] = int(os.environ.get('SUMMARY_CACHE_MAX_ROWS', 2000))
+# Statements slower than this are logged with their parameters and EXPLAIN output (0 to disable)
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', '')
+# Show each page's query count and DB time in a footer badge
+app.config['SQL_DEBUG_TOOLBAR'] = os.environ.get('SQL_DEBUG_TOOLBAR', '').lower() in ('1', 'true', 'yes')
+# Connection pool per worker process (file SQLite and server databases; in-memory SQLite keeps one connection)
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Pragmas applied to every SQLite connection; the journal is switched to WAL so readers don't wait on commits
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+app.config['SQLITE_CACHE_SIZE_KIB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KIB', 64 * 1024))
+# Optional read replica for the reporting and export routes (see replica_read)
+REPLICA_BIND = 'replica'
+if os.environ.get('REPLICA_DATABASE_URL'):
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: os.environ['REPLICA_DATABASE_URL']}
+# After a client writes, its replica-routed reads go to the primary for this long, so it sees its own writes
+app.config['REPLICA_STICKY_SECONDS'] = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+# An unreachable replica is skipped for this long before it is tried again
+app.config['REPLICA_RETRY_SECONDS'] = float(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+# Replenishment (see compute_replenishment): demand is averaged over the window, and stock is reordered
+# to last the supplier lead time plus the cover days, with a safety margin of z standard deviations
+app.config['REPLENISH_WINDOW_DAYS'] = int(os.environ.get('REPLENISH_WINDOW_DAYS', 90))
+app.config['REPLENISH_LEAD_TIME_DAYS'] = float(os.environ.get('REPLENISH_LEAD_TIME_DAYS', 7))
+app.config['REPLENISH_COVER_DAYS'] = float(os.environ.get('REPLENISH_COVER_DAYS', 30))
+app.config['REPLENISH_SERVICE_Z'] = float(os.environ.get('REPLENISH_SERVICE_Z', 1.65))
+
+def is_file_sqlite(sa_url):
+    return sa_url.drivername.startswith('sqlite') and sa_url.database not in (None, '', ':memory:')
+
+def replica_url(app):
+    url = (app.config.get('SQLALCHEMY_BINDS') or {}).get(REPLICA_BIND)
+    return make_url(url) if url else None
+
+class RoutingSession(SignallingSession):
+    """Reads go to g.read_engine when replica_read set one; flushes and DML always go to the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        read_engine = g.get('read_engine') if has_app_context() else None
+        if read_engine is not None and not self._flushing and not isinstance(clause, UpdateBase):
+            return read_engine
+        return super().get_bind(mapper, clause)
+
+class ERPSQLAlchemy(SQLAlchemy):
+    """Pool defaults per backend, decided from the URL the engine is actually created for.
+
+    SQLALCHEMY_ENGINE_OPTIONS is applied on top of these (and to any URL), so
+    it still overrides them when set.
+    """
+
+    def create_session(self, options):
+        return sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_all(self, bind='__all__', app=None):
+        # The replica gets its tables by replicating the primary; it is not created or dropped here
+        super().create_all(bind=None if bind == '__all__' else bind, app=app)
+
+    def drop_all(self, bind='__all__', app=None):
+        super().drop_all(bind=None if bind == '__all__' else bind, app=app)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        is_replica = sa_url == replica_url(app)
+        file_sqlite = is_file_sqlite(sa_url)
+        if file_sqlite:
+            # Without a pool_size Flask-SQLAlchemy opens (and tunes) a new SQLite connection per checkout
+            options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if file_sqlite:
+            options['poolclass'] = QueuePool
+            options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+            options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+            connect_args = options.setdefault('connect_args', {})
+            # Pooled connections move between a worker's threads, one at a time
+            connect_args['check_same_thread'] = False
+            connect_args.setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+            if is_replica:
+                # Open the replica read-only: a missing file is then unreachable instead of silently created
+                sa_url = sa_url.set(database=f'file:{sa_url.database}', query={'mode': 'ro', 'uri': 'true'})
+        elif not sa_url.drivername.startswith('sqlite'):
+            options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+            options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+            # Drop connections before a server or proxy idle timeout does, and test them on checkout
+            options.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+            options.setdefault('pool_pre_ping', True)
+        return sa_url, options
 
 # Initialize extensions
-db = SQLAlchemy(app)
+db = ERPSQLAlchemy(app)
 migrate = Migrate(app, db)
+pdf_cache = PDFCache(app.config['PDF_CACHE_DIR'], app.config['PDF_CACHE_MAX_BYTES'])
+render_queue = RenderQueue(pdf_cache, max_workers=app.config['PDF_RENDER_WORKERS'],
+                           max_pending=app.config['PDF_RENDER_QUEUE_SIZE'],
+                           keep_failed=app.config['PDF_RENDER_FAILED_TTL'])
+export_pool = ExportPool(max_workers=app.config['EXPORT_RENDER_WORKERS'],
+                         max_exports=app.config['EXPORT_MAX_CONCURRENT'])
+reference_cache = TieredCache(store_from_url(app.config['CACHE_URL'], app.config['CACHE_KEY_PREFIX']),
+                              ttl=app.config['CACHE_TTL'])
+
+slow_query_logger = logging.getLogger('erp.slow_queries')
+if app.config['SLOW_QUERY_LOG']:
+    _slow_query_handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+    _slow_query_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_logger.addHandler(_slow_query_handler)
+    slow_query_logger.setLevel(logging.INFO)
+
+def current_query_stats():
+    return g.get('query_stats') if has_app_context() else None
+
+def slow_query_threshold():
+    slow_ms = app.config['SLOW_QUERY_MS']
+    return slow_ms / 1000 if slow_ms > 0 else None
+
+def log_slow_query(statement, parameters, seconds, plan):
+    endpoint = request.endpoint if has_request_context() else '-'
+    lines = [f'Slow query ({seconds * 1000:.1f} ms) in {endpoint}: {statement}',
+             f'  parameters: {repr(parameters)[:1000]}']
+    if plan:
+        lines.append('  plan:')
+        lines.extend(f'    {line}' for line in plan)
+    slow_query_logger.warning('\n'.join(lines))
+
+QueryTimer(current_query_stats, slow_query_threshold, log_slow_query).install()
+
+def sqlite_pragmas(in_memory=False):
+    pragmas = [f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+               f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}",
+               f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_SIZE_KIB']}"]
+    if not in_memory:
+        pragmas.append(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}")
+    return pragmas
+
+@db.event.listens_for(Engine, 'connect')
+def tune_sqlite_connection(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    in_memory = dbapi_connection.execute('PRAGMA database_list').fetchone()[2] == ''
+    if not in_memory:
+        try:
+            dbapi_connection.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.OperationalError:
+            pass  # a read-only replica keeps the journal mode of the copy it was given
+    for pragma in sqlite_pragmas(in_memory):
+        dbapi_connection.execute(pragma)
+
+_replica_state = {'down_until': 0.0}
+
+def replica_engine():
+    """The replica's engine when one is configured and answering, else None (read from the primary)."""
+    if replica_url(app) is None or time.monotonic() < _replica_state['down_until']:
+        return None
+    engine = db.get_engine(app, bind=REPLICA_BIND)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+    except DBAPIError as e:
+        _replica_state['down_until'] = time.monotonic() + app.config['REPLICA_RETRY_SECONDS']
+        app.logger.warning('Read replica unreachable, reading from the primary for %ss: %s',
+                           app.config['REPLICA_RETRY_SECONDS'], e.orig)
+        return None
+    return engine
+
+def replica_read(view):
+    """Serve a read-only view from the replica, which may lag the primary by a little.
+
+    Falls back to the primary when no replica is configured or it can't be
+    reached, and for clients that wrote within REPLICA_STICKY_SECONDS.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_route = True
+        if time.time() - session.get('db_write_at', 0) >= app.config['REPLICA_STICKY_SECONDS']:
+            g.read_engine = replica_engine()
+        return view(*args, **kwargs)
+    return wrapper
+
+@db.event.listens_for(Engine, 'after_cursor_execute')
+def note_database_write(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete) \
+            and has_request_context():
+        g.db_wrote = True
+
+@app.after_request
+def remember_database_write(response):
+    # Cache fills made while serving a replica-routed view don't count as the client's writes
+    if g.get('db_wrote') and not g.get('replica_route') and replica_url(app) is not None:
+        session['db_write_at'] = time.time()
+    return response
+
+@app.before_request
+def start_query_stats():
+    g.query_stats = QueryStats()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def add_server_timing(response):
+    stats = g.get('query_stats')
+    if stats is not None:
+        total_ms = (time.perf_counter() - g.request_started) * 1000
+        response.headers.add('Server-Timing', f'db;desc="{stats.count} queries";dur={stats.milliseconds:.1f}')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.1f}')
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' in g:
+        metrics.observe_request(request.endpoint or 'unmatched', request.method, response.status_code,
+                                time.perf_counter() - g.request_started,
+                                response.content_length)
+    metrics.observe_pool(db.engine.pool)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    data, content_type = metrics.latest()
+    return Response(data, content_type=content_type)
 
 # Database Models
 class Item(db.Model):
@@ -40,6 +300,20 @@ class Item(db.Model):
     hsn_sac_number = db.Column(db.String(20), nullable=True)
     tax_rate = db.Column(db.Float, nullable=True, default=0.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_item_name_id', 'name', 'id'),
+        db.Index('ix_item_stock', 'stock'),
+    )
+
+# Case-insensitive name prefix search on items (see name_prefix_filter). SQLite's LIKE can't use an
+# expression index, so it seeks a range of lower(name); on Postgres LIKE uses a text_pattern_ops index.
+ITEM_NAME_LOWER_SQLITE_DDL = 'CREATE INDEX IF NOT EXISTS ix_item_name_lower ON item (lower(name))'
+ITEM_NAME_LOWER_PG_DDL = 'CREATE INDEX IF NOT EXISTS ix_item_name_lower ON item (lower(name) text_pattern_ops)'
+
+db.event.listen(Item.__table__, 'after_create',
+                db.DDL(ITEM_NAME_LOWER_SQLITE_DDL).execute_if(dialect='sqlite'))
+db.event.listen(Item.__table__, 'after_create',
+                db.DDL(ITEM_NAME_LOWER_PG_DDL).execute_if(dialect='postgresql'))
 
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -50,6 +324,34 @@ class Customer(db.Model):
     gstin = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     bills = db.relationship('Bill', backref='customer', lazy=True)
+    __table_args__ = (
+        db.Index('ix_customer_name', 'name'),
+    )
+
+# Customer search index: an FTS5 trigram table on SQLite, a pg_trgm GIN index on Postgres.
+# Both match substrings like the old ILIKE '%q%' without scanning the customer table.
+CUSTOMER_SEARCH_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customer_search "
+    "USING fts5(name, phone, email, gstin, tokenize='trigram')"
+)
+CUSTOMER_SEARCH_PG_DOCUMENT = (
+    "(coalesce(name, '') || ' ' || coalesce(phone, '') || ' ' || "
+    "coalesce(email, '') || ' ' || coalesce(gstin, ''))"
+)
+CUSTOMER_SEARCH_PG_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_customer_search_trgm ON customer "
+    f"USING gin ({CUSTOMER_SEARCH_PG_DOCUMENT} gin_trgm_ops)"
+)
+CUSTOMER_SEARCH_LIMIT = 50
+
+db.event.listen(Customer.__table__, 'after_create',
+                db.DDL(CUSTOMER_SEARCH_SQLITE_DDL).execute_if(dialect='sqlite'))
+db.event.listen(Customer.__table__, 'after_create',
+                db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+db.event.listen(Customer.__table__, 'after_create',
+                db.DDL(CUSTOMER_SEARCH_PG_DDL).execute_if(dialect='postgresql'))
+db.event.listen(Customer.__table__, 'before_drop',
+                db.DDL('DROP TABLE IF EXISTS customer_search').execute_if(dialect='sqlite'))
 
 class Bill(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -60,11 +362,17 @@ class Bill(db.Model):
     address = db.Column(db.String(200), nullable=True)
     gstin = db.Column(db.String(50), nullable=True)
     payment_mode = db.Column(db.String(50), nullable=True)
-    invoice_number = db.Column(db.String(20), nullable=True)
+    invoice_number = db.Column(db.String(40), nullable=True)
     total_amount = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     items = db.relationship('BillItem', backref='bill', lazy=True)
     inventory_updated = db.Column(db.Boolean, default=False)
+    __table_args__ = (
+        db.Index('ix_bill_created_at_id', 'created_at', 'id'),
+        db.Index('ix_bill_customer_id_created_at', 'customer_id', 'created_at'),
+        db.Index('ix_bill_payment_mode_created_at', 'payment_mode', 'created_at'),
+        db.Index('uq_bill_invoice_number', 'invoice_number', unique=True),
+    )
 
 class BillItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -74,6 +382,10 @@ class BillItem(db.Model):
     price = db.Column(db.Float, nullable=False)
     tax_rate = db.Column(db.Float, nullable=True, default=0.0)
     item = db.relationship('Item')
+    __table_args__ = (
+        db.Index('ix_bill_item_bill_id', 'bill_id'),
+        db.Index('ix_bill_item_item_id', 'item_id'),
+    )
 
 class Quotation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,12 +395,15 @@ class Quotation(db.Model):
     email = db.Column(db.String(100), nullable=True)
     address = db.Column(db.String(200), nullable=True)
     gstin = db.Column(db.String(50), nullable=True)
-    quotation_number = db.Column(db.String(20), nullable=True)
+    quotation_number = db.Column(db.String(40), nullable=True)
     total_amount = db.Column(db.Float, nullable=False)
     valid_until = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     items = db.relationship('QuotationItem', backref='quotation', lazy=True)
     customer = db.relationship('Customer', backref='quotations')
+    __table_args__ = (
+        db.Index('uq_quotation_quotation_number', 'quotation_number', unique=True),
+    )
 
 class QuotationItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -98,6 +413,10 @@ class QuotationItem(db.Model):
     price = db.Column(db.Float, nullable=False)
     tax_rate = db.Column(db.Float, nullable=True, default=0.0)
     item = db.relationship('Item')
+    __table_args__ = (
+        db.Index('ix_quotation_item_quotation_id', 'quotation_id'),
+        db.Index('ix_quotation_item_item_id', 'item_id'),
+    )
 
 class Settings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -111,44 +430,775 @@ class Settings(db.Model):
     bank_account_number = db.Column(db.String(50), nullable=True)
     ifsc_code = db.Column(db.String(20), nullable=True)
 
+# Sales rollups, kept in step with Bill writes so the dashboard never scans bills
+class DailySales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+
+class MonthlySales(db.Model):
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+
+# Customer count and stock value for the dashboard: one row, kept in step with customer and item writes
+class DashboardTotals(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # always DASHBOARD_TOTALS_ID
+    customer_count = db.Column(db.Integer, nullable=False, default=0)
+    inventory_value = db.Column(db.Float, nullable=False, default=0.0)
+
+# Finer rollups behind /api/analytics/sales (see record_bill_analytics). Ranges read whole months from
+# the monthly tables and only their partial first and last months from the daily ones. On SQLite they are
+# WITHOUT ROWID tables, so a date range is one ordered scan of the primary key that also holds the counters.
+ROLLUP_TABLE_ARGS = {'sqlite_with_rowid': False}
+
+class DailyPaymentSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    payment_mode = db.Column(db.String(50), primary_key=True)  # '' for bills without one
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    tax_amount = db.Column(db.Float, nullable=False, default=0.0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = ROLLUP_TABLE_ARGS
+
+class DailyItemSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)  # before tax
+    __table_args__ = ROLLUP_TABLE_ARGS
+
+class MonthlyItemSales(db.Model):
+    month = db.Column(db.Date, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    __table_args__ = ROLLUP_TABLE_ARGS
+
+class DailyCustomerSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    customer_id = db.Column(db.Integer, primary_key=True)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = ROLLUP_TABLE_ARGS
+
+class MonthlyCustomerSales(db.Model):
+    month = db.Column(db.Date, primary_key=True)
+    customer_id = db.Column(db.Integer, primary_key=True)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = ROLLUP_TABLE_ARGS
+
+# One counter row per document series and period, so numbering never scans documents
+class DocumentSequence(db.Model):
+    series = db.Column(db.String(20), primary_key=True)
+    period = db.Column(db.String(7), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+class ImportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(200))
+    dry_run = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    total_rows = db.Column(db.Integer, nullable=False, default=0)  # estimated from the line count
+    # Checkpoint, committed together with each chunk's writes
+    line_num = db.Column(db.Integer, nullable=False, default=0)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    added = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    error_sample = db.Column(db.Text)
+    error_bytes = db.Column(db.Integer, nullable=False, default=0)
+    elapsed = db.Column(db.Float, nullable=False, default=0.0)
+    message = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class CacheVersion(db.Model):
+    """A counter per cached dataset; writers bump it in their transaction, readers ignore entries made under an older value."""
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductSalesSummary(db.Model):
+    item_id = db.Column(db.Integer, primary_key=True)
+    range_key = db.Column(db.String(21), primary_key=True)  # 'start:end' as YYYY-MM-DD, either may be empty
+    version = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SalesAnalyticsSummary(db.Model):
+    range_key = db.Column(db.String(21), primary_key=True)  # 'start:end' as YYYY-MM-DD
+    granularity = db.Column(db.String(5), primary_key=True)
+    top = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ItemReplenishment(db.Model):
+    """Demand and reorder figures per item from the last compute_replenishment() run."""
+    item_id = db.Column(db.Integer, primary_key=True)
+    avg_daily_demand = db.Column(db.Float, nullable=False)
+    demand_std = db.Column(db.Float, nullable=False)
+    stock = db.Column(db.Integer, nullable=False)  # when computed; the dashboard compares live stock
+    days_of_cover = db.Column(db.Float, nullable=True)  # None without demand
+    reorder_point = db.Column(db.Integer, nullable=False)
+    order_up_to = db.Column(db.Integer, nullable=False)
+    suggested_quantity = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+UPSERT_DIALECTS = {'sqlite': sqlite_dialect, 'postgresql': postgresql_dialect}
+
+def _bump_rollups(model, key_columns, rows):
+    """Add counters to rollup rows, creating missing ones; each row is a dict of its key and deltas.
+
+    On SQLite and PostgreSQL all rows go out as one INSERT ... ON CONFLICT DO UPDATE. Keys must
+    be unique within `rows` and should be sorted, so concurrent writers lock rows in the same order.
+    """
+    if not rows:
+        return
+    dialect = UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if dialect is not None:
+        insert = dialect.insert(model.__table__)
+        counters = [column for column in rows[0] if column not in key_columns]
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: model.__table__.c[column] + insert.excluded[column] for column in counters}
+        ), rows)
+        return
+    for row in rows:
+        criteria = [getattr(model, column) == row[column] for column in key_columns]
+        values = {getattr(model, column): getattr(model, column) + delta
+                  for column, delta in row.items() if column not in key_columns}
+        if model.query.filter(*criteria).update(values, synchronize_session=False):
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.add(model(**row))
+        except IntegrityError:
+            # Another request created the row between our UPDATE and INSERT
+            model.query.filter(*criteria).update(values, synchronize_session=False)
+
+def _bump_rollup(model, key, **deltas):
+    """Add `deltas` to the counters of the rollup row with primary key `key` (a dict), creating it if missing."""
+    _bump_rollups(model, list(key), [dict(key, **deltas)])
+
+def cache_version(name):
+    version = db.session.query(CacheVersion.version).filter(CacheVersion.name == name).scalar()
+    return version or 0
+
+def bump_cache_versions(names):
+    """Invalidate cached data for each name, inside the caller's transaction."""
+    _bump_rollups(CacheVersion, ['name'], [{'name': name, 'version': 1} for name in sorted(set(names))])
+
+def product_sales_changed(item_ids):
+    """Called by every write that adds, changes or removes bill lines for these items."""
+    bump_cache_versions(f'product_sales:{item_id}' for item_id in item_ids if item_id is not None)
+
+REFERENCE_DATA = ('settings', 'items', 'customers')
+
+def reference_versions():
+    """Current versions of all reference datasets, read in one query and remembered for the request."""
+    if 'reference_versions' not in g:
+        rows = db.session.query(CacheVersion.name, CacheVersion.version)\
+            .filter(CacheVersion.name.in_(REFERENCE_DATA))
+        g.reference_versions = dict.fromkeys(REFERENCE_DATA, 0)
+        g.reference_versions.update(rows)
+    return g.reference_versions
+
+def reference_data_changed(*names):
+    """Invalidate cached reference data in every worker once the caller's transaction commits."""
+    bump_cache_versions(names)
+    g.pop('reference_versions', None)
+
+def cached_reference(name, loader):
+    return reference_cache.get(name, reference_versions()[name], loader)
+
+def current_settings():
+    """The seller details from Settings as a dict, empty if none are saved."""
+    return cached_reference('settings', lambda: seller_details(Settings.query.first()))
+
+def item_choices():
+    """Items for bill and quotation dropdowns. Catalog fields only: stock moves with every sale."""
+    columns = (Item.id, Item.name, Item.description, Item.price, Item.tax_rate)
+    return cached_reference('items', lambda: [
+        row._asdict() for row in db.session.query(*columns).order_by(Item.name, Item.id)
+    ])
+
+def stock_levels():
+    """Live {item_id: stock} for the bill forms, read from the narrow ix_item_stock index."""
+    return dict(db.session.query(Item.id, Item.stock))
+
+def customer_choices():
+    """Customers for bill and quotation dropdowns."""
+    columns = (Customer.id, Customer.name, Customer.phone)
+    return cached_reference('customers', lambda: [
+        row._asdict() for row in db.session.query(*columns).order_by(Customer.name, Customer.id)
+    ])
+
+def date_bucket(column, granularity):
+    """SQL expression for the first day of the day, week (Monday) or month containing `column`."""
+    if granularity == 'day':
+        return db.func.date(column, type_=db.Date)
+    if db.engine.dialect.name == 'sqlite':
+        modifiers = {'week': ('weekday 0', '-6 days'), 'month': ('start of month',)}[granularity]
+        return db.func.date(column, *modifiers, type_=db.Date)
+    return db.cast(db.func.date_trunc(granularity, column), db.Date)
+
+def record_sales(created_at, amount, count=0):
+    """Apply a change in billed amount (and bill count) to the sales rollups."""
+    day = created_at.date()
+    _bump_rollup(DailySales, {'day': day}, total_amount=amount, bill_count=count)
+    _bump_rollup(MonthlySales, {'month': day.replace(day=1)}, total_amount=amount, bill_count=count)
+
+DASHBOARD_TOTALS_ID = 1
+
+def inventory_value(item_ids=None):
+    """sum(price * stock) over the given items, or over the whole catalog."""
+    if item_ids is not None and not item_ids:
+        return 0.0
+    query = db.session.query(db.func.coalesce(db.func.sum(Item.price * Item.stock), 0.0))
+    if item_ids is not None:
+        query = query.filter(Item.id.in_(item_ids))
+    return query.scalar()
+
+def lock_dashboard_totals():
+    """Lock the DashboardTotals row for the rest of the transaction; call before the customer or item write.
+
+    A missing row (a new or upgraded database, or after rebuild_sales_rollups) is created from the
+    tables here, so it has to see them as they were before the write. Every write that changes stock
+    value takes this lock first, which orders them, so the before/after reads in inventory_change are exact.
+    """
+    key = DashboardTotals.id == DASHBOARD_TOTALS_ID
+    if DashboardTotals.query.filter(key).update({DashboardTotals.id: DashboardTotals.id},
+                                                synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(DashboardTotals(id=DASHBOARD_TOTALS_ID, customer_count=Customer.query.count(),
+                                           inventory_value=inventory_value()))
+    except IntegrityError:
+        # Another request created it between our UPDATE and INSERT; wait for its lock
+        DashboardTotals.query.filter(key).update({DashboardTotals.id: DashboardTotals.id},
+                                                 synchronize_session=False)
+
+def dashboard_totals_changed(customers=0, value=0.0):
+    """Add to the customer count and stock value; the caller holds lock_dashboard_totals()."""
+    DashboardTotals.query.filter(DashboardTotals.id == DASHBOARD_TOTALS_ID).update({
+        DashboardTotals.customer_count: DashboardTotals.customer_count + customers,
+        DashboardTotals.inventory_value: DashboardTotals.inventory_value + value,
+    }, synchronize_session=False)
+
+@contextmanager
+def inventory_change(item_ids):
+    """Apply the change in stock value that the block's writes make to these existing items."""
+    item_ids = list(item_ids)
+    lock_dashboard_totals()
+    before = inventory_value(item_ids)
+    yield
+    db.session.flush()
+    dashboard_totals_changed(value=inventory_value(item_ids) - before)
+
+def bill_lines(bill):
+    """A bill's lines as (item_id, quantity, price, tax_rate), the form record_bill_analytics takes."""
+    return [(line.item_id, line.quantity, line.price, line.tax_rate or 0.0) for line in bill.items]
+
+def sales_months_changed(months):
+    """Invalidate cached analytics for ranges touching these months (dates on the first of the month)."""
+    bump_cache_versions(f'sales:{month:%Y-%m}' for month in months)
+
+def record_bill_analytics(created_at, customer_id, payment_mode, total_amount, lines, sign=1):
+    """Add (sign=1) or take back (sign=-1) one bill in the analytics rollups; `lines` as from bill_lines()."""
+    day = created_at.date()
+    month = day.replace(day=1)
+    tax = 0.0
+    items = {}
+    for item_id, quantity, price, tax_rate in lines:
+        tax += quantity * price * (tax_rate or 0.0) / 100
+        if item_id is not None:
+            item_quantity, item_revenue = items.get(item_id, (0, 0.0))
+            items[item_id] = (item_quantity + quantity, item_revenue + quantity * price)
+    _bump_rollup(DailyPaymentSales, {'day': day, 'payment_mode': payment_mode or ''},
+                 total_amount=sign * total_amount, tax_amount=sign * tax, bill_count=sign)
+    if customer_id is not None:
+        for model, key in ((DailyCustomerSales, {'day': day}), (MonthlyCustomerSales, {'month': month})):
+            _bump_rollup(model, dict(key, customer_id=customer_id), total_amount=sign * total_amount, bill_count=sign)
+    for model, period in ((DailyItemSales, {'day': day}), (MonthlyItemSales, {'month': month})):
+        _bump_rollups(model, [*period, 'item_id'], [
+            dict(period, item_id=item_id, quantity=sign * quantity, revenue=sign * revenue)
+            for item_id, (quantity, revenue) in sorted(items.items())
+        ])
+    sales_months_changed([month])
+
+def rebuild_analytics_rollups():
+    """Recompute the analytics rollups from bills and their lines with INSERT ... SELECT."""
+    day = db.func.date(Bill.created_at, type_=db.Date)
+    month = date_bucket(Bill.created_at, 'month')
+    line_net = BillItem.quantity * BillItem.price
+    line_tax = line_net * db.func.coalesce(BillItem.tax_rate, 0.0) / 100
+    payment_mode = db.func.coalesce(Bill.payment_mode, '')
+    tax_by_bill = db.select(BillItem.bill_id, db.func.sum(line_tax).label('tax'))\
+        .group_by(BillItem.bill_id).subquery()
+    with_customer = Bill.customer_id.isnot(None)
+    with_item = BillItem.item_id.isnot(None)
+    rollups = [
+        (DailyPaymentSales, ['day', 'payment_mode', 'total_amount', 'tax_amount', 'bill_count'],
+         db.select(day, payment_mode, db.func.sum(Bill.total_amount),
+                   db.func.coalesce(db.func.sum(tax_by_bill.c.tax), 0.0), db.func.count(Bill.id))
+         .outerjoin(tax_by_bill, tax_by_bill.c.bill_id == Bill.id).group_by(day, payment_mode)),
+        (DailyCustomerSales, ['day', 'customer_id', 'total_amount', 'bill_count'],
+         db.select(day, Bill.customer_id, db.func.sum(Bill.total_amount), db.func.count(Bill.id))
+         .where(with_customer).group_by(day, Bill.customer_id)),
+        (MonthlyCustomerSales, ['month', 'customer_id', 'total_amount', 'bill_count'],
+         db.select(month, Bill.customer_id, db.func.sum(Bill.total_amount), db.func.count(Bill.id))
+         .where(with_customer).group_by(month, Bill.customer_id)),
+        (DailyItemSales, ['day', 'item_id', 'quantity', 'revenue'],
+         db.select(day, BillItem.item_id, db.func.sum(BillItem.quantity), db.func.sum(line_net))
+         .join(Bill, BillItem.bill_id == Bill.id).where(with_item).group_by(day, BillItem.item_id)),
+        (MonthlyItemSales, ['month', 'item_id', 'quantity', 'revenue'],
+         db.select(month, BillItem.item_id, db.func.sum(BillItem.quantity), db.func.sum(line_net))
+         .join(Bill, BillItem.bill_id == Bill.id).where(with_item).group_by(month, BillItem.item_id)),
+    ]
+    for model, columns, select in rollups:
+        model.query.delete()
+        db.session.execute(model.__table__.insert().from_select(columns, select))
+    SalesAnalyticsSummary.query.delete()
+
+def rebuild_sales_rollups():
+    """Recompute the daily and monthly rollups and the analytics rollups from the bill table, and the
+    dashboard's customer count and stock value from the customer and item tables."""
+    day_column = db.func.date(Bill.created_at, type_=db.Date)
+    daily = db.session.query(
+        day_column,
+        db.func.sum(Bill.total_amount),
+        db.func.count(Bill.id)
+    ).group_by(day_column).all()
+
+    monthly = {}
+    for day, amount, count in daily:
+        month = monthly.setdefault(day.replace(day=1), [0.0, 0])
+        month[0] += amount or 0
+        month[1] += count
+
+    DailySales.query.delete()
+    MonthlySales.query.delete()
+    db.session.add_all(DailySales(day=day, total_amount=amount or 0, bill_count=count)
+                       for day, amount, count in daily)
+    db.session.add_all(MonthlySales(month=month, total_amount=amount, bill_count=count)
+                       for month, (amount, count) in monthly.items())
+    rebuild_analytics_rollups()
+    DashboardTotals.query.delete()
+    lock_dashboard_totals()
+    db.session.commit()
+    return len(daily), len(monthly)
+
+REPLENISH_FETCH_ROWS = 10000
+
+def compute_replenishment(today=None, window_days=None):
+    """Recompute ItemReplenishment for every item; returns (items, items due for reorder).
+
+    Demand comes from DailyItemSales, which already holds each item's billed quantity per day.
+    The database sums quantity and its square per item over the window, so at most one row per
+    item comes back however long the window is; replenishment.py does the rest for all items at once.
+    """
+    today = today or datetime.utcnow().date()
+    window_days = window_days or app.config['REPLENISH_WINDOW_DAYS']
+    rows = db.session.query(Item.id, Item.stock).order_by(Item.id).all()
+    catalog = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+    history = replenishment.DemandHistory(catalog[:, 0], window_days)
+    quantity = DailyItemSales.quantity
+    result = db.session.execute(
+        db.select(DailyItemSales.item_id, db.func.sum(quantity), db.func.sum(quantity * quantity))
+        .where(DailyItemSales.day > today - timedelta(days=window_days), DailyItemSales.day <= today)
+        .group_by(DailyItemSales.item_id))
+    for chunk in result.partitions(REPLENISH_FETCH_ROWS):
+        sums = np.fromiter(itertools.chain.from_iterable(chunk), dtype=np.float64, count=3 * len(chunk))
+        history.add(sums[0::3], sums[1::3], sums[2::3])
+
+    mean, std = history.mean(), history.std()
+    figures = replenishment.plan(catalog[:, 1], mean, std, app.config['REPLENISH_LEAD_TIME_DAYS'],
+                                 app.config['REPLENISH_COVER_DAYS'], app.config['REPLENISH_SERVICE_Z'])
+    computed_at = datetime.utcnow()
+    columns = ('item_id', 'avg_daily_demand', 'demand_std', 'stock', 'days_of_cover', 'reorder_point',
+               'order_up_to', 'suggested_quantity')
+    values = zip(catalog[:, 0].tolist(), mean.tolist(), std.tolist(), catalog[:, 1].tolist(),
+                 # NaN (no demand) is stored as NULL
+                 [None if cover != cover else cover for cover in figures['days_of_cover'].tolist()],
+                 figures['reorder_point'].tolist(), figures['order_up_to'].tolist(),
+                 figures['suggested_quantity'].tolist())
+    ItemReplenishment.query.delete()
+    if rows:
+        db.session.execute(ItemReplenishment.__table__.insert(),
+                           [dict(zip(columns, row), computed_at=computed_at) for row in values])
+    db.session.commit()
+    return len(rows), int(np.count_nonzero(figures['suggested_quantity']))
+
+def _highest_number(column, prefix):
+    """Largest numeric suffix among existing documents numbered `prefix`N."""
+    highest = 0
+    for (number,) in db.session.query(column).filter(column.like(like_prefix(prefix), escape='\\')):
+        suffix = number[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+def claim_sequence_value(series, period, column, prefix):
+    """Atomically take the next value of a document series for `period`.
+
+    The counter row is incremented in place, so concurrent requests are serialised on it
+    and can never be handed the same number. The first number of a period continues
+    after any documents numbered before the counter existed.
+    """
+    key = (DocumentSequence.series == series, DocumentSequence.period == period)
+    values = {DocumentSequence.last_value: DocumentSequence.last_value + 1}
+    if not DocumentSequence.query.filter(*key).update(values, synchronize_session=False):
+        try:
+            with db.session.begin_nested():
+                db.session.add(DocumentSequence(series=series, period=period,
+                                                last_value=_highest_number(column, prefix) + 1))
+        except IntegrityError:
+            # Another request created the counter between our UPDATE and INSERT
+            DocumentSequence.query.filter(*key).update(values, synchronize_session=False)
+    return db.session.query(DocumentSequence.last_value).filter(*key).scalar()
+
+def peek_sequence_value(series, period):
+    """The value the next claim is likely to get; for display only."""
+    last_value = db.session.query(DocumentSequence.last_value)\
+        .filter(DocumentSequence.series == series, DocumentSequence.period == period).scalar()
+    return (last_value or 0) + 1
+
+def next_invoice_number(now):
+    period = f"{now.year}-{now.month:02d}"
+    prefix = f"SQE-{period}-"
+    return f"{prefix}{claim_sequence_value('SQE', period, Bill.invoice_number, prefix)}"
+
+def next_quotation_number(now):
+    period = now.strftime('%Y%m')
+    prefix = f"Q{period}-"
+    return f"{prefix}{claim_sequence_value('Q', period, Quotation.quotation_number, prefix):03d}"
+
+def sum_quantities(lines):
+    """Collapse (item_id, quantity) lines into {item_id: total quantity}."""
+    totals = {}
+    for item_id, quantity in lines:
+        if item_id is not None:
+            totals[item_id] = totals.get(item_id, 0) + quantity
+    return totals
+
+def load_items_for_update(item_ids):
+    """Load all referenced items in one query, row-locked in id order where the backend supports it."""
+    item_ids = set(item_ids)
+    if not item_ids:
+        return {}
+    query = Item.query.filter(Item.id.in_(item_ids)).order_by(Item.id)\
+        .with_for_update().populate_existing()
+    return {item.id: item for item in query}
+
+def take_stock(quantities):
+    """Decrement stock for {item_id: quantity} in a single UPDATE.
+
+    Each row is only changed while it still holds enough stock, so concurrent bills
+    cannot oversell. Returns False if any item was short; the caller should roll back.
+    """
+    if not quantities:
+        return True
+    delta = db.case(quantities, value=Item.id)
+    with inventory_change(quantities):
+        result = db.session.execute(
+            db.update(Item)
+            .where(Item.id.in_(quantities), Item.stock >= delta)
+            .values(stock=Item.stock - delta)
+            .execution_options(synchronize_session=False)
+        )
+    return result.rowcount == len(quantities)
+
+def return_stock(quantities):
+    """Add {item_id: quantity} back to stock in a single UPDATE; returns the rows changed."""
+    if not quantities:
+        return 0
+    delta = db.case(quantities, value=Item.id)
+    with inventory_change(quantities):
+        result = db.session.execute(
+            db.update(Item)
+            .where(Item.id.in_(quantities))
+            .values(stock=Item.stock + delta)
+            .execution_options(synchronize_session=False)
+        )
+    return result.rowcount
+
+def claim_bill_lines(bill):
+    """Delete a bill's lines and return the {item_id: quantity} they held.
+
+    The lines were read before the transaction took any lock, so they are
+    deleted by id and counted: if a concurrent edit or delete got to them
+    first, fewer rows match and None is returned. The caller must then roll
+    back rather than return stock a second time.
+    """
+    lines = list(bill.items)
+    if lines:
+        deleted = BillItem.query.filter(BillItem.id.in_([line.id for line in lines]))\
+            .delete(synchronize_session=False)
+        if deleted != len(lines):
+            return None
+    for line in lines:
+        db.session.expunge(line)
+    db.session.expire(bill, ['items'])
+    return sum_quantities((line.item_id, line.quantity) for line in lines)
+
+def index_customer(customer):
+    """Write a customer's searchable fields to the SQLite search table (flush first)."""
+    if db.engine.dialect.name != 'sqlite':
+        return  # the Postgres trigram index is maintained by the database
+    unindex_customer(customer.id)
+    db.session.execute(db.text(
+        'INSERT INTO customer_search (rowid, name, phone, email, gstin) '
+        'VALUES (:id, :name, :phone, :email, :gstin)'
+    ), {'id': customer.id, 'name': customer.name, 'phone': customer.phone,
+        'email': customer.email, 'gstin': customer.gstin})
+
+def unindex_customer(customer_id):
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(db.text('DELETE FROM customer_search WHERE rowid = :id'), {'id': customer_id})
+
+def rebuild_customer_search():
+    """Create the search index if missing and (on SQLite) repopulate it from the customer table."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        db.session.execute(db.text(CUSTOMER_SEARCH_SQLITE_DDL))
+        db.session.execute(db.text('DELETE FROM customer_search'))
+        db.session.execute(db.text(
+            'INSERT INTO customer_search (rowid, name, phone, email, gstin) '
+            'SELECT id, name, phone, email, gstin FROM customer'
+        ))
+    elif dialect == 'postgresql':
+        db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.execute(db.text(CUSTOMER_SEARCH_PG_DDL))
+    db.session.commit()
+
+def search_customers(term, limit=CUSTOMER_SEARCH_LIMIT):
+    """Return up to `limit` customers matching `term`, best matches first."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite' and len(term) >= 3:
+        ids = [row[0] for row in db.session.execute(db.text(
+            'SELECT rowid FROM customer_search WHERE customer_search MATCH :query '
+            'ORDER BY rank LIMIT :limit'
+        ), {'query': '"' + term.replace('"', '""') + '"', 'limit': limit})]
+        customers = {c.id: c for c in Customer.query.filter(Customer.id.in_(ids))} if ids else {}
+        return [customers[id] for id in ids if id in customers]
+    if dialect == 'postgresql':
+        document = db.literal_column(CUSTOMER_SEARCH_PG_DOCUMENT, type_=db.String)
+        return Customer.query.filter(document.op('ILIKE')('%' + like_prefix(term)))\
+            .order_by(db.func.similarity(document, term).desc(), Customer.name)\
+            .limit(limit).all()
+    # Terms shorter than a trigram (or other backends): walk the name index and stop at the limit
+    pattern = '%' + like_prefix(term)
+    return Customer.query.filter(
+        db.or_(
+            Customer.name.ilike(pattern, escape='\\'),
+            Customer.phone.ilike(pattern, escape='\\'),
+            Customer.email.ilike(pattern, escape='\\'),
+            Customer.gstin.ilike(pattern, escape='\\')
+        )
+    ).order_by(Customer.name).limit(limit).all()
+
+def encode_cursor(*values):
+    """Pack the sort key of the last row on a page into an opaque URL-safe token."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; returns None for a missing or malformed token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+def like_prefix(value):
+    """Escape LIKE wildcards so user input is matched literally as a prefix."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def name_prefix_filter(column, term):
+    """Case-insensitive prefix match on `column` that can use an index on lower(column)."""
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite's lower() folds ASCII letters only, so fold the term the same way
+        prefix = ''.join(char.lower() if char.isascii() else char for char in term)
+        criteria = [db.func.lower(column) >= prefix]
+        if prefix[-1] != chr(0x10FFFF):
+            criteria.append(db.func.lower(column) < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        return db.and_(*criteria)
+    return db.func.lower(column).like(like_prefix(term.lower()), escape='\\')
+
+def page_size(default=50, maximum=200):
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+def parse_date_arg(name):
+    """Read a YYYY-MM-DD query argument as a datetime at midnight, or None."""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+def filter_date_range(query, column, start=None, end=None):
+    """Restrict `column` to the half-open range [start, end + 1 day).
+
+    Comparing the bare column (rather than date(column) or extract()) keeps
+    the predicate sargable, so an index on the column can serve it.
+    """
+    if start:
+        query = query.filter(column >= start)
+    if end:
+        query = query.filter(column < end + timedelta(days=1))
+    return query
+
+PAYMENT_MODES = [
+    ('cash', 'Cash'),
+    ('upi', 'UPI'),
+    ('card', 'Card'),
+    ('bank_transfer', 'Bank Transfer'),
+]
+
+STOCK_BANDS = {
+    'low': lambda: Item.stock < 10,
+    'medium': lambda: db.and_(Item.stock >= 10, Item.stock <= 20),
+    'high': lambda: Item.stock > 20,
+}
+ITEM_SORT_COLUMNS = {
+    'name': Item.name,
+    'price': Item.price,
+    'stock': Item.stock,
+}
+
+ITEM_CURSOR_TYPES = {
+    'name': (str,),
+    'price': (int, float),
+    'stock': (int,),
+}
+
+def valid_item_cursor(sort, cursor):
+    """An /api/items cursor is [sort column value, item id] with the column's type."""
+    if len(cursor) != 2 or any(isinstance(value, bool) for value in cursor):
+        return False
+    value, item_id = cursor
+    return isinstance(value, ITEM_CURSOR_TYPES[sort]) and isinstance(item_id, int)
+
+@app.route('/api/items')
+def api_items():
+    sort = request.args.get('sort', 'name')
+    sort_column = ITEM_SORT_COLUMNS.get(sort)
+    if sort_column is None:
+        return jsonify({'error': f'Unsupported sort column: {sort}'}), 400
+    descending = request.args.get('order', 'asc') == 'desc'
+    limit = page_size()
+
+    query = Item.query
+    name = request.args.get('q', '').strip()
+    if name:
+        query = query.filter(name_prefix_filter(Item.name, name))
+    hsn = request.args.get('hsn', '').strip()
+    if hsn:
+        query = query.filter(Item.hsn_sac_number.like(like_prefix(hsn), escape='\\'))
+    band = request.args.get('stock')
+    if band:
+        if band not in STOCK_BANDS:
+            return jsonify({'error': f'Unsupported stock band: {band}'}), 400
+        query = query.filter(STOCK_BANDS[band]())
+
+    # Seek past the last row of the previous page instead of using OFFSET
+    token = request.args.get('cursor')
+    if token:
+        cursor = decode_cursor(token)
+        if cursor is None or not valid_item_cursor(sort, cursor):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        key = db.tuple_(sort_column, Item.id)
+        query = query.filter(key < tuple(cursor) if descending else key > tuple(cursor))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), Item.id.desc())
+    else:
+        query = query.order_by(sort_column, Item.id)
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort), last.id)
+    return jsonify({
+        'items': [{
+            'id': item.id,
+            'name': item.name,
+            'description': item.description,
+            'price': item.price,
+            'stock': item.stock,
+            'hsn_sac_number': item.hsn_sac_number,
+            'tax_rate': item.tax_rate,
+            'created_at': item.created_at.strftime('%Y-%m-%d %H:%M:%S') if item.created_at else None
+        } for item in rows],
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    })
+
 @app.route('/')
+@replica_read
 def index():
-    items = Item.query.order_by(Item.name).all()
-    
-    # Calculate total sales
-    total_sales = db.session.query(db.func.sum(Bill.total_amount)).scalar() or 0
+    # Sales KPIs come from the rollup tables
+    today = datetime.utcnow().date()
+    total_sales, total_bills = db.session.query(
+        db.func.sum(MonthlySales.total_amount),
+        db.func.sum(MonthlySales.bill_count)
+    ).one()
+    total_sales = total_sales or 0
+    total_bills = total_bills or 0
     
     # Calculate today's sales
-    today = datetime.utcnow().date()
-    today_sales = db.session.query(db.func.sum(Bill.total_amount))\
-        .filter(db.func.date(Bill.created_at) == today).scalar() or 0
+    today_sales = db.session.query(DailySales.total_amount)\
+        .filter(DailySales.day == today).scalar() or 0
     
     # Calculate monthly sales
-    first_day = today.replace(day=1)
-    monthly_sales = db.session.query(db.func.sum(Bill.total_amount))\
-        .filter(db.func.date(Bill.created_at) >= first_day).scalar() or 0
+    monthly_sales = db.session.query(MonthlySales.total_amount)\
+        .filter(MonthlySales.month == today.replace(day=1)).scalar() or 0
     
     # Calculate average bill amount
-    total_bills = Bill.query.count()
     avg_bill_amount = total_sales / total_bills if total_bills > 0 else 0
     
-    # Get total customers
-    total_customers = Customer.query.count()
-    
-    # Get total bills count
-    total_bills = Bill.query.count()
-    
-    # Count low stock items (less than 10)
-    low_stock_items = Item.query.filter(Item.stock < 10).count()
+    # Customer count and stock value from their one-row rollup; scanned only until the first write creates it
+    totals = db.session.get(DashboardTotals, DASHBOARD_TOTALS_ID)
+    if totals is not None:
+        total_customers, total_inventory_value = totals.customer_count, totals.inventory_value
+    else:
+        total_customers, total_inventory_value = Customer.query.count(), inventory_value()
     
-    # Calculate total inventory value
-    total_inventory_value = db.session.query(db.func.sum(Item.price * Item.stock)).scalar() or 0
+    # Items at or below the reorder point of the last `flask compute-replenishment` run, by live stock;
+    # until it has run, items with less than 10 in stock
+    replenished_at = db.session.query(ItemReplenishment.computed_at).limit(1).scalar()
+    if replenished_at:
+        # count() OVER () counts every due item in the same join scan that picks the ten with the least cover
+        reorder_items = db.session.query(Item.id, Item.name, Item.stock, ItemReplenishment.avg_daily_demand,
+                                         ItemReplenishment.reorder_point, ItemReplenishment.order_up_to,
+                                         db.func.count().over().label('due_count'))\
+            .join(ItemReplenishment, ItemReplenishment.item_id == Item.id)\
+            .filter(ItemReplenishment.avg_daily_demand > 0, Item.stock <= ItemReplenishment.reorder_point)\
+            .order_by(Item.stock / ItemReplenishment.avg_daily_demand, Item.id).limit(10).all()
+        low_stock_items = reorder_items[0].due_count if reorder_items else 0
+    else:
+        low_stock_items = Item.query.filter(Item.stock < 10).count()
+        reorder_items = []
     
     # Get recent bills
     recent_bills = Bill.query.order_by(Bill.created_at.desc()).limit(5).all()
     
     return render_template('index.html',
-                         items=items,
                          total_sales=total_sales,
                          today_sales=today_sales,
                          monthly_sales=monthly_sales,
@@ -156,6 +1206,8 @@ def index():
                          total_customers=total_customers,
                          total_bills=total_bills,
                          low_stock_items=low_stock_items,
+                         replenished_at=replenished_at,
+                         reorder_items=reorder_items,
                          total_inventory_value=total_inventory_value,
                          recent_bills=recent_bills)
 
@@ -169,7 +1221,10 @@ def add_item():
         hsn_sac_number = request.form['hsn_sac_number'] if request.form['hsn_sac_number'] else None
         tax_rate = float(request.form['tax_rate']) if request.form['tax_rate'] else 0.0
         new_item = Item(name=name, description=description, price=price, stock=stock, hsn_sac_number=hsn_sac_number, tax_rate=tax_rate)
+        lock_dashboard_totals()
         db.session.add(new_item)
+        dashboard_totals_changed(value=price * stock)
+        reference_data_changed('items')
         db.session.commit()
         flash('Item added successfully!')
         return redirect(url_for('index'))
@@ -194,27 +1249,34 @@ def create_bill():
         address = customer.address
         gstin = customer.gstin
         payment_mode = request.form.get('payment_mode')
-        items = request.form.getlist('items[]')
-        quantities = request.form.getlist('quantities[]')
+        lines = [(int(item_id), int(quantity))
+                 for item_id, quantity in zip(request.form.getlist('items[]'), request.form.getlist('quantities[]'))
+                 if item_id.isdigit() and quantity and int(quantity) > 0]
+        stock_items = load_items_for_update(item_id for item_id, _ in lines)
+        lines = [(item_id, quantity) for item_id, quantity in lines if item_id in stock_items]
+        wanted = sum_quantities(lines)
         
-        for item_id, quantity in zip(items, quantities):
-            if int(quantity) > 0:
-                item = Item.query.get(item_id)
-                if item and int(quantity) > item.stock:
-                    flash(f'Insufficient stock for {item.name}. Available: {item.stock}, Requested: {quantity}', 'danger')
-                    return redirect(url_for('create_bill'))
+        for item_id, quantity in wanted.items():
+            item = stock_items[item_id]
+            if quantity > item.stock:
+                flash(f'Insufficient stock for {item.name}. Available: {item.stock}, Requested: {quantity}', 'danger')
+                return redirect(url_for('create_bill'))
         
-        now = datetime.now()
-        month_str = now.strftime('%Y-%m')
-        count = Bill.query.filter(
-            db.extract('year', Bill.created_at) == now.year,
-            db.extract('month', Bill.created_at) == now.month
-        ).count() + 1
-        invoice_number = f"SQE-{now.year}-{now.month:02d}-{count}"
+        # Number the bill by the same UTC clock as its created_at, so both agree on the month
+        created_at = datetime.utcnow()
+        invoice_number = next_invoice_number(created_at)
         
         subtotal = 0
         total_tax = 0
-        total_amount = 0
+        bill_items = []
+        for item_id, quantity in lines:
+            item = stock_items[item_id]
+            item_tax = item.tax_rate or 0.0
+            item_subtotal = item.price * quantity
+            subtotal += item_subtotal
+            total_tax += item_subtotal * (item_tax / 100)
+            bill_items.append({'item_id': item.id, 'quantity': quantity, 'price': item.price, 'tax_rate': item_tax})
+        total_amount = subtotal + total_tax
         
         bill = Bill(
             customer_id=customer_id,
@@ -225,51 +1287,69 @@ def create_bill():
             gstin=gstin,
             payment_mode=payment_mode,
             invoice_number=invoice_number,
-            total_amount=0
+            total_amount=total_amount,
+            created_at=created_at
         )
         db.session.add(bill)
-        
-        for item_id, quantity in zip(items, quantities):
-            if int(quantity) > 0:
-                item = Item.query.get(item_id)
-                if item:
-                    item_tax = item.tax_rate or 0.0
-                    item_subtotal = item.price * int(quantity)
-                    item_tax_amount = item_subtotal * (item_tax / 100)
-                    subtotal += item_subtotal
-                    total_tax += item_tax_amount
-                    bill_item = BillItem(
-                        bill=bill,
-                        item=item,
-                        quantity=int(quantity),
-                        price=item.price,
-                        tax_rate=item_tax
-                    )
-                    db.session.add(bill_item)
-                    item.stock -= int(quantity)
-        
-        total_amount = subtotal + total_tax
-        bill.total_amount = total_amount
+        db.session.flush()
+        db.session.bulk_insert_mappings(BillItem, [dict(line, bill_id=bill.id) for line in bill_items])
+        if not take_stock(wanted):
+            db.session.rollback()
+            flash('Insufficient stock: another bill used the remaining stock. Please review the quantities.', 'danger')
+            return redirect(url_for('create_bill'))
+        record_sales(bill.created_at, total_amount, 1)
+        record_bill_analytics(bill.created_at, customer.id, payment_mode, total_amount,
+                              [(line['item_id'], line['quantity'], line['price'], line['tax_rate'])
+                               for line in bill_items])
+        product_sales_changed(wanted)
         db.session.commit()
 
         flash('Bill created successfully!', 'success')
         return redirect(url_for('view_bills'))
     
-    items = Item.query.all()
-    customers = Customer.query.order_by(Customer.name).all()
-    now = datetime.now()
-    month_str = now.strftime('%Y%m')
-    count = Bill.query.filter(
-        db.extract('year', Bill.created_at) == now.year,
-        db.extract('month', Bill.created_at) == now.month
-    ).count() + 1
-    invoice_number = f"{month_str}-{count:03d}"
-    return render_template('create_bill.html', items=items, customers=customers, invoice_number=invoice_number, today=now.strftime('%d/%m/%Y'))
+    items = item_choices()
+    customers = customer_choices()
+    now = datetime.utcnow()
+    period = f"{now.year}-{now.month:02d}"
+    invoice_number = f"SQE-{period}-{peek_sequence_value('SQE', period)}"
+    return render_template('create_bill.html', items=items, stock=stock_levels(), customers=customers,
+                           invoice_number=invoice_number, today=now.strftime('%d/%m/%Y'))
 
 @app.route('/bills')
 def view_bills():
-    bills = Bill.query.order_by(Bill.created_at.desc()).all()
-    return render_template('bills.html', bills=bills)
+    filters = {key: request.args.get(key, '').strip()
+               for key in ('start', 'end', 'payment_mode', 'customer_id')}
+    limit = page_size()
+    query = Bill.query
+
+    query = filter_date_range(query, Bill.created_at, parse_date_arg('start'), parse_date_arg('end'))
+    if filters['payment_mode']:
+        query = query.filter(Bill.payment_mode == filters['payment_mode'])
+    customer = None
+    if filters['customer_id'].isdigit():
+        query = query.filter(Bill.customer_id == int(filters['customer_id']))
+        customer = Customer.query.get(int(filters['customer_id']))
+
+    active_filters = {key: value for key, value in filters.items() if value}
+    token = request.args.get('cursor')
+    if token:
+        cursor = decode_cursor(token)
+        try:
+            if cursor is None or len(cursor) != 2 or type(cursor[1]) is not int:
+                raise ValueError(token)
+            key = (datetime.fromisoformat(cursor[0]), cursor[1])
+        except (TypeError, ValueError):
+            flash('That page link is invalid; showing the first page instead.', 'danger')
+            return redirect(url_for('view_bills', **active_filters))
+        query = query.filter(db.tuple_(Bill.created_at, Bill.id) < key)
+
+    bills = query.order_by(Bill.created_at.desc(), Bill.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(bills) > limit:
+        bills = bills[:limit]
+        next_cursor = encode_cursor(bills[-1].created_at, bills[-1].id)
+    return render_template('bills.html', bills=bills, filters=filters, active_filters=active_filters,
+                           customer=customer, next_cursor=next_cursor, payment_modes=PAYMENT_MODES)
 
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
@@ -288,327 +1368,250 @@ def settings():
         settings.bank_name = request.form.get('bank_name', '')
         settings.bank_account_number = request.form.get('bank_account_number', '')
         settings.ifsc_code = request.form.get('ifsc_code', '')
-        
+        reference_data_changed('settings')
         db.session.commit()
+        # The seller block is on every invoice
+        pdf_cache.clear()
         flash('Settings updated successfully!', 'success')
         return redirect(url_for('settings'))
     
     settings = Settings.query.first()
     return render_template('settings.html', settings=settings)
 
+SETTINGS_DOCUMENT_FIELDS = ('company_name', 'address', 'phone', 'email', 'gstin', 'website',
+                            'bank_name', 'bank_account_number', 'ifsc_code')
+
+def seller_details(settings):
+    if not settings:
+        return {}
+    return {field: getattr(settings, field) for field in SETTINGS_DOCUMENT_FIELDS}
+
+def document_lines(lines):
+    return [{
+        'name': line.item.name if line.item else 'Not Available',
+        'hsn': line.item.hsn_sac_number if line.item else '',
+        'quantity': line.quantity,
+        'price': line.price,
+        'tax_rate': line.tax_rate or 0,
+    } for line in lines]
+
+def party_details(record):
+    return {
+        'name': record.customer.name if record.customer else record.customer_name,
+        'phone': record.mobile_number,
+        'email': record.email,
+        'address': record.address,
+        'gstin': record.gstin,
+    }
+
+def bill_document(bill, subtotal, total_tax, seller=None):
+    """Describe a bill as plain data for pdf_renderer.render_document."""
+    if seller is None:
+        seller = current_settings()
+    return {
+        'kind': 'invoice',
+        'number': bill.invoice_number,
+        'details': [('Date', bill.created_at.strftime('%d/%m/%Y')), ('Payment Mode', bill.payment_mode)],
+        'customer': party_details(bill),
+        'seller': seller,
+        'lines': document_lines(bill.items),
+        'subtotal': subtotal,
+        'total_tax': total_tax,
+        'total': bill.total_amount,
+    }
+
 def generate_bill_pdf(bill, subtotal, total_tax):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                           rightMargin=20, leftMargin=40, 
-                           topMargin=8, bottomMargin=20)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    primary_color = colors.HexColor('#1A8CFF')
-    secondary_color = colors.HexColor('#424242')
-    accent_color = colors.HexColor('#FF9900')
-    light_bg = colors.HexColor('#F5F5F5')
-    text_color = colors.HexColor('#212121')
-    
-    styles.add(ParagraphStyle(
-        name='CompanyHeader', fontSize=20, leading=24, alignment=1, 
-        fontName='Helvetica', spaceAfter=4, textColor=primary_color))
-    styles.add(ParagraphStyle(
-        name='CompanySubHeader', fontSize=9, leading=11, alignment=0, 
-        fontName='Helvetica', spaceAfter=1, textColor=secondary_color))
-    styles.add(ParagraphStyle(
-        name='NormalText', fontSize=8, leading=10, alignment=0, 
-        fontName='Helvetica', textColor=text_color))
-    styles.add(ParagraphStyle(
-        name='TableHeader', fontSize=9, leading=11, alignment=1, 
-        fontName='Helvetica', textColor=colors.white))
-    styles.add(ParagraphStyle(
-        name='TableCell', fontSize=8, leading=10, alignment=1, 
-        fontName='Helvetica', textColor=text_color))
-    styles.add(ParagraphStyle(
-        name='Footer', fontSize=7, leading=9, alignment=1, 
-        fontName='Helvetica', textColor=secondary_color))
-    styles.add(ParagraphStyle(
-        name='TotalAmount', fontSize=9, leading=11, alignment=2, 
-        fontName='Helvetica', textColor=primary_color))
-    styles.add(ParagraphStyle(
-        name='BillTo', fontSize=9, leading=11, alignment=0, 
-        fontName='Helvetica', textColor=primary_color))
-    styles.add(ParagraphStyle(
-        name='InvoiceInfo', fontSize=9, leading=11, alignment=0, 
-        fontName='Helvetica', textColor=accent_color, 
-        borderColor=accent_color, borderWidth=1, borderPadding=3))
-    
-    settings = Settings.query.first()
-    
-    top_banner = Table([['INVOICE']], colWidths=[540])
-    top_banner.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, 0), primary_color),
-        ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (0, 0), 14),
-        ('ALIGNMENT', (0, 0), (0, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (0, 0), 4),
-        ('BOTTOMPADDING', (0, 0), (0, 0), 4),
-    ]))
-    elements.append(top_banner)
-
-    logo_path = os.path.join('static', 'logo.png')
-    logo_data = None
-    if os.path.exists(logo_path):
-        img = Image(logo_path, width=40, height=40)
-        logo_data = img
-    else:
-        logo_data = Paragraph("", styles['NormalText'])
-    company_name = settings.company_name if settings and settings.company_name else ""
-    company_name_para = Paragraph(company_name, ParagraphStyle(name='CenteredCompanyName', fontSize=14, leading=18, alignment=0, fontName='Helvetica-Bold', textColor=primary_color))
-    logo_name_row = Table([[logo_data, company_name_para]], colWidths=[42, 200], hAlign='CENTER')
-    logo_name_row.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (1, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (1, 0), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (1, 0), 0),
-        ('RIGHTPADDING', (0, 0), (1, 0), 0),
-        ('TOPPADDING', (0, 0), (1, 0), 0),
-        ('BOTTOMPADDING', (0, 0), (1, 0), 0),
-    ]))
-    elements.append(logo_name_row)
-
-    customer_box_data = []
-    customer_box_data.append([Paragraph("<b>BILLED TO:</b>", ParagraphStyle(name='BillToMedium', fontSize=12, leading=14, alignment=0, fontName='Helvetica-Bold', textColor=primary_color))])
-    customer_name = bill.customer.name if bill.customer else bill.customer_name
-    if customer_name:
-        customer_box_data.append([Paragraph(f"<b>{customer_name}</b>", ParagraphStyle(name='CustomerMedium', fontSize=11, leading=13, alignment=0, fontName='Helvetica-Bold', textColor=text_color))])
-    if bill.mobile_number:
-        customer_box_data.append([Paragraph(f"Phone: {bill.mobile_number}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    if bill.email:
-        customer_box_data.append([Paragraph(f"Email: {bill.email}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    if bill.address:
-        customer_box_data.append([Paragraph(f"Address: {bill.address}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    if bill.gstin:
-        customer_box_data.append([Paragraph(f"GSTIN: {bill.gstin}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    customer_box = Table(customer_box_data, colWidths=[180])
-    customer_box.setStyle(TableStyle([
-        ('BOX', (0, 0), (-1, -1), 1, primary_color),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
-
-    company_details_content = []
-    company_details_content.append(Paragraph("<b>SELLER'S DETAILS</b>", ParagraphStyle(name='SellerDetailsHeader', fontSize=11, leading=13, alignment=0, fontName='Helvetica-Bold', textColor=primary_color)))
-    if settings:
-        if settings.address:
-            company_details_content.append(Paragraph(f"<b>Address:</b> {settings.address}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.phone:
-            company_details_content.append(Paragraph(f"<b>Tel:</b> {settings.phone}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.email:
-            company_details_content.append(Paragraph(f"<b>Email:</b> {settings.email}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.gstin:
-            company_details_content.append(Paragraph(f"<b>GSTIN:</b> {settings.gstin}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.bank_name:
-            company_details_content.append(Paragraph(f"<b>Bank Name:</b> {settings.bank_name}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.bank_account_number:
-            company_details_content.append(Paragraph(f"<b>Acc No:</b> {settings.bank_account_number}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.ifsc_code:
-            company_details_content.append(Paragraph(f"<b>IFSC:</b> {settings.ifsc_code}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-    company_details_data = [[detail] for detail in company_details_content]
-    if not company_details_data:
-        company_details_data = [[""]]
-    company_details = Table(company_details_data, colWidths=[300])
-    company_details.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (0, -1), 'MIDDLE'),
-        ('BOX', (0, 0), (-1, -1), 1, primary_color),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
-
-    invoice_date = bill.created_at.strftime('%d/%m/%Y')
-    invoice_number = bill.invoice_number
-    invoice_data = [
-        [Paragraph(f"<b>TAX INVOICE #{invoice_number}</b>", ParagraphStyle(name='InvoiceLabel', fontSize=11, leading=13, alignment=0, fontName='Helvetica-Bold', textColor=accent_color))],
-        [Paragraph(f"Date: {invoice_date}", styles['NormalText'])],
-        [Paragraph(f"Payment Mode: {bill.payment_mode}", styles['NormalText'])]
-    ]
-    invoice_box = Table(invoice_data, colWidths=[300])
-    invoice_box.setStyle(TableStyle([
-        ('BOX', (0, 0), (-1, -1), 1, accent_color),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
-
-    stacked_boxes = Table([[company_details], [invoice_box]], colWidths=[300])
-    stacked_boxes.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (0, -1), 'TOP'),
-        ('TOPPADDING', (0, 0), (0, 0), 0),
-        ('BOTTOMPADDING', (0, 0), (0, 0), 2),
-        ('TOPPADDING', (0, 1), (0, 1), 2),
-        ('BOTTOMPADDING', (0, 1), (0, 1), 0),
-    ]))
-
-    info_row = Table([[customer_box, stacked_boxes]], colWidths=[190, 320])
-    info_row.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('VALIGN', (0, 0), (1, 0), 'TOP'),
-        ('LEFTPADDING', (0, 0), (1, 0), 0),
-        ('RIGHTPADDING', (0, 0), (1, 0), 0),
-        ('TOPPADDING', (0, 0), (1, 0), 0),
-        ('BOTTOMPADDING', (0, 0), (1, 0), 0),
-    ]))
-    elements.append(info_row)
-    elements.append(Spacer(1, 10))
-
-    data = [
-        [Paragraph('Item Description', styles['TableHeader']),
-         Paragraph('HSN/SAC', styles['TableHeader']),
-         Paragraph('Qty', styles['TableHeader']),
-         Paragraph('Unit Price', styles['TableHeader']),
-         Paragraph('Tax %', styles['TableHeader']),
-         Paragraph('Tax Amt', styles['TableHeader']),
-         Paragraph('Total', styles['TableHeader'])]
-    ]
-    
-    row_colors = [light_bg, colors.white]
-    row_style_list = [
-        ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-        ('TOPPADDING', (0, 0), (-1, 0), 6),
-    ]
-    
-    for i, item in enumerate(bill.items):
-        item_tax = item.tax_rate or 0
-        tax_amount = item.price * item.quantity * item_tax / 100
-        total = item.price * item.quantity + tax_amount
-        
-        if i % 2 == 0:
-            row_style_list.append(('BACKGROUND', (0, i+1), (-1, i+1), light_bg))
-        
-        data.append([
-            Paragraph(item.item.name, styles['TableCell']),
-            Paragraph(item.item.hsn_sac_number or '', styles['TableCell']),
-            Paragraph(str(item.quantity), styles['TableCell']),
-            Paragraph(f"{item.price:.2f}", styles['TableCell']),
-            Paragraph(f"{item_tax:.1f}%", styles['TableCell']),
-            Paragraph(f"{tax_amount:.2f}", styles['TableCell']),
-            Paragraph(f"{total:.2f}", styles['TableCell'])
-        ])
-    
-    total_row_index = len(data)
-    
-    data.extend([
-        ['', '', '', '', '', Paragraph('Subtotal:', styles['TableCell']), Paragraph(f"{subtotal:.2f}", styles['TotalAmount'])],
-        ['', '', '', '', '', Paragraph('Total Tax:', styles['TableCell']), Paragraph(f"{total_tax:.2f}", styles['TotalAmount'])],
-        ['', '', '', '', '', Paragraph('TOTAL:', styles['TableHeader']), Paragraph(f"{bill.total_amount:.2f}", styles['TotalAmount'])]
-    ])
-    
-    row_style_list.extend([
-        ('BACKGROUND', (5, total_row_index), (6, total_row_index), colors.white),
-        ('BACKGROUND', (5, total_row_index+1), (6, total_row_index+1), colors.white),
-        ('BACKGROUND', (5, total_row_index+2), (6, total_row_index+2), colors.white),
-        ('TEXTCOLOR', (5, total_row_index+2), (5, total_row_index+2), text_color),
-        ('TEXTCOLOR', (6, total_row_index+2), (6, total_row_index+2), text_color),
-        ('SPAN', (0, total_row_index), (4, total_row_index)),
-        ('SPAN', (0, total_row_index+1), (4, total_row_index+1)),
-        ('SPAN', (0, total_row_index+2), (4, total_row_index+2)),
-        ('ALIGN', (5, total_row_index), (5, total_row_index+2), 'RIGHT'),
-        ('ALIGN', (6, total_row_index), (6, total_row_index+2), 'RIGHT'),
-        ('LINEABOVE', (5, total_row_index), (6, total_row_index), 0.5, colors.black),
-    ])
-    
-    table = Table(data, colWidths=[150, 70, 50, 70, 50, 70, 120])
-    table.setStyle(TableStyle(row_style_list + [
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        ('TOPPADDING', (0, 1), (-1, -1), 6),
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 20))
-    # Only add the sign image, no header
-    elements.append(Table([["", Image('static/sign.png', width=100, height=50)]], colWidths=[390, 150], hAlign='RIGHT'))
-    elements.append(Spacer(1, 20))
-
-    thank_you = Table([
-        [Paragraph("THANK YOU FOR YOUR BUSINESS!", 
-                   ParagraphStyle(name='ThankYou', fontSize=10, alignment=1, 
-                                 textColor=primary_color, fontName='Helvetica'))],
-    ], colWidths=[540])
-    
-    thank_you.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(thank_you)
-    
-    elements.append(Spacer(1, 5))
-    
-    footer_text = "This is a computer generated invoice, no signature required."
-    
-    footer = Paragraph(footer_text, 
-                      ParagraphStyle(name='MinimalFooter', 
-                                    fontSize=6, 
-                                    leading=8, 
-                                    alignment=1, 
-                                    fontName='Helvetica', 
-                                    textColor=secondary_color))
-    elements.append(footer)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    with metrics.timed_render('invoice'):
+        return render_document(bill_document(bill, subtotal, total_tax))
 
-@app.route('/download_bill/<int:bill_id>')
-def download_bill(bill_id):
-    bill = Bill.query.get_or_404(bill_id)
-    if not bill.inventory_updated:
-        for item in bill.items:
-            db_item = Item.query.get(item.item_id)
-            if db_item and db_item.stock >= item.quantity:
-                db_item.stock -= item.quantity
-        bill.inventory_updated = True
-        db.session.commit()
+def bill_pdf_document(bill, seller=None):
     subtotal = sum(item.price * item.quantity for item in bill.items)
     total_tax = sum(item.price * item.quantity * (item.tax_rate or 0) / 100 for item in bill.items)
-    pdf_buffer = generate_bill_pdf(bill, subtotal, total_tax)
-    return send_file(
-        pdf_buffer,
+    return bill_document(bill, subtotal, total_tax, seller)
+
+def bill_document_query():
+    """Bills with their lines, the lines' items and the customer loaded up front, in two queries however many lines."""
+    return Bill.query.options(db.selectinload(Bill.items).joinedload(BillItem.item),
+                              db.joinedload(Bill.customer))
+
+def get_bill_or_404(bill_id):
+    return bill_document_query().filter(Bill.id == bill_id).first_or_404()
+
+def invoice_export_query(start=None, end=None, customer_id=None):
+    query = bill_document_query()
+    query = filter_date_range(query, Bill.created_at, start, end)
+    if customer_id:
+        query = query.filter(Bill.customer_id == customer_id)
+    return query.order_by(Bill.created_at, Bill.id)
+
+def invoice_export_documents(query, batch_size=200):
+    """Yield (zip member name, render payload) per bill, loading bills in batches."""
+    seller = current_settings()
+    for bill in query.yield_per(batch_size):
+        name = secure_filename(bill.invoice_number or '') or f'bill_{bill.id}'
+        yield f'{name}.pdf', bill_pdf_document(bill, seller)
+
+def export_progress_path(export_id):
+    return os.path.join(pdf_cache.directory, 'exports', f'{export_id}.json')
+
+def export_invoice_archive(query, progress, workers=None, pool=None):
+    """Yield ZIP chunks of the invoices in `query`, recording progress as each PDF lands."""
+    def rendered():
+        for name, data in render_in_parallel(invoice_export_documents(query), pdf_cache, workers, pool=pool):
+            progress.advance()
+            yield name, data
+    yield from stream_zip(rendered())
+    progress.save(finished=True)
+
+@app.route('/export/invoices')
+def export_invoices():
+    start, end = parse_date_arg('start'), parse_date_arg('end')
+    customer_id = request.args.get('customer_id', type=int)
+    if not (start or end or customer_id):
+        flash('Choose a date range or a customer to export invoices.', 'warning')
+        return redirect(url_for('view_bills'))
+    try:
+        export_pool.acquire()
+    except ExportBusy:
+        response = jsonify({'error': 'Too many invoice exports are running, please retry shortly.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    try:
+        query = invoice_export_query(start, end, customer_id)
+        export_id = uuid.uuid4().hex
+        ExportProgress.prune(os.path.dirname(export_progress_path(export_id)), app.config['EXPORT_PROGRESS_TTL'])
+        progress = ExportProgress(export_progress_path(export_id), query.order_by(None).count())
+    except Exception:
+        export_pool.release()
+        raise
+    filename = '_'.join(['invoices'] + [value for value in (request.args.get('start'), request.args.get('end')) if value])
+    response = Response(stream_with_context(export_invoice_archive(query, progress, pool=export_pool)),
+                        mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment;filename={secure_filename(filename)}.zip',
+        'X-Export-Id': export_id,
+        'X-Export-Progress': url_for('export_invoices_progress', export_id=export_id),
+    })
+    # The slot is held until the server closes the response, including when the client goes away
+    response.call_on_close(export_pool.release)
+    return response
+
+@app.route('/export/invoices/<export_id>/progress')
+def export_invoices_progress(export_id):
+    try:
+        with open(export_progress_path(secure_filename(export_id))) as f:
+            return Response(f.read(), mimetype='application/json')
+    except FileNotFoundError:
+        return jsonify({'error': 'Unknown export'}), 404
+
+def wants_async_render():
+    return request.args.get('async', '1' if app.config['PDF_ASYNC_RENDER'] else '0') == '1'
+
+def render_job_response(job_id, download_name):
+    status = render_queue.status(job_id)
+    payload = {
+        'job_id': job_id,
+        'status': status,
+        'status_url': url_for('render_job_status', job_id=job_id, name=download_name),
+        'result_url': url_for('render_job_result', job_id=job_id, name=download_name),
+    }
+    if status == 'failed':
+        payload['error'] = render_queue.error(job_id)
+    return payload
+
+def queue_render(document, download_name):
+    """Submit a render job and answer 202 with its status/result URLs, or 503 when the queue is full."""
+    try:
+        job_id = render_queue.submit(document)
+    except RenderQueueFull:
+        response = jsonify({'error': 'Too many PDFs are being generated, please retry shortly.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    payload = render_job_response(job_id, download_name)
+    response = jsonify(payload)
+    response.status_code = 202
+    response.headers['Location'] = payload['status_url']
+    return response
+
+def send_cached_pdf(key, download_name, data=None):
+    """Send the cached PDF for `key`, or `data` when the caller already holds its bytes."""
+    response = send_file(
+        pdf_cache.path(key) if data is None else BytesIO(data),
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'bill_{bill_id}.pdf'
+        download_name=download_name,
+        etag=key
     )
+    # Revalidate with If-None-Match on every download so edits show up immediately
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/render_jobs/<job_id>')
+def render_job_status(job_id):
+    if render_queue.status(job_id) is None:
+        return jsonify({'error': 'Unknown render job'}), 404
+    return jsonify(render_job_response(job_id, secure_filename(request.args.get('name', '')) or 'document.pdf'))
+
+@app.route('/render_jobs/<job_id>/result')
+def render_job_result(job_id):
+    download_name = secure_filename(request.args.get('name', '')) or 'document.pdf'
+    status = render_queue.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown render job'}), 404
+    if status != 'done':
+        response = jsonify(render_job_response(job_id, download_name))
+        response.status_code = 500 if status == 'failed' else 202
+        return response
+    if request.if_none_match.contains(job_id):
+        return Response(status=304, headers={'ETag': f'"{job_id}"'})
+    try:
+        if pdf_cache.get(job_id) is not None:
+            return send_cached_pdf(job_id, download_name)
+    except FileNotFoundError:
+        pass
+    # Evicted since the status check; the job is gone and the document has to be requested again
+    return jsonify({'error': 'Render job expired', 'status': None}), 404
+
+@app.route('/download_bill/<int:bill_id>')
+def download_bill(bill_id):
+    bill = get_bill_or_404(bill_id)
+    if not bill.inventory_updated:
+        # Only the request that flips the flag takes the stock; lines are re-read under its write lock.
+        # Lines without enough stock left are skipped, as before.
+        if Bill.query.filter(Bill.id == bill_id, Bill.inventory_updated.isnot(True))\
+                .update({Bill.inventory_updated: True}, synchronize_session=False):
+            take_stock(sum_quantities(db.session.query(BillItem.item_id, BillItem.quantity)
+                                      .filter(BillItem.bill_id == bill_id)))
+        db.session.commit()
+        bill = get_bill_or_404(bill_id)  # the commit expired the eagerly loaded lines
+    document = bill_pdf_document(bill)
+    if wants_async_render():
+        return queue_render(document, f'bill_{bill_id}.pdf')
+    key = pdf_cache.key(document)
+    if request.if_none_match.contains(key):
+        return Response(status=304, headers={'ETag': f'"{key}"'})
+    download_name = f'bill_{bill_id}.pdf'
+    if pdf_cache.get(key) is not None:
+        try:
+            return send_cached_pdf(key, download_name)
+        except FileNotFoundError:
+            pass  # evicted by another worker since the lookup
+    with metrics.timed_render('invoice'):
+        data = render_document(document).getvalue()
+    pdf_cache.put(key, data)
+    # Served from memory: put() may already have evicted it again, e.g. a PDF larger than the whole cache
+    return send_cached_pdf(key, download_name, data)
 
 @app.route('/customers')
 def customers():
     search_query = request.args.get('search', '').strip()
     if search_query:
-        customers = Customer.query.filter(
-            db.or_(
-                Customer.name.ilike(f'%{search_query}%'),
-                Customer.phone.ilike(f'%{search_query}%'),
-                Customer.email.ilike(f'%{search_query}%'),
-                Customer.gstin.ilike(f'%{search_query}%')
-            )
-        ).order_by(Customer.name).all()
+        customers = search_customers(search_query)
     else:
         customers = Customer.query.order_by(Customer.name).all()
-    return render_template('customers.html', customers=customers, search_query=search_query)
+    return render_template('customers.html', customers=customers, search_query=search_query,
+                           search_limit=CUSTOMER_SEARCH_LIMIT)
 
 @app.route('/add_customer', methods=['GET', 'POST'])
 def add_customer():
@@ -620,7 +1623,12 @@ def add_customer():
             address=request.form['address'],
             gstin=request.form['gstin']
         )
+        lock_dashboard_totals()
         db.session.add(customer)
+        dashboard_totals_changed(customers=1)
+        db.session.flush()
+        index_customer(customer)
+        reference_data_changed('customers')
         db.session.commit()
         flash('Customer added successfully!', 'success')
         return redirect(url_for('customers'))
@@ -635,6 +1643,8 @@ def edit_customer(id):
         customer.email = request.form['email']
         customer.address = request.form['address']
         customer.gstin = request.form['gstin']
+        index_customer(customer)
+        reference_data_changed('customers')
         db.session.commit()
         flash('Customer updated successfully!', 'success')
         return redirect(url_for('customers'))
@@ -643,10 +1653,14 @@ def edit_customer(id):
 @app.route('/delete_customer/<int:id>')
 def delete_customer(id):
     customer = Customer.query.get_or_404(id)
-    if customer.bills:
+    if db.session.query(Bill.query.filter(Bill.customer_id == customer.id).exists()).scalar():
         flash('Cannot delete customer with existing bills!', 'danger')
     else:
+        unindex_customer(customer.id)
+        lock_dashboard_totals()
         db.session.delete(customer)
+        dashboard_totals_changed(customers=-1)
+        reference_data_changed('customers')
         db.session.commit()
         flash('Customer deleted successfully!', 'success')
     return redirect(url_for('customers'))
@@ -660,13 +1674,14 @@ def edit_item(id):
     
     if request.method == 'POST':
         try:
-            item.name = request.form['name']
-            item.description = request.form['description']
-            item.price = float(request.form['price'])
-            item.stock = int(request.form['stock'])
-            item.hsn_sac_number = request.form['hsn_sac_number']
-            item.tax_rate = float(request.form['tax_rate'])
-            
+            with inventory_change([item.id]):
+                item.name = request.form['name']
+                item.description = request.form['description']
+                item.price = float(request.form['price'])
+                item.stock = int(request.form['stock'])
+                item.hsn_sac_number = request.form['hsn_sac_number']
+                item.tax_rate = float(request.form['tax_rate'])
+            reference_data_changed('items')
             db.session.commit()
             flash('Item updated successfully!', 'success')
             return redirect(url_for('index'))
@@ -689,7 +1704,12 @@ def quotations():
                 address=request.form.get('new_customer_address'),
                 gstin=request.form.get('new_customer_gstin')
             )
+            lock_dashboard_totals()
             db.session.add(new_customer)
+            dashboard_totals_changed(customers=1)
+            db.session.flush()
+            index_customer(new_customer)
+            reference_data_changed('customers')
             db.session.commit()
             customer_id = new_customer.id
         else:
@@ -719,13 +1739,8 @@ def quotations():
             flash('Customer not found!', 'error')
             return redirect(url_for('quotations'))
         
-        now = datetime.now()
-        month_str = now.strftime('%Y%m')
-        count = Quotation.query.filter(
-            db.extract('year', Quotation.created_at) == now.year,
-            db.extract('month', Quotation.created_at) == now.month
-        ).count() + 1
-        quotation_number = f"Q{month_str}-{count:03d}"
+        created_at = datetime.utcnow()
+        quotation_number = next_quotation_number(created_at)
         
         subtotal = 0
         total_tax = 0
@@ -740,15 +1755,20 @@ def quotations():
             gstin=gstin,
             quotation_number=quotation_number,
             total_amount=0,
-            valid_until=valid_until
+            valid_until=valid_until,
+            created_at=created_at
         )
         db.session.add(quotation)
+        db.session.flush()
         
+        quotation_items = []
+        item_ids = {int(item_id) for item_id in items if item_id.isdigit()}
+        quoted_items = {item.id: item for item in Item.query.filter(Item.id.in_(item_ids))} if item_ids else {}
         for item_id, quantity, price in zip(items, quantities, prices):
             if not price or not quantity:
                 continue
             if int(quantity) > 0:
-                item = Item.query.get(item_id)
+                item = quoted_items.get(int(item_id)) if item_id.isdigit() else None
                 if item:
                     item_tax = item.tax_rate or 0.0
                     item_subtotal = float(price) * int(quantity)
@@ -756,19 +1776,25 @@ def quotations():
                     subtotal += item_subtotal
                     total_tax += item_tax_amount
                     
-                    quotation_item = QuotationItem(
-                        quotation=quotation,
-                        item=item,
-                        quantity=int(quantity),
-                        price=float(price),
-                        tax_rate=item_tax
-                    )
-                    db.session.add(quotation_item)
+                    quotation_items.append({
+                        'quotation_id': quotation.id,
+                        'item_id': item.id,
+                        'quantity': int(quantity),
+                        'price': float(price),
+                        'tax_rate': item_tax
+                    })
+        db.session.bulk_insert_mappings(QuotationItem, quotation_items)
         
         total_amount = subtotal + total_tax
         quotation.total_amount = total_amount
         db.session.commit()
-        
+        quotation = Quotation.query.options(db.selectinload(Quotation.items).joinedload(QuotationItem.item),
+                                            db.joinedload(Quotation.customer))\
+            .filter(Quotation.id == quotation.id).one()
+
+        if wants_async_render():
+            return queue_render(quotation_document(quotation, subtotal, total_tax),
+                                f'quotation_{quotation.id}.pdf')
         pdf_buffer = generate_quotation_pdf(quotation, subtotal, total_tax)
         
         return send_file(
@@ -778,384 +1804,372 @@ def quotations():
             download_name=f'quotation_{quotation.id}.pdf'
         )
     
-    customers = Customer.query.all()
-    items = Item.query.all()
+    customers = customer_choices()
+    items = item_choices()
     return render_template('quotations.html', customers=customers, items=items)
 
+def quotation_document(quotation, subtotal, total_tax):
+    """Describe a quotation as plain data for pdf_renderer.render_document."""
+    return {
+        'kind': 'quotation',
+        'number': quotation.quotation_number,
+        'details': [('Date', quotation.created_at.strftime('%d/%m/%Y')),
+                    ('Valid Until', quotation.valid_until.strftime('%d/%m/%Y'))],
+        'customer': party_details(quotation),
+        'seller': current_settings(),
+        'lines': document_lines(quotation.items),
+        'subtotal': subtotal,
+        'total_tax': total_tax,
+        'total': quotation.total_amount,
+    }
+
 def generate_quotation_pdf(quotation, subtotal, total_tax):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                           rightMargin=20, leftMargin=40, 
-                           topMargin=8, bottomMargin=20)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    primary_color = colors.HexColor('#1A8CFF')
-    secondary_color = colors.HexColor('#424242')
-    accent_color = colors.HexColor('#FF9900')
-    light_bg = colors.HexColor('#F5F5F5')
-    text_color = colors.HexColor('#212121')
-    
-    styles.add(ParagraphStyle(
-        name='CompanyHeader', fontSize=20, leading=24, alignment=1, 
-        fontName='Helvetica', spaceAfter=4, textColor=primary_color))
-    styles.add(ParagraphStyle(
-        name='CompanySubHeader', fontSize=9, leading=11, alignment=0, 
-        fontName='Helvetica', spaceAfter=1, textColor=secondary_color))
-    styles.add(ParagraphStyle(
-        name='NormalText', fontSize=8, leading=10, alignment=0, 
-        fontName='Helvetica', textColor=text_color))
-    styles.add(ParagraphStyle(
-        name='TableHeader', fontSize=9, leading=11, alignment=1, 
-        fontName='Helvetica', textColor=colors.white))
-    styles.add(ParagraphStyle(
-        name='TableCell', fontSize=8, leading=10, alignment=1, 
-        fontName='Helvetica', textColor=text_color))
-    styles.add(ParagraphStyle(
-        name='Footer', fontSize=7, leading=9, alignment=1, 
-        fontName='Helvetica', textColor=secondary_color))
-    styles.add(ParagraphStyle(
-        name='TotalAmount', fontSize=9, leading=11, alignment=2, 
-        fontName='Helvetica', textColor=primary_color))
-    styles.add(ParagraphStyle(
-        name='BillTo', fontSize=9, leading=11, alignment=0, 
-        fontName='Helvetica', textColor=primary_color))
-    styles.add(ParagraphStyle(
-        name='InvoiceInfo', fontSize=9, leading=11, alignment=0, 
-        fontName='Helvetica', textColor=accent_color, 
-        borderColor=accent_color, borderWidth=1, borderPadding=3))
-    
-    settings = Settings.query.first()
-    
-    top_banner = Table([['QUOTATION']], colWidths=[540])
-    top_banner.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, 0), primary_color),
-        ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (0, 0), 14),
-        ('ALIGNMENT', (0, 0), (0, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-        ('TOPPADDING', (0, 0), (0, 0), 4),
-        ('BOTTOMPADDING', (0, 0), (0, 0), 4),
-    ]))
-    elements.append(top_banner)
-
-    logo_path = os.path.join('static', 'logo.png')
-    logo_data = None
-    if os.path.exists(logo_path):
-        img = Image(logo_path, width=40, height=40)
-        logo_data = img
-    else:
-        logo_data = Paragraph("", styles['NormalText'])
-    company_name = settings.company_name if settings and settings.company_name else ""
-    company_name_para = Paragraph(company_name, ParagraphStyle(name='CenteredCompanyName', fontSize=14, leading=18, alignment=0, fontName='Helvetica-Bold', textColor=primary_color))
-    logo_name_row = Table([[logo_data, company_name_para]], colWidths=[42, 200], hAlign='CENTER')
-    logo_name_row.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (1, 0), 'CENTER'),
-        ('VALIGN', (0, 0), (1, 0), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (1, 0), 0),
-        ('RIGHTPADDING', (0, 0), (1, 0), 0),
-        ('TOPPADDING', (0, 0), (1, 0), 0),
-        ('BOTTOMPADDING', (0, 0), (1, 0), 0),
-    ]))
-    elements.append(logo_name_row)
-
-    customer_box_data = []
-    customer_box_data.append([Paragraph("<b>QUOTED TO:</b>", ParagraphStyle(name='BillToMedium', fontSize=12, leading=14, alignment=0, fontName='Helvetica-Bold', textColor=primary_color))])
-    customer_name = quotation.customer.name if quotation.customer else quotation.customer_name
-    if customer_name:
-        customer_box_data.append([Paragraph(f"<b>{customer_name}</b>", ParagraphStyle(name='CustomerMedium', fontSize=11, leading=13, alignment=0, fontName='Helvetica-Bold', textColor=text_color))])
-    if quotation.mobile_number:
-        customer_box_data.append([Paragraph(f"Phone: {quotation.mobile_number}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    if quotation.email:
-        customer_box_data.append([Paragraph(f"Email: {quotation.email}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    if quotation.address:
-        customer_box_data.append([Paragraph(f"Address: {quotation.address}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    if quotation.gstin:
-        customer_box_data.append([Paragraph(f"GSTIN: {quotation.gstin}", ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0, fontName='Helvetica', textColor=text_color))])
-    customer_box = Table(customer_box_data, colWidths=[180])
-    customer_box.setStyle(TableStyle([
-        ('BOX', (0, 0), (-1, -1), 1, primary_color),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
-
-    company_details_content = []
-    company_details_content.append(Paragraph("<b>SELLER'S DETAILS</b>", ParagraphStyle(name='SellerDetailsHeader', fontSize=11, leading=13, alignment=0, fontName='Helvetica-Bold', textColor=primary_color)))
-    if settings:
-        if settings.address:
-            company_details_content.append(Paragraph(f"<b>Address:</b> {settings.address}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.phone:
-            company_details_content.append(Paragraph(f"<b>Tel:</b> {settings.phone}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.email:
-            company_details_content.append(Paragraph(f"<b>Email:</b> {settings.email}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.gstin:
-            company_details_content.append(Paragraph(f"<b>GSTIN:</b> {settings.gstin}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.bank_name:
-            company_details_content.append(Paragraph(f"<b>Bank Name:</b> {settings.bank_name}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.bank_account_number:
-            company_details_content.append(Paragraph(f"<b>Acc No:</b> {settings.bank_account_number}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-        if settings.ifsc_code:
-            company_details_content.append(Paragraph(f"<b>IFSC:</b> {settings.ifsc_code}", ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0, fontName='Helvetica', textColor=secondary_color)))
-    company_details_data = [[detail] for detail in company_details_content]
-    if not company_details_data:
-        company_details_data = [[""]]
-    company_details = Table(company_details_data, colWidths=[300])
-    company_details.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (0, -1), 'MIDDLE'),
-        ('BOX', (0, 0), (-1, -1), 1, primary_color),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
-
-    quotation_date = quotation.created_at.strftime('%d/%m/%Y')
-    quotation_number = quotation.quotation_number
-    valid_until = quotation.valid_until.strftime('%d/%m/%Y')
-    quotation_data = [
-        [Paragraph(f"<b>QUOTATION #{quotation_number}</b>", ParagraphStyle(name='InvoiceLabel', fontSize=11, leading=13, alignment=0, fontName='Helvetica-Bold', textColor=accent_color))],
-        [Paragraph(f"Date: {quotation_date}", styles['NormalText'])],
-        [Paragraph(f"Valid Until: {valid_until}", styles['NormalText'])]
-    ]
-    quotation_box = Table(quotation_data, colWidths=[300])
-    quotation_box.setStyle(TableStyle([
-        ('BOX', (0, 0), (-1, -1), 1, accent_color),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
-
-    stacked_boxes = Table([[company_details], [quotation_box]], colWidths=[300])
-    stacked_boxes.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (0, -1), 'TOP'),
-        ('TOPPADDING', (0, 0), (0, 0), 0),
-        ('BOTTOMPADDING', (0, 0), (0, 0), 2),
-        ('TOPPADDING', (0, 1), (0, 1), 2),
-        ('BOTTOMPADDING', (0, 1), (0, 1), 0),
-    ]))
-
-    info_row = Table([[customer_box, stacked_boxes]], colWidths=[190, 320])
-    info_row.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('VALIGN', (0, 0), (1, 0), 'TOP'),
-        ('LEFTPADDING', (0, 0), (1, 0), 0),
-        ('RIGHTPADDING', (0, 0), (1, 0), 0),
-        ('TOPPADDING', (0, 0), (1, 0), 0),
-        ('BOTTOMPADDING', (0, 0), (1, 0), 0),
-    ]))
-    elements.append(info_row)
-    elements.append(Spacer(1, 10))
-
-    data = [
-        [Paragraph('Item Description', styles['TableHeader']),
-         Paragraph('HSN/SAC', styles['TableHeader']),
-         Paragraph('Qty', styles['TableHeader']),
-         Paragraph('Unit Price', styles['TableHeader']),
-         Paragraph('Tax %', styles['TableHeader']),
-         Paragraph('Tax Amt', styles['TableHeader']),
-         Paragraph('Total', styles['TableHeader'])]
-    ]
-    
-    row_colors = [light_bg, colors.white]
-    row_style_list = [
-        ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-        ('TOPPADDING', (0, 0), (-1, 0), 6),
-    ]
-    
-    for i, item in enumerate(quotation.items):
-        item_tax = item.tax_rate or 0
-        tax_amount = item.price * item.quantity * item_tax / 100
-        total = item.price * item.quantity + tax_amount
-        
-        if i % 2 == 0:
-            row_style_list.append(('BACKGROUND', (0, i+1), (-1, i+1), light_bg))
-        
-        data.append([
-            Paragraph(item.item.name, styles['TableCell']),
-            Paragraph(item.item.hsn_sac_number or '', styles['TableCell']),
-            Paragraph(str(item.quantity), styles['TableCell']),
-            Paragraph(f"{item.price:.2f}", styles['TableCell']),
-            Paragraph(f"{item_tax:.1f}%", styles['TableCell']),
-            Paragraph(f"{tax_amount:.2f}", styles['TableCell']),
-            Paragraph(f"{total:.2f}", styles['TableCell'])
-        ])
-    
-    total_row_index = len(data)
-    
-    data.extend([
-        ['', '', '', '', '', Paragraph('Subtotal:', styles['TableCell']), Paragraph(f"{subtotal:.2f}", styles['TotalAmount'])],
-        ['', '', '', '', '', Paragraph('Total Tax:', styles['TableCell']), Paragraph(f"{total_tax:.2f}", styles['TotalAmount'])],
-        ['', '', '', '', '', Paragraph('TOTAL:', styles['TableHeader']), Paragraph(f"{quotation.total_amount:.2f}", styles['TotalAmount'])]
-    ])
-    
-    row_style_list.extend([
-        ('BACKGROUND', (5, total_row_index), (6, total_row_index), colors.white),
-        ('BACKGROUND', (5, total_row_index+1), (6, total_row_index+1), colors.white),
-        ('BACKGROUND', (5, total_row_index+2), (6, total_row_index+2), colors.white),
-        ('TEXTCOLOR', (5, total_row_index+2), (5, total_row_index+2), text_color),
-        ('TEXTCOLOR', (6, total_row_index+2), (6, total_row_index+2), text_color),
-        ('SPAN', (0, total_row_index), (4, total_row_index)),
-        ('SPAN', (0, total_row_index+1), (4, total_row_index+1)),
-        ('SPAN', (0, total_row_index+2), (4, total_row_index+2)),
-        ('ALIGN', (5, total_row_index), (5, total_row_index+2), 'RIGHT'),
-        ('ALIGN', (6, total_row_index), (6, total_row_index+2), 'RIGHT'),
-        ('LINEABOVE', (5, total_row_index), (6, total_row_index), 0.5, colors.black),
-    ])
-    
-    table = Table(data, colWidths=[150, 70, 50, 70, 50, 70, 120])
-    table.setStyle(TableStyle(row_style_list + [
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        ('TOPPADDING', (0, 1), (-1, -1), 6),
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 20))
-    # Only add the sign image, no header
-    elements.append(Table([["", Image('static/sign.png', width=100, height=50)]], colWidths=[390, 150], hAlign='RIGHT'))
-    elements.append(Spacer(1, 20))
-
-    thank_you = Table([
-        [Paragraph("THANK YOU FOR YOUR BUSINESS!", 
-                   ParagraphStyle(name='ThankYou', fontSize=10, alignment=1, 
-                                 textColor=primary_color, fontName='Helvetica'))],
-    ], colWidths=[540])
-    
-    thank_you.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(thank_you)
-    
-    elements.append(Spacer(1, 5))
-    
-    footer_text = "This is a computer generated quotation, no signature required."
-    
-    footer = Paragraph(footer_text, 
-                      ParagraphStyle(name='MinimalFooter', 
-                                    fontSize=6, 
-                                    leading=8, 
-                                    alignment=1, 
-                                    fontName='Helvetica', 
-                                    textColor=secondary_color))
-    elements.append(footer)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    with metrics.timed_render('quotation'):
+        return render_document(quotation_document(quotation, subtotal, total_tax))
+
+def product_sales_summary(product_id, start=None, end=None):
+    """Totals plus daily and weekly buckets for one item's sales, aggregated in SQL."""
+    revenue = db.func.sum(BillItem.quantity * BillItem.price)
+    base = filter_date_range(
+        db.session.query().select_from(BillItem).join(Bill, BillItem.bill_id == Bill.id)
+        .filter(BillItem.item_id == product_id),
+        Bill.created_at, start, end
+    )
+    quantity, total, customers, bills = base.add_columns(
+        db.func.sum(BillItem.quantity), revenue,
+        db.func.count(db.distinct(Bill.customer_id)), db.func.count(db.distinct(Bill.id))
+    ).one()
+
+    def buckets(granularity):
+        bucket = date_bucket(Bill.created_at, granularity)
+        rows = base.add_columns(bucket, db.func.sum(BillItem.quantity), revenue) \
+            .group_by(bucket).order_by(bucket).all()
+        return [{'start': day.isoformat(), 'quantity': qty, 'revenue': round(amount or 0, 2)}
+                for day, qty, amount in rows]
+
+    return {
+        'item_id': product_id,
+        'start': start.date().isoformat() if start else None,
+        'end': end.date().isoformat() if end else None,
+        'total_quantity': quantity or 0,
+        'revenue': round(total or 0, 2),
+        'distinct_customers': customers,
+        'bill_count': bills,
+        'daily': buckets('day'),
+        'weekly': buckets('week'),
+    }
+
+def store_summary(row):
+    """Save a computed summary row, dropping its table's oldest rows beyond SUMMARY_CACHE_MAX_ROWS.
+
+    Summaries are keyed on caller-chosen date ranges, so without the cap every distinct range ever
+    requested would stay in the table.
+    """
+    model = type(row)
+    try:
+        db.session.merge(row)
+        cutoff = db.session.query(model.computed_at).order_by(model.computed_at.desc()) \
+            .offset(app.config['SUMMARY_CACHE_MAX_ROWS']).limit(1).scalar()
+        if cutoff is not None:
+            model.query.filter(model.computed_at <= cutoff).delete(synchronize_session=False)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+def cached_product_sales_summary(product_id, start=None, end=None):
+    """product_sales_summary, reused until a bill touching the item changes (see product_sales_changed)."""
+    range_key = ':'.join(value.date().isoformat() if value else '' for value in (start, end))
+    version = cache_version(f'product_sales:{product_id}')
+    cached = db.session.get(ProductSalesSummary, (product_id, range_key))
+    if cached is not None and cached.version == version:
+        return json.loads(cached.payload)
+    summary = product_sales_summary(product_id, start, end)
+    # Stored under the version read before computing, so a concurrent bill write makes it stale
+    store_summary(ProductSalesSummary(item_id=product_id, range_key=range_key, version=version,
+                                      payload=json.dumps(summary), computed_at=datetime.utcnow()))
+    return summary
 
 @app.route('/api/product_sales/<int:product_id>')
+@replica_read
 def product_sales(product_id):
-    sales = db.session.query(
-        BillItem,
-        Bill,
-        Customer
+    start, end = parse_date_arg('start'), parse_date_arg('end')
+    if request.args.get('summary') in ('1', 'true'):
+        return jsonify(cached_product_sales_summary(product_id, start, end))
+
+    limit = page_size()
+    query = db.session.query(
+        BillItem.id, BillItem.quantity, BillItem.price,
+        Bill.created_at, Bill.invoice_number, Bill.customer_name, Customer.name.label('customer')
     ).join(
         Bill, BillItem.bill_id == Bill.id
     ).outerjoin(
         Customer, Bill.customer_id == Customer.id
     ).filter(
         BillItem.item_id == product_id
-    ).order_by(
-        Bill.created_at.desc()
-    ).all()
-    
-    sales_data = []
-    for bill_item, bill, customer in sales:
-        sales_data.append({
-            'date': bill.created_at.isoformat(),
-            'invoice_number': bill.invoice_number,
-            'customer_name': customer.name if customer else bill.customer_name,
-            'quantity': bill_item.quantity,
-            'price': bill_item.price,
-            'total': bill_item.quantity * bill_item.price
-        })
-    
-    return jsonify(sales_data)
+    )
+    query = filter_date_range(query, Bill.created_at, start, end)
+
+    cursor = decode_cursor(request.args.get('cursor'))
+    if cursor and len(cursor) == 2:
+        try:
+            key = (datetime.fromisoformat(cursor[0]), int(cursor[1]))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.tuple_(Bill.created_at, BillItem.id) < key)
+
+    rows = query.order_by(Bill.created_at.desc(), BillItem.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        'sales': [{
+            'date': row.created_at.isoformat(),
+            'invoice_number': row.invoice_number,
+            'customer_name': row.customer or row.customer_name,
+            'quantity': row.quantity,
+            'price': row.price,
+            'total': row.quantity * row.price
+        } for row in rows],
+        'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+        'has_more': has_more
+    })
+
+ANALYTICS_GRANULARITIES = ('day', 'week', 'month')
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+def last_months(end, count):
+    """The first day of the month `count - 1` months before end's month."""
+    month = end.replace(day=1)
+    for _ in range(count - 1):
+        month = (month - timedelta(days=1)).replace(day=1)
+    return month
+
+def rollup_spans(start, end, today):
+    """Split the dates [start, end] into a (first, last) span of whole months, or None, and leftover day spans.
+
+    A month counts as whole once the range reaches today, as no bill is dated later.
+    """
+    first_month = start if start.day == 1 else next_month(start)
+    # The month after the last whole one
+    if end >= today or next_month(end) - timedelta(days=1) == end:
+        stop_month = next_month(end)
+    else:
+        stop_month = end.replace(day=1)
+    if first_month >= stop_month:
+        return None, [(start, end)]
+    days = []
+    if start < first_month:
+        days.append((start, first_month - timedelta(days=1)))
+    if stop_month <= end:
+        days.append((stop_month, end))
+    return (first_month, (stop_month - timedelta(days=1)).replace(day=1)), days
+
+def rollup_totals(daily, monthly, key, measures, start, end, order_by=None, limit=None):
+    """Sum `measures` per `key` over [start, end]; with order_by, only the `limit` largest positive sums."""
+    months, days = rollup_spans(start, end, datetime.utcnow().date())
+    parts = []
+    if months:
+        parts.append(db.select(getattr(monthly, key).label('key'), *(getattr(monthly, m).label(m) for m in measures))
+                     .where(monthly.month.between(*months)))
+    for first, last in days:
+        parts.append(db.select(getattr(daily, key).label('key'), *(getattr(daily, m).label(m) for m in measures))
+                     .where(daily.day.between(first, last)))
+    rows = (parts[0] if len(parts) == 1 else db.union_all(*parts)).subquery()
+    query = db.session.query(rows.c.key, *(db.func.sum(rows.c[m]).label(m) for m in measures)).group_by(rows.c.key)
+    if order_by:
+        ordering = db.func.sum(rows.c[order_by])
+        query = query.having(ordering > 0).order_by(ordering.desc(), rows.c.key).limit(limit)
+    return query.all()
+
+def sales_analytics(start, end, granularity, limit):
+    """Sales series, top items and customers and the payment-mode mix for the dates [start, end], from rollups.
+
+    Amounts: `total` is what was billed (tax included), `revenue` is before tax and `tax` the difference.
+    """
+    def amounts(total, tax):
+        return {'total': round(total or 0, 2), 'revenue': round((total or 0) - (tax or 0), 2), 'tax': round(tax or 0, 2)}
+
+    in_range = DailyPaymentSales.day.between(start, end)
+    bucket = date_bucket(DailyPaymentSales.day, granularity)
+    series = [dict(start=first.isoformat(), bills=bills, **amounts(total, tax))
+              for first, total, tax, bills in db.session.query(
+                  bucket, db.func.sum(DailyPaymentSales.total_amount), db.func.sum(DailyPaymentSales.tax_amount),
+                  db.func.sum(DailyPaymentSales.bill_count)
+              ).filter(in_range).group_by(bucket).order_by(bucket)]
+    modes = db.session.query(
+        DailyPaymentSales.payment_mode, db.func.sum(DailyPaymentSales.total_amount),
+        db.func.sum(DailyPaymentSales.tax_amount), db.func.sum(DailyPaymentSales.bill_count)
+    ).filter(in_range).group_by(DailyPaymentSales.payment_mode).all()
+    total = sum(row[1] for row in modes)
+    tax = sum(row[2] for row in modes)
+    bills = sum(row[3] for row in modes)
+    payment_modes = sorted(({'payment_mode': mode or None, 'total': round(amount, 2), 'bills': count,
+                             'share': round(amount / total, 4) if total else 0.0}
+                            for mode, amount, _, count in modes), key=lambda row: -row['total'])
+
+    # Items number in the thousands, so their totals are ranked here both ways from one query
+    items = [row for row in rollup_totals(DailyItemSales, MonthlyItemSales, 'item_id', ('quantity', 'revenue'),
+                                          start, end) if row.quantity > 0]
+
+    def top_items(measure):
+        return [{'item_id': row.key, 'quantity': row.quantity, 'revenue': round(row.revenue, 2)}
+                for row in heapq.nlargest(limit, items, key=lambda row: (getattr(row, measure), -row.key))]
+
+    customers = rollup_totals(DailyCustomerSales, MonthlyCustomerSales, 'customer_id', ('total_amount', 'bill_count'),
+                              start, end, order_by='total_amount', limit=limit)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'totals': dict(bills=bills, average_bill=round(total / bills, 2) if bills else 0.0, **amounts(total, tax)),
+        'series': series,
+        'top_items_by_revenue': top_items('revenue'),
+        'top_items_by_quantity': top_items('quantity'),
+        'top_customers': [{'customer_id': row.key, 'total': round(row.total_amount, 2), 'bills': row.bill_count}
+                          for row in customers],
+        'payment_modes': payment_modes,
+    }
+
+def sales_analytics_version(start, end):
+    """Sum of the 'sales:YYYY-MM' versions of the months in [start, end]; any bill write in them raises it."""
+    names, month = [], start.replace(day=1)
+    while month <= end:
+        names.append(f'sales:{month:%Y-%m}')
+        month = next_month(month)
+    return db.session.query(db.func.coalesce(db.func.sum(CacheVersion.version), 0))\
+        .filter(CacheVersion.name.in_(names)).scalar()
+
+def cached_sales_analytics(start, end, granularity, limit):
+    """sales_analytics, reused until a bill in one of the range's months changes (see record_bill_analytics)."""
+    key = (f'{start.isoformat()}:{end.isoformat()}', granularity, limit)
+    version = sales_analytics_version(start, end)
+    cached = db.session.get(SalesAnalyticsSummary, key)
+    if cached is not None and cached.version == version:
+        return json.loads(cached.payload)
+    summary = sales_analytics(start, end, granularity, limit)
+    store_summary(SalesAnalyticsSummary(range_key=key[0], granularity=granularity, top=limit, version=version,
+                                        payload=json.dumps(summary), computed_at=datetime.utcnow()))
+    return summary
+
+@app.route('/api/analytics/sales')
+@replica_read
+def sales_analytics_api():
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ANALYTICS_GRANULARITIES:
+        return jsonify({'error': f'Unsupported granularity: {granularity}'}), 400
+    end = (parse_date_arg('end') or datetime.utcnow()).date()
+    start = parse_date_arg('start')
+    # By default the last 12 calendar months, which are served from the monthly rollups alone
+    start = start.date() if start else last_months(end, 12)
+    if start > end:
+        return jsonify({'error': 'start is after end'}), 400
+    summary = cached_sales_analytics(start, end, granularity, page_size(default=10, maximum=100))
+
+    # Names are looked up per request, so renaming an item or customer needs no invalidation
+    item_ids = {row['item_id'] for key in ('top_items_by_revenue', 'top_items_by_quantity') for row in summary[key]}
+    item_names = dict(db.session.query(Item.id, Item.name).filter(Item.id.in_(item_ids))) if item_ids else {}
+    customer_ids = [row['customer_id'] for row in summary['top_customers']]
+    customer_names = dict(db.session.query(Customer.id, Customer.name).filter(Customer.id.in_(customer_ids))) \
+        if customer_ids else {}
+    for key in ('top_items_by_revenue', 'top_items_by_quantity'):
+        for row in summary[key]:
+            row['name'] = item_names.get(row['item_id'])
+    for row in summary['top_customers']:
+        row['name'] = customer_names.get(row['customer_id'])
+    return jsonify(summary)
+
+EXPORT_BATCH_SIZE = 1000
+
+def parse_datetime_arg(name):
+    """Read an ISO date or datetime query argument (YYYY-MM-DD[THH:MM[:SS]]), or None."""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def format_timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+def stream_csv(header, rows, batch_size=EXPORT_BATCH_SIZE):
+    """Yield CSV text one batch of rows at a time."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def export_csv(filename, header, query, created_at, format_row):
+    """Stream `query` (a column projection) as a CSV download.
+
+    stream_results asks the driver for a server-side cursor and yield_per
+    fetches in batches, so memory stays O(batch) however large the table is.
+    `start`/`end` limit created_at to a date range and `since` to rows created
+    strictly after an ISO timestamp, for incremental exports.
+    """
+    query = filter_date_range(query, created_at, parse_date_arg('start'), parse_date_arg('end'))
+    since = parse_datetime_arg('since')
+    if since:
+        query = query.filter(created_at > since)
+    rows = (format_row(row) for row in
+            query.execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE))
+    return Response(stream_with_context(stream_csv(header, rows)), mimetype='text/csv',
+                    headers={"Content-Disposition": f"attachment;filename={filename}"})
 
 @app.route('/export/bills')
+@replica_read
 def export_bills():
-    import csv
-    from io import StringIO
-    bills = Bill.query.order_by(Bill.created_at.desc()).all()
-    si = StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['Invoice Number', 'Customer Name', 'Date', 'Total Amount', 'Payment Mode'])
-    for bill in bills:
-        cw.writerow([
-            bill.invoice_number,
-            bill.customer_name,
-            bill.created_at.strftime('%Y-%m-%d %H:%M'),
-            bill.total_amount,
-            bill.payment_mode
-        ])
-    output = si.getvalue()
-    return Response(output, mimetype='text/csv', headers={"Content-Disposition": "attachment;filename=bills.csv"})
+    # Newest first, as before exports were streamed; the id tiebreak keeps the order stable and
+    # ix_bill_created_at_id serves (created_at desc, id desc) by scanning backwards
+    query = db.session.query(Bill.invoice_number, Bill.customer_name, Bill.created_at, Bill.total_amount,
+                             Bill.payment_mode).order_by(Bill.created_at.desc(), Bill.id.desc())
+    return export_csv(
+        'bills.csv',
+        ['Invoice Number', 'Customer Name', 'Date', 'Total Amount', 'Payment Mode'],
+        query, Bill.created_at,
+        lambda bill: [bill.invoice_number, bill.customer_name, format_timestamp(bill.created_at),
+                      bill.total_amount, bill.payment_mode]
+    )
 
 @app.route('/export/customers')
+@replica_read
 def export_customers():
-    import csv
-    from io import StringIO
-    customers = Customer.query.order_by(Customer.name).all()
-    si = StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['Name', 'Phone', 'Email', 'Address', 'GSTIN', 'Created At'])
-    for c in customers:
-        cw.writerow([
-            c.name,
-            c.phone,
-            c.email,
-            c.address,
-            c.gstin,
-            c.created_at.strftime('%Y-%m-%d %H:%M')
-        ])
-    output = si.getvalue()
-    return Response(output, mimetype='text/csv', headers={"Content-Disposition": "attachment;filename=customers.csv"})
+    query = db.session.query(Customer.name, Customer.phone, Customer.email, Customer.address, Customer.gstin,
+                             Customer.created_at).order_by(Customer.name, Customer.id)
+    return export_csv(
+        'customers.csv',
+        ['Name', 'Phone', 'Email', 'Address', 'GSTIN', 'Created At'],
+        query, Customer.created_at,
+        lambda c: [c.name, c.phone, c.email, c.address, c.gstin, format_timestamp(c.created_at)]
+    )
 
 @app.route('/export/inventory')
+@replica_read
 def export_inventory():
-    import csv
-    from io import StringIO
-    items = Item.query.order_by(Item.name).all()
-    si = StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['Name', 'Description', 'Price', 'Stock', 'HSN/SAC Number', 'Tax Rate', 'Created At'])
-    for item in items:
-        cw.writerow([
-            item.name,
-            item.description,
-            item.price,
-            item.stock,
-            item.hsn_sac_number,
-            item.tax_rate,
-            item.created_at.strftime('%Y-%m-%d %H:%M')
-        ])
-    output = si.getvalue()
-    return Response(output, mimetype='text/csv', headers={"Content-Disposition": "attachment;filename=inventory.csv"})
+    query = db.session.query(Item.name, Item.description, Item.price, Item.stock, Item.hsn_sac_number,
+                             Item.tax_rate, Item.created_at).order_by(Item.name, Item.id)
+    return export_csv(
+        'inventory.csv',
+        ['Name', 'Description', 'Price', 'Stock', 'HSN/SAC Number', 'Tax Rate', 'Created At'],
+        query, Item.created_at,
+        lambda item: [item.name, item.description, item.price, item.stock, item.hsn_sac_number,
+                      item.tax_rate, format_timestamp(item.created_at)]
+    )
 
 @app.route('/view_bill/<int:bill_id>')
 def view_bill(bill_id):
-    bill = Bill.query.get_or_404(bill_id)
+    bill = get_bill_or_404(bill_id)
     subtotal = sum(item.price * item.quantity for item in bill.items)
     total_tax = sum(item.price * item.quantity * (item.tax_rate or 0) / 100 for item in bill.items)
-    settings = Settings.query.first()
+    settings = current_settings()
     return render_template('view_bill.html', bill=bill, subtotal=subtotal, total_tax=total_tax, settings=settings)
 
 @app.route('/delete_bill/<int:id>', methods=['POST'])
@@ -1171,18 +2185,29 @@ def delete_bill(id):
             flash('Cannot delete bill that has already been processed!', 'danger')
             return redirect(url_for('view_bills'))
             
+        # Delete the lines and the bill first, so concurrent requests can't both restore its stock
+        lines = bill_lines(bill)
+        restored = claim_bill_lines(bill)
+        deleted = Bill.query.filter(Bill.id == id, Bill.inventory_updated.isnot(True))\
+            .delete(synchronize_session=False)
+        if restored is None or not deleted:
+            db.session.rollback()
+            flash('The bill was changed or processed by another request. Please try again.', 'danger')
+            return redirect(url_for('view_bills'))
+
         # Restore item stock
-        for bill_item in bill.items:
-            item = Item.query.get(bill_item.item_id)
-            if item:
-                item.stock += bill_item.quantity
-            else:
-                flash(f'Warning: Item ID {bill_item.item_id} not found while restoring stock', 'warning')
-                
-        # Delete bill items and bill
-        for item in bill.items:
-            db.session.delete(item)
-        db.session.delete(bill)
+        existing = set(restored)
+        if return_stock(restored) < len(restored):
+            existing = {item_id for (item_id,) in db.session.query(Item.id).filter(Item.id.in_(restored))}
+        for item_id in restored:
+            if item_id not in existing:
+                flash(f'Warning: Item ID {item_id} not found while restoring stock', 'warning')
+
+        record_sales(bill.created_at, -bill.total_amount, -1)
+        record_bill_analytics(bill.created_at, bill.customer_id, bill.payment_mode, bill.total_amount, lines,
+                              sign=-1)
+        product_sales_changed(restored)
+        db.session.expunge(bill)
         db.session.commit()
         flash('Bill deleted successfully!', 'success')
     except Exception as e:
@@ -1211,7 +2236,9 @@ def delete_item(id):
             flash('Cannot delete item as it is associated with existing quotations!', 'danger')
             return redirect(url_for('index'))
             
-        db.session.delete(item)
+        with inventory_change([item.id]):
+            db.session.delete(item)
+        reference_data_changed('items')
         db.session.commit()
         flash('Item deleted successfully!', 'success')
     except Exception as e:
@@ -1230,7 +2257,15 @@ def force_delete_item(id):
         # Set item_id to NULL in BillItem and QuotationItem
         BillItem.query.filter_by(item_id=id).update({BillItem.item_id: None})
         QuotationItem.query.filter_by(item_id=id).update({QuotationItem.item_id: None})
-        db.session.delete(item)
+        # Its sales stay in the totals but it drops out of the top items
+        sales_months_changed(month for (month,) in
+                             db.session.query(MonthlyItemSales.month).filter(MonthlyItemSales.item_id == id))
+        DailyItemSales.query.filter_by(item_id=id).delete()
+        MonthlyItemSales.query.filter_by(item_id=id).delete()
+        product_sales_changed([id])
+        reference_data_changed('items')
+        with inventory_change([id]):
+            db.session.delete(item)
         db.session.commit()
         flash('Item force deleted. Related records will show "Not Available".', 'warning')
     except Exception as e:
@@ -1238,6 +2273,292 @@ def force_delete_item(id):
         flash(f'Error force deleting item: {str(e)}', 'danger')
     return redirect(url_for('index'))
 
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_ERROR_SAMPLE = 5
+
+class ImportRowError(ValueError):
+    pass
+
+def _import_number(row, field, kind):
+    value = row.get(field)
+    if value is None or value.strip() == '':
+        return None
+    try:
+        return kind(value)
+    except ValueError:
+        raise ImportRowError(f'{field} must be {"a whole number" if kind is int else "a number"}, got {value!r}')
+
+def parse_import_row(row):
+    """Validate one CSV row. Absent or empty fields come back as None, meaning "keep the current value"."""
+    name = row.get('name')
+    if not name or not name.strip():
+        raise ImportRowError('name is required')
+    return {
+        'name': name,
+        'description': row.get('description') or '',
+        'price': _import_number(row, 'price', float),
+        'stock': _import_number(row, 'stock', int),
+        'hsn_sac_number': (row.get('hsn_sac_number') or '').strip() or None,
+        'tax_rate': _import_number(row, 'tax_rate', float),
+    }
+
+# Existing items: add to stock and overwrite only the fields the row provides
+_item_table = Item.__table__
+ITEM_IMPORT_UPDATE = _item_table.update().where(_item_table.c.id == db.bindparam('item_id')).values(
+    price=db.func.coalesce(db.bindparam('price'), _item_table.c.price),
+    stock=_item_table.c.stock + db.bindparam('stock'),
+    hsn_sac_number=db.func.coalesce(db.bindparam('hsn_sac_number'), _item_table.c.hsn_sac_number),
+    tax_rate=db.func.coalesce(db.bindparam('tax_rate'), _item_table.c.tax_rate),
+)
+
+class ItemImport:
+    """Batched upsert of CSV item rows keyed on (name, description).
+
+    The (name, description) -> id index is loaded in one query up front.
+    Each chunk becomes one executemany UPDATE for existing items plus one bulk
+    INSERT for new ones, and is committed on its own. Rows that fail
+    validation are appended to an error CSV (line number, message and the
+    original columns) instead of aborting the import. In dry-run mode nothing
+    is written and the counts say what the import would do.
+    """
+
+    def __init__(self, dry_run=False, error_path=None, chunk_size=IMPORT_CHUNK_SIZE):
+        self.dry_run = dry_run
+        self.error_path = error_path
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.added = 0
+        self.updated = 0
+        self.error_count = 0
+        self.error_sample = []
+        self.index = {}
+        self._last_id = 0
+        self._load_index()
+
+    def _load_index(self, after_id=0):
+        query = db.session.query(Item.id, Item.name, Item.description).filter(Item.id > after_id)
+        for item_id, name, description in query:
+            self.index[(name, description)] = item_id
+            self._last_id = max(self._last_id, item_id)
+
+    def run(self, reader, after_line=0):
+        """Import every row of a csv.DictReader that ends after line `after_line`."""
+        self._chunk_started = time.perf_counter()
+        chunk = []
+        for row in reader:
+            if reader.line_num <= after_line:
+                continue
+            chunk.append((reader.line_num, row))
+            if len(chunk) == self.chunk_size:
+                self._timed_apply(chunk)
+                chunk = []
+        if chunk:
+            self._timed_apply(chunk)
+
+    def _timed_apply(self, chunk):
+        counts = (self.added, self.updated, self.error_count)
+        self.apply(chunk)
+        now = time.perf_counter()
+        # Measured from the end of the previous chunk, so reading and parsing the CSV count too
+        started, self._chunk_started = self._chunk_started, now
+        if not self.dry_run:
+            metrics.observe_import_chunk(self.added - counts[0], self.updated - counts[1],
+                                         self.error_count - counts[2], now - started)
+
+    def apply(self, chunk):
+        """Validate and write one chunk of (line number, row) pairs, then commit."""
+        inserts = {}
+        updates = {}
+        errors = []
+        for line, row in chunk:
+            self.rows += 1
+            try:
+                values = parse_import_row(row)
+            except ImportRowError as e:
+                errors.append((line, str(e), row))
+                continue
+            key = (values['name'], values['description'])
+            item_id = self.index.get(key)
+            if key not in self.index and key not in inserts:
+                self.added += 1
+                inserts[key] = {
+                    'name': values['name'],
+                    'description': values['description'],
+                    'price': values['price'] or 0.0,
+                    'stock': values['stock'] or 0,
+                    'hsn_sac_number': values['hsn_sac_number'],
+                    'tax_rate': values['tax_rate'] or 0.0,
+                }
+                if self.dry_run:
+                    # Later rows with this key count as updates, as they would in a real import
+                    self.index[key] = None
+                continue
+            self.updated += 1
+            if item_id is None:
+                pending = inserts.get(key)
+                if pending is None:  # dry run: inserted by an earlier chunk
+                    continue
+            else:
+                pending = updates.setdefault(item_id, {'item_id': item_id, 'price': None, 'stock': 0,
+                                                       'hsn_sac_number': None, 'tax_rate': None})
+            pending['stock'] += values['stock'] or 0
+            for field in ('price', 'hsn_sac_number', 'tax_rate'):
+                if values[field] is not None:
+                    pending[field] = values[field]
+
+        self._record_errors(errors)
+        if not self.dry_run and (updates or inserts):
+            with inventory_change(updates):
+                if updates:
+                    db.session.execute(ITEM_IMPORT_UPDATE, list(updates.values()))
+            if inserts:
+                db.session.bulk_insert_mappings(Item, list(inserts.values()))
+                dashboard_totals_changed(value=sum(row['price'] * row['stock'] for row in inserts.values()))
+            reference_data_changed('items')
+        self.checkpoint(chunk[-1][0])
+        db.session.commit()
+        if inserts and not self.dry_run:
+            self._load_index(after_id=self._last_id)
+
+    def checkpoint(self, last_line):
+        """Called inside each chunk's transaction, just before it commits."""
+
+    def _record_errors(self, errors):
+        if not errors:
+            return
+        self.error_count += len(errors)
+        for line, message, row in errors[:IMPORT_ERROR_SAMPLE - len(self.error_sample)]:
+            self.error_sample.append((line, message))
+        if self.error_path is None:
+            return
+        os.makedirs(os.path.dirname(self.error_path), exist_ok=True)
+        new_file = not os.path.exists(self.error_path)
+        with open(self.error_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            # Extra cells beyond the header land under the None key; the report keeps the named columns
+            fields = [field for field in errors[0][2] if field is not None]
+            if new_file:
+                writer.writerow(['line', 'error'] + fields)
+            for line, message, row in errors:
+                writer.writerow([line, message] + [row.get(field) for field in fields])
+
+def import_error_path(report_id):
+    return os.path.join(app.config['IMPORT_DIR'], f'{secure_filename(report_id)}-errors.csv')
+
+def import_upload_path(job_id):
+    return os.path.join(app.config['IMPORT_DIR'], f'{secure_filename(job_id)}.csv')
+
+# A running job whose heartbeat is older than this is assumed dead and may be resumed
+IMPORT_STALL_SECONDS = 120
+
+class ItemImportJob(ItemImport):
+    """ItemImport that resumes from, and checkpoints to, an ImportJob row."""
+
+    def __init__(self, job, chunk_size=IMPORT_CHUNK_SIZE):
+        super().__init__(dry_run=job.dry_run, error_path=import_error_path(job.id), chunk_size=chunk_size)
+        self.job = job
+        self.rows, self.added, self.updated = job.rows, job.added, job.updated
+        self.error_count = job.error_count
+        self.error_sample = [tuple(error) for error in json.loads(job.error_sample or '[]')]
+        self._elapsed = job.elapsed
+        self._started = time.perf_counter()
+        # Drop error lines written by a chunk that never committed
+        if os.path.exists(self.error_path):
+            with open(self.error_path, 'r+b') as f:
+                f.truncate(job.error_bytes)
+
+    def checkpoint(self, last_line):
+        job = self.job
+        job.line_num = last_line
+        job.rows, job.added, job.updated = self.rows, self.added, self.updated
+        job.error_count = self.error_count
+        job.error_sample = json.dumps(self.error_sample)
+        job.error_bytes = os.path.getsize(self.error_path) if os.path.exists(self.error_path) else 0
+        job.elapsed = self._elapsed + time.perf_counter() - self._started
+        job.heartbeat_at = datetime.utcnow()
+
+def spool_import(file, dry_run=False):
+    """Save an uploaded CSV to disk and queue an ImportJob for it."""
+    job = ImportJob(id=uuid.uuid4().hex, filename=file.filename, dry_run=dry_run)
+    os.makedirs(app.config['IMPORT_DIR'], exist_ok=True)
+    path = import_upload_path(job.id)
+    file.save(path)
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            lines += block.count(b'\n')
+    job.total_rows = max(lines - 1, 0)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def claim_import_job(job_id):
+    """Atomically take a queued, failed or stalled job; False if another worker holds it."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=IMPORT_STALL_SECONDS)
+    claimed = ImportJob.query.filter(
+        ImportJob.id == job_id,
+        db.or_(ImportJob.status.in_(['queued', 'failed']),
+               db.and_(ImportJob.status == 'running', ImportJob.heartbeat_at < stale))
+    ).update({'status': 'running', 'heartbeat_at': now, 'message': None}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def run_import_job(job_id):
+    """Process a spooled import from its last committed chunk. Returns False if it could not be claimed."""
+    if not claim_import_job(job_id):
+        return False
+    job = db.session.get(ImportJob, job_id)
+    importer = ItemImportJob(job)
+    try:
+        with open(import_upload_path(job_id), newline='', encoding='utf-8') as f:
+            importer.run(csv.DictReader(f), after_line=job.line_num)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'failed'
+        job.message = str(e)[:500]
+        db.session.commit()
+        app.logger.exception('Import job %s failed at line %s', job_id, job.line_num)
+        return True
+    job.status = 'done'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    os.remove(import_upload_path(job_id))
+    return True
+
+def start_import_worker(job_id):
+    def work():
+        with app.app_context():
+            try:
+                run_import_job(job_id)
+            finally:
+                db.session.remove()
+    threading.Thread(target=work, name=f'import-{job_id}', daemon=True).start()
+
+def import_job_progress(job):
+    status = job.status
+    if status == 'running' and job.heartbeat_at < datetime.utcnow() - timedelta(seconds=IMPORT_STALL_SECONDS):
+        status = 'stalled'
+    rate = job.rows / job.elapsed if job.elapsed else 0.0
+    remaining = max(job.total_rows - job.rows, 0)
+    return {
+        'id': job.id,
+        'filename': job.filename,
+        'dry_run': job.dry_run,
+        'status': status,
+        'rows': job.rows,
+        'total_rows': job.total_rows,
+        'added': job.added,
+        'updated': job.updated,
+        'errors': job.error_count,
+        'error_sample': json.loads(job.error_sample or '[]'),
+        'error_report': url_for('import_errors', report_id=job.id) if job.error_count else None,
+        'rows_per_sec': round(rate, 1),
+        'eta_seconds': round(remaining / rate) if rate and status in ('queued', 'running') else None,
+        'message': job.message,
+    }
+
 @app.route('/import_items', methods=['GET', 'POST'])
 def import_items():
     if request.method == 'POST':
@@ -1248,56 +2569,59 @@ def import_items():
         if file.filename == '':
             flash('No selected file', 'danger')
             return redirect(request.url)
+        if file and file.filename.endswith('.csv') and request.form.get('background'):
+            job = spool_import(file, dry_run=bool(request.form.get('dry_run')))
+            if app.config['IMPORT_WORKER'] == 'thread':
+                start_import_worker(job.id)
+            return redirect(url_for('import_job', job_id=job.id))
         if file and file.filename.endswith('.csv'):
             stream = TextIOWrapper(file.stream, encoding='utf-8')
-            csv_reader = csv.DictReader(stream)
-            items_updated = 0
-            items_added = 0
-            
-            for row in csv_reader:
-                print(f"Processing row: {row}")
-                if 'name' not in row:
-                    print(f"Skipping row due to missing 'name': {row}")
-                    continue
-                try:
-                    # Check if item exists with same name AND description
-                    existing_item = Item.query.filter_by(
-                        name=row['name'],
-                        description=row.get('description', '')
-                    ).first()
-                    
-                    if existing_item:
-                        # Update existing item
-                        existing_item.price = float(row.get('price', existing_item.price))
-                        existing_item.stock += int(row.get('stock', 0))  # Add to existing stock
-                        existing_item.hsn_sac_number = row.get('hsn_sac_number', existing_item.hsn_sac_number)
-                        existing_item.tax_rate = float(row.get('tax_rate', existing_item.tax_rate))
-                        items_updated += 1
-                    else:
-                        # Create new item
-                        item = Item(
-                            name=row['name'],
-                            description=row.get('description', ''),
-                            price=float(row.get('price', 0)),
-                            stock=int(row.get('stock', 0)),
-                            hsn_sac_number=row.get('hsn_sac_number', None),
-                            tax_rate=float(row.get('tax_rate', 0.0))
-                        )
-                        db.session.add(item)
-                        items_added += 1
-                except Exception as e:
-                    print(f"Error processing row {row}: {e}")
-                    flash(f'Error processing item {row.get("name", "Unknown")}: {str(e)}', 'danger')
-                    continue
-            
-            db.session.commit()
-            flash(f'Import completed: {items_added} new items added, {items_updated} items updated', 'success')
-            return redirect(url_for('index'))
+            report_id = uuid.uuid4().hex
+            job = ItemImport(dry_run=bool(request.form.get('dry_run')), error_path=import_error_path(report_id))
+            try:
+                job.run(csv.DictReader(stream))
+            except Exception as e:
+                db.session.rollback()
+                flash(f'Import stopped after {job.rows} rows ({job.added} added, {job.updated} updated '
+                      f'were saved): {str(e)}', 'danger')
+                return redirect(request.url)
+            if not job.dry_run and not job.error_count:
+                flash(f'Import completed: {job.added} new items added, {job.updated} items updated', 'success')
+                return redirect(url_for('index'))
+            return render_template('import_items.html', job=job, report_id=report_id)
         else:
             flash('Please upload a valid CSV file', 'danger')
             return redirect(request.url)
     return render_template('import_items.html')
 
+@app.route('/import_jobs/<job_id>')
+def import_job(job_id):
+    job = ImportJob.query.get_or_404(job_id)
+    return render_template('import_job.html', job=job, progress=import_job_progress(job))
+
+@app.route('/import_jobs/<job_id>/progress')
+def import_job_status(job_id):
+    return jsonify(import_job_progress(ImportJob.query.get_or_404(job_id)))
+
+@app.route('/import_jobs/<job_id>/resume', methods=['POST'])
+def resume_import_job(job_id):
+    job = ImportJob.query.get_or_404(job_id)
+    if import_job_progress(job)['status'] in ('queued', 'failed', 'stalled'):
+        # The worker's claim_import_job still guarantees only one process picks it up
+        start_import_worker(job_id)
+        flash('Import resumed from the last saved chunk.', 'success')
+    else:
+        flash('This import is still running or already finished.', 'warning')
+    return redirect(url_for('import_job', job_id=job_id))
+
+@app.route('/import_items/errors/<report_id>')
+def import_errors(report_id):
+    path = import_error_path(report_id)
+    if not os.path.exists(path):
+        flash('That error report is no longer available', 'warning')
+        return redirect(url_for('import_items'))
+    return send_file(path, mimetype='text/csv', as_attachment=True, download_name='import_errors.csv')
+
 @app.route('/preview_bill/<int:bill_id>')
 def preview_bill(bill_id):
     bill = Bill.query.get_or_404(bill_id)
@@ -1305,20 +2629,19 @@ def preview_bill(bill_id):
 
 @app.route('/edit_bill/<int:bill_id>', methods=['GET', 'POST'])
 def edit_bill(bill_id):
-    bill = Bill.query.get_or_404(bill_id)
-    items = Item.query.all()
-    customers = Customer.query.order_by(Customer.name).all()
+    bill = get_bill_or_404(bill_id)
     if request.method == 'POST':
         try:
-            # Restore stock for old items
-            for bill_item in bill.items:
-                item = Item.query.get(bill_item.item_id)
-                if item:
-                    item.stock += bill_item.quantity
-            # Remove old bill items
-            for bill_item in bill.items:
-                db.session.delete(bill_item)
-            db.session.flush()
+            old_total = bill.total_amount
+            old_pdf_key = pdf_cache.key(bill_pdf_document(bill))
+            old_sale = (bill.created_at, bill.customer_id, bill.payment_mode, bill.total_amount, bill_lines(bill))
+            # Remove the old lines, then restore their stock
+            old_quantities = claim_bill_lines(bill)
+            if old_quantities is None:
+                db.session.rollback()
+                flash('The bill was changed by another request. Please review it and try again.', 'danger')
+                return redirect(url_for('edit_bill', bill_id=bill_id))
+            return_stock(old_quantities)
 
             # Update bill details
             customer_id = request.form.get('customer_id')
@@ -1339,51 +2662,52 @@ def edit_bill(bill_id):
             prices = request.form.getlist('prices[]')
             tax_rates = request.form.getlist('tax_rates[]')
 
-            subtotal = 0
-            total_tax = 0
-            total_amount = 0
-
+            lines = []
             for item_id, quantity, price, tax_rate in zip(items_ids, quantities, prices, tax_rates):
-                if not item_id or not quantity or not price:
-                    continue
-                item = Item.query.get(item_id)
-                if not item:
+                if not item_id.isdigit() or not quantity or not price:
                     continue
-                quantity = int(quantity)
-                price = float(price)
-                tax_rate = float(tax_rate) if tax_rate else 0.0
-                
-                # Check stock
+                lines.append((int(item_id), int(quantity), float(price), float(tax_rate) if tax_rate else 0.0))
+            stock_items = load_items_for_update(line[0] for line in lines)
+            lines = [line for line in lines if line[0] in stock_items]
+            wanted = sum_quantities((item_id, quantity) for item_id, quantity, _, _ in lines)
+
+            # Check stock
+            for item_id, quantity in wanted.items():
+                item = stock_items[item_id]
                 if quantity > item.stock:
                     flash(f'Insufficient stock for {item.name}. Available: {item.stock}, Requested: {quantity}', 'danger')
                     db.session.rollback()
                     return redirect(url_for('edit_bill', bill_id=bill_id))
-                
-                # Update item stock
-                item.stock -= quantity
-                
+
+            subtotal = 0
+            total_tax = 0
+            total_amount = 0
+            new_items = []
+            for item_id, quantity, price, tax_rate in lines:
                 # Calculate amounts with updated tax rate
                 item_subtotal = price * quantity
                 item_tax_amount = item_subtotal * (tax_rate / 100)
-                item_total = item_subtotal + item_tax_amount
-                
                 subtotal += item_subtotal
                 total_tax += item_tax_amount
-                total_amount += item_total
-                
-                # Create new bill item with updated values
-                bill_item = BillItem(
-                    bill=bill,
-                    item=item,
-                    quantity=quantity,
-                    price=price,
-                    tax_rate=tax_rate
-                )
-                db.session.add(bill_item)
+                total_amount += item_subtotal + item_tax_amount
+                new_items.append({'bill_id': bill.id, 'item_id': item_id, 'quantity': quantity,
+                                  'price': price, 'tax_rate': tax_rate})
+            db.session.bulk_insert_mappings(BillItem, new_items)
+            if not take_stock(wanted):
+                db.session.rollback()
+                flash('Insufficient stock: another bill used the remaining stock. Please review the quantities.', 'danger')
+                return redirect(url_for('edit_bill', bill_id=bill_id))
 
             # Update bill total with new calculations
             bill.total_amount = total_amount
+            record_sales(bill.created_at, total_amount - old_total)
+            record_bill_analytics(*old_sale, sign=-1)
+            record_bill_analytics(bill.created_at, bill.customer_id, bill.payment_mode, total_amount,
+                                  [(line['item_id'], line['quantity'], line['price'], line['tax_rate'])
+                                   for line in new_items])
+            product_sales_changed(set(old_quantities) | set(wanted))
             db.session.commit()
+            pdf_cache.discard(old_pdf_key)
             flash('Bill updated successfully!', 'success')
             return redirect(url_for('view_bills'))
         except Exception as e:
@@ -1391,7 +2715,293 @@ def edit_bill(bill_id):
             flash(f'Error updating bill: {str(e)}', 'danger')
             return redirect(url_for('edit_bill', bill_id=bill_id))
             
-    return render_template('edit_bill.html', bill=bill, items=items, customers=customers)
+    items = item_choices()
+    customers = customer_choices()
+    return render_template('edit_bill.html', bill=bill, items=items, stock=stock_levels(), customers=customers)
+
+SEED_ADJECTIVES = ('Steel', 'Copper', 'Brass', 'Plastic', 'Heavy Duty', 'Compact', 'Premium', 'Standard',
+                   'Industrial', 'Cordless', 'Digital', 'Galvanised', 'Waterproof', 'Adjustable', 'Portable')
+SEED_NOUNS = ('Bolt', 'Hinge', 'Cable', 'Switch', 'Drill', 'Valve', 'Pipe', 'Bracket', 'Lamp', 'Fan',
+              'Socket', 'Hammer', 'Ladder', 'Pump', 'Tape', 'Clamp', 'Filter', 'Router', 'Panel', 'Sensor')
+SEED_SIZES = ('S', 'M', 'L', 'XL', '6mm', '8mm', '10mm', '1m', '5m', '10m', '250W', '500W', '1kW')
+SEED_FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Saanvi',
+                    'Arjun', 'Priya', 'Rahul', 'Sneha', 'Vikram', 'Neha', 'Karan', 'Pooja', 'Amit', 'Nisha')
+SEED_LAST_NAMES = ('Sharma', 'Verma', 'Patel', 'Reddy', 'Iyer', 'Nair', 'Gupta', 'Singh', 'Khan', 'Das',
+                   'Mehta', 'Joshi', 'Rao', 'Kulkarni', 'Banerjee', 'Chopra', 'Menon', 'Pillai', 'Shah', 'Bose')
+SEED_PAYMENT_MODES = ('cash', 'upi', 'card', 'bank_transfer')
+SEED_PAYMENT_WEIGHTS = (30, 45, 20, 5)
+
+def _seed_pick(rng, count):
+    """An index in [0, count) skewed so the first tenth of items and customers get about a third of the orders."""
+    return int(count * rng.random() ** 2)
+
+def _seed_spread(count, start, end):
+    """`count` increasing timestamps spread evenly from start to end."""
+    step = (end - start) / max(count, 1)
+    return (start + step * n for n in range(count))
+
+def _seed_insert(model, rows):
+    if rows:
+        db.session.execute(model.__table__.insert(), rows)
+
+def _seed_sync_sequences(*models):
+    """Explicit ids bypass Postgres serial sequences; move them past the seeded rows."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) FROM {table}"
+        ))
+
+def seed_database(items=1000, customers=5000, bills=20000, max_lines=50, quotations=2000, days=365,
+                  seed=1, batch_size=5000, progress=None, anchor=None):
+    """Fill an empty database with reproducible synthetic data.
+
+    Bills are spread evenly over the `days` days up to `anchor` (a datetime;
+    by default now) and numbered per month like real invoices; most have a few
+    lines and some have up to `max_lines`. The same arguments, including the
+    anchor, always produce the same rows; without an anchor the timestamps move
+    with the run time. The sales rollups and the customer search index are
+    rebuilt at the end.
+    """
+    if db.session.query(Bill.query.exists()).scalar() or db.session.query(Item.query.exists()).scalar():
+        raise click.ClickException('seed expects an empty database')
+    if not items or not customers:
+        raise click.ClickException('seed needs at least one item and one customer')
+    rng = random.Random(seed)
+    end = (anchor or datetime.utcnow()).replace(microsecond=0)
+    start = end - timedelta(days=days)
+    report = progress or (lambda stage, done, total: None)
+
+    catalog = []
+    for item_id in range(1, items + 1):
+        tax_rate = rng.choice((0.0, 5.0, 12.0, 18.0, 18.0, 28.0))
+        catalog.append({
+            'id': item_id,
+            'name': f'{rng.choice(SEED_ADJECTIVES)} {rng.choice(SEED_NOUNS)} {item_id}',
+            'description': rng.choice(SEED_SIZES),
+            'price': round(rng.lognormvariate(5, 1), 2),
+            'stock': rng.randint(0, 5000) if rng.random() > 0.05 else rng.randint(0, 9),
+            'hsn_sac_number': str(rng.randint(1000, 9999)),
+            'tax_rate': tax_rate,
+            'created_at': start,
+        })
+    for offset in range(0, items, batch_size):
+        _seed_insert(Item, catalog[offset:offset + batch_size])
+    report('items', items, items)
+
+    people, contacts = [], [None]
+    for customer_id, created_at in enumerate(_seed_spread(customers, start, end), start=1):
+        first, last = rng.choice(SEED_FIRST_NAMES), rng.choice(SEED_LAST_NAMES)
+        people.append({
+            'id': customer_id,
+            'name': f'{first} {last}',
+            'phone': f'9{rng.randint(100000000, 999999999)}',
+            'email': f'{first.lower()}.{last.lower()}{customer_id}@example.com',
+            'address': f'{rng.randint(1, 999)} {rng.choice(SEED_LAST_NAMES)} Road',
+            'gstin': f'29{rng.randint(10**12, 10**13 - 1)}Z{customer_id % 10}' if rng.random() < 0.3 else None,
+            'created_at': created_at,
+        })
+        contacts.append((people[-1]['name'], people[-1]['phone'], people[-1]['email'], people[-1]['address'],
+                         people[-1]['gstin']))
+        if len(people) == batch_size:
+            _seed_insert(Customer, people)
+            people = []
+            report('customers', customer_id, customers)
+    _seed_insert(Customer, people)
+    report('customers', customers, customers)
+
+    def lines_for(count):
+        chosen = {}
+        for _ in range(count):
+            item = catalog[_seed_pick(rng, items)]
+            chosen[item['id']] = (item, chosen.get(item['id'], (item, 0))[1] + rng.randint(1, 5))
+        return chosen.values()
+
+    numbers = {}
+    bill_rows, line_rows = [], []
+    for bill_id, created_at in enumerate(_seed_spread(bills, start, end), start=1):
+        customer_id = _seed_pick(rng, customers) + 1
+        name, phone, email, address, gstin = contacts[customer_id]
+        period = f'{created_at.year}-{created_at.month:02d}'
+        numbers[period] = numbers.get(period, 0) + 1
+        line_count = min(max_lines, int(rng.expovariate(1 / 4)) + 1)
+        total = 0.0
+        for item, quantity in lines_for(line_count):
+            amount = item['price'] * quantity
+            total += amount + amount * item['tax_rate'] / 100
+            line_rows.append({'bill_id': bill_id, 'item_id': item['id'], 'quantity': quantity,
+                              'price': item['price'], 'tax_rate': item['tax_rate']})
+        bill_rows.append({
+            'id': bill_id,
+            'customer_id': customer_id,
+            'customer_name': name,
+            'mobile_number': phone,
+            'email': email,
+            'address': address,
+            'gstin': gstin,
+            'payment_mode': rng.choices(SEED_PAYMENT_MODES, SEED_PAYMENT_WEIGHTS)[0],
+            'invoice_number': f'SQE-{period}-{numbers[period]}',
+            'total_amount': round(total, 2),
+            'created_at': created_at,
+            'inventory_updated': created_at < end - timedelta(days=7),
+        })
+        if len(bill_rows) == batch_size:
+            _seed_insert(Bill, bill_rows)
+            _seed_insert(BillItem, line_rows)
+            db.session.commit()
+            bill_rows, line_rows = [], []
+            report('bills', bill_id, bills)
+    _seed_insert(Bill, bill_rows)
+    _seed_insert(BillItem, line_rows)
+    db.session.commit()
+    report('bills', bills, bills)
+
+    numbers = {}
+    quotation_rows, line_rows = [], []
+    for quotation_id, created_at in enumerate(_seed_spread(quotations, start, end), start=1):
+        period = created_at.strftime('%Y%m')
+        numbers[period] = numbers.get(period, 0) + 1
+        total = 0.0
+        for item, quantity in lines_for(rng.randint(1, 10)):
+            amount = item['price'] * quantity
+            total += amount + amount * item['tax_rate'] / 100
+            line_rows.append({'quotation_id': quotation_id, 'item_id': item['id'], 'quantity': quantity,
+                              'price': item['price'], 'tax_rate': item['tax_rate']})
+        customer_id = _seed_pick(rng, customers) + 1
+        name, phone, email, address, gstin = contacts[customer_id]
+        quotation_rows.append({
+            'id': quotation_id,
+            'customer_id': customer_id,
+            'customer_name': name,
+            'mobile_number': phone,
+            'email': email,
+            'address': address,
+            'gstin': gstin,
+            'quotation_number': f'Q{period}-{numbers[period]:03d}',
+            'total_amount': round(total, 2),
+            'valid_until': created_at + timedelta(days=30),
+            'created_at': created_at,
+        })
+        if len(quotation_rows) == batch_size:
+            _seed_insert(Quotation, quotation_rows)
+            _seed_insert(QuotationItem, line_rows)
+            quotation_rows, line_rows = [], []
+    _seed_insert(Quotation, quotation_rows)
+    _seed_insert(QuotationItem, line_rows)
+    report('quotations', quotations, quotations)
+
+    _seed_sync_sequences(Item, Customer, Bill, BillItem, Quotation, QuotationItem)
+    reference_data_changed(*REFERENCE_DATA)
+    db.session.commit()
+    rebuild_sales_rollups()
+    rebuild_customer_search()
+
+@app.cli.command('seed')
+@click.option('--items', default=1000, show_default=True, help='Catalog size.')
+@click.option('--customers', default=5000, show_default=True, help='Customers.')
+@click.option('--bills', default=20000, show_default=True, help='Bills.')
+@click.option('--max-lines', default=50, show_default=True, help='Most lines on one bill.')
+@click.option('--quotations', default=2000, show_default=True, help='Quotations.')
+@click.option('--days', default=365, show_default=True, help='Spread bills over this many days up to --anchor.')
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S']),
+              help='When the seeded history ends (default: now); fix it for the same rows on every run.')
+@click.option('--seed', 'seed_value', default=1, show_default=True,
+              help='Random seed; same seed and anchor, same data.')
+def seed_command(items, customers, bills, max_lines, quotations, days, anchor, seed_value):
+    """Fill an empty database with synthetic items, customers, bills and quotations."""
+    db.create_all()
+    started = time.perf_counter()
+
+    def progress(stage, done, total):
+        print(f'\r{stage}: {done}/{total}', end='' if done < total else '\n', file=sys.stderr)
+
+    seed_database(items=items, customers=customers, bills=bills, max_lines=max_lines, quotations=quotations,
+                  days=days, seed=seed_value, progress=progress, anchor=anchor)
+    print(f'Seeded {items} items, {customers} customers, {bills} bills and {quotations} quotations '
+          f'in {time.perf_counter() - started:.1f}s')
+
+@app.cli.command('rebuild-sales-rollups')
+def rebuild_sales_rollups_command():
+    """Backfill the daily/monthly sales rollups from existing bills."""
+    days, months = rebuild_sales_rollups()
+    print(f'Sales rollups rebuilt: {days} days, {months} months')
+
+@app.cli.command('compute-replenishment')
+@click.option('--window', type=int, help='Days of sales to average demand over (default: REPLENISH_WINDOW_DAYS).')
+def compute_replenishment_command(window):
+    """Recompute demand velocity, reorder points and suggested order quantities; schedule e.g. nightly."""
+    started = time.perf_counter()
+    items, due = compute_replenishment(window_days=window)
+    print(f'Replenishment computed for {items} items in {time.perf_counter() - started:.1f}s, '
+          f'{due} due for reorder')
+
+@app.cli.command('rebuild-customer-search')
+def rebuild_customer_search_command():
+    """Create and backfill the customer search index."""
+    rebuild_customer_search()
+    print('Customer search index rebuilt')
+
+def maintain_database():
+    """Checkpoint and truncate the SQLite WAL and refresh planner statistics; returns lines to report."""
+    report = []
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if db.engine.dialect.name == 'sqlite':
+            # Sample each index rather than scanning it fully, so this stays quick on big tables
+            conn.exec_driver_sql('PRAGMA analysis_limit=1000')
+            conn.exec_driver_sql('ANALYZE')
+            conn.exec_driver_sql('PRAGMA optimize')
+            report.append('Planner statistics refreshed')
+            # Last, so the statistics ANALYZE just wrote are checkpointed too
+            busy, log_frames, checkpointed = conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)').one()
+            if log_frames < 0:
+                report.append('WAL checkpoint: database is not in WAL mode')
+            else:
+                report.append(f'WAL checkpoint: {checkpointed} of {log_frames} frames written back'
+                              f"{', blocked by a reader or writer' if busy else ''}")
+        else:
+            conn.exec_driver_sql('ANALYZE')
+            report.append('Planner statistics refreshed')
+    return report
+
+@app.cli.command('maintain-database')
+def maintain_database_command():
+    """Checkpoint the SQLite WAL and run ANALYZE; schedule it e.g. hourly."""
+    for line in maintain_database():
+        print(line)
+
+@app.cli.command('export-invoices')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First day, YYYY-MM-DD.')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day (inclusive), YYYY-MM-DD.')
+@click.option('--customer-id', type=int, help='Only this customer\'s invoices.')
+@click.option('--workers', type=int, help='Render processes (default: one per CPU).')
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False), help='ZIP file to write.')
+def export_invoices_command(start, end, customer_id, workers, output):
+    """Render invoice PDFs in parallel into a ZIP archive."""
+    query = invoice_export_query(start, end, customer_id)
+    progress = ExportProgress(None, query.order_by(None).count())
+    with open(output, 'wb') as f:
+        for chunk in export_invoice_archive(query, progress, workers):
+            f.write(chunk)
+            print(f'\r{progress.done}/{progress.total} invoices, {progress.docs_per_sec:.1f} docs/sec',
+                  end='', file=sys.stderr)
+    print(f'\nWrote {progress.done} invoices to {output} in {progress.snapshot()["elapsed"]}s')
+
+@app.cli.command('resume-imports')
+def resume_imports_command():
+    """Run queued background imports and resume stalled ones, in the foreground."""
+    stale = datetime.utcnow() - timedelta(seconds=IMPORT_STALL_SECONDS)
+    job_ids = [job_id for (job_id,) in db.session.query(ImportJob.id).filter(
+        db.or_(ImportJob.status == 'queued',
+               db.and_(ImportJob.status == 'running', ImportJob.heartbeat_at < stale))
+    ).order_by(ImportJob.created_at)]
+    for job_id in job_ids:
+        if run_import_job(job_id):
+            progress = import_job_progress(db.session.get(ImportJob, job_id))
+            print(f"{job_id}: {progress['status']}, {progress['rows']} rows, {progress['added']} added, "
+                  f"{progress['updated']} updated, {progress['errors']} errors")
+    print(f'{len(job_ids)} import jobs processed')
 
 if __name__ == '__main__':
     with app.app_context():
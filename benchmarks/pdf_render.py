@@ -0,0 +1,161 @@
+"""Micro-benchmark for invoice/quotation PDF rendering.
+
+Renders the same bill and quotation repeatedly through generate_bill_pdf()
+and generate_quotation_pdf() against an in-memory database and reports
+per-document wall time, PDF size and the peak memory traced while rendering
+one document.
+
+    python benchmarks/pdf_render.py --lines 50 --runs 30
+    python benchmarks/pdf_render.py --baseline benchmarks/pdf_render_baseline.json
+    python benchmarks/pdf_render.py --update-baseline benchmarks/pdf_render_baseline.json
+
+--tree benchmarks the app of another checkout instead of this one, so a
+before/after comparison of two commits is
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/pdf_render.py --tree /tmp/before -o before.json
+    python benchmarks/pdf_render.py --baseline before.json
+
+With --baseline the results are printed side by side with the baseline's and
+the exit status is 1 if any document's median is more than --threshold (a
+fraction) slower. The checked-in baseline holds the numbers of the current
+renderer and, under "before", those of the per-document renderer it replaced.
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def build_documents(app_module, lines):
+    db = app_module.db
+    db.create_all()
+    db.session.add(app_module.Settings(
+        company_name='Benchmark Traders', address='1 Market Road', phone='0000000000',
+        email='accounts@example.com', gstin='29ABCDE1234F1Z5', bank_name='Bank',
+        bank_account_number='1234567890', ifsc_code='BANK0001'))
+    customer = app_module.Customer(name='Benchmark Customer', phone='9999999999', email='c@example.com',
+                                   address='2 Main Street', gstin='29ABCDE1234F2Z5')
+    items = [app_module.Item(name=f'Item {n} with a reasonably long description', price=10 + n, stock=1000,
+                             hsn_sac_number='8471', tax_rate=18) for n in range(lines)]
+    db.session.add(customer)
+    db.session.add_all(items)
+    db.session.flush()
+    party = dict(customer_id=customer.id, customer_name=customer.name, mobile_number=customer.phone,
+                 email=customer.email, address=customer.address, gstin=customer.gstin, total_amount=0)
+    bill = app_module.Bill(payment_mode='cash', invoice_number='BENCH-1', **party)
+    quotation = app_module.Quotation(quotation_number='QBENCH-1',
+                                     valid_until=datetime.datetime(2026, 2, 1), **party)
+    db.session.add_all([bill, quotation])
+    db.session.flush()
+    for item in items:
+        db.session.add(app_module.BillItem(bill_id=bill.id, item_id=item.id, quantity=3, price=item.price,
+                                           tax_rate=18))
+        db.session.add(app_module.QuotationItem(quotation_id=quotation.id, item_id=item.id, quantity=3,
+                                                price=item.price, tax_rate=18))
+    db.session.commit()
+    return {'invoice': (app_module.generate_bill_pdf, bill),
+            'quotation': (app_module.generate_quotation_pdf, quotation)}
+
+
+def measure(generate, document, runs):
+    subtotal = sum(line.price * line.quantity for line in document.items)
+    total_tax = sum(line.price * line.quantity * (line.tax_rate or 0) / 100 for line in document.items)
+    generate(document, subtotal, total_tax)  # warm-up: imports, fonts, caches
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        size = len(generate(document, subtotal, total_tax).getvalue())
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    generate(document, subtotal, total_tax)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'mean_ms': round(statistics.mean(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'min_ms': round(min(timings), 2),
+        'size_kib': round(size / 1024, 1),
+        'peak_kib': round(peak / 1024),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print each document against the baseline; return the ones whose median regressed."""
+    regressions = []
+    for name, after in results['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        print(f"{name}: median {before['median_ms']:.2f} -> {after['median_ms']:.2f} ms "
+              f"({after['median_ms'] / before['median_ms']:.2f}x)  "
+              f"size {before['size_kib']:.1f} -> {after['size_kib']:.1f} KiB  "
+              f"peak {before['peak_kib']} -> {after['peak_kib']} KiB", file=sys.stderr)
+        if after['median_ms'] > before['median_ms'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=50, help='line items per document')
+    parser.add_argument('--runs', type=int, default=30, help='documents to render')
+    parser.add_argument('--tree', default=REPO, help='checkout whose app.py to benchmark (default: this one)')
+    parser.add_argument('--output', '-o', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='compare with this results file and fail on regressions')
+    parser.add_argument('--threshold', type=float, default=0.5, help='allowed slowdown as a fraction')
+    parser.add_argument('--update-baseline', help='write the results to this baseline file')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+    tree = os.path.abspath(args.tree)
+    sys.path.insert(0, tree)
+    os.chdir(tree)  # the renderer reads static/ relative to the app
+    import app as app_module
+
+    with app_module.app.app_context():
+        documents = build_documents(app_module, args.lines)
+        results = {
+            'meta': {'lines': args.lines, 'runs': args.runs, 'python': sys.version.split()[0]},
+            'results': {name: measure(generate, document, args.runs)
+                        for name, (generate, document) in documents.items()},
+        }
+
+    text = json.dumps(results, indent=2) + '\n'
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    if args.update_baseline:
+        try:
+            with open(args.update_baseline) as f:
+                before = json.load(f).get('before')
+        except FileNotFoundError:
+            before = None
+        with open(args.update_baseline, 'w') as f:
+            f.write(json.dumps(dict(results, before=before) if before else results, indent=2) + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['lines'] != args.lines:
+            sys.exit(f"Baseline was recorded with {baseline['meta']['lines']} lines, not {args.lines}")
+        regressions = compare(results, baseline, args.threshold)
+        for name in regressions:
+            print(f'REGRESSION {name}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold:.0%} of the baseline', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""Concurrency stress test: parallel bill creates, edits and deletes against a local gunicorn.
+
+Seeds a small catalog with deliberately scarce stock, starts gunicorn with
+the app's gunicorn_config.py on a free port, and has --clients threads hammer
+/create_bill, /edit_bill and /delete_bill for --duration seconds. Afterwards
+it checks, straight from the database:
+
+  - no item's stock went negative
+  - each item's stock changed by exactly minus the change in its billed quantity
+    (so nothing was oversold, double-returned or lost)
+  - invoice numbers are present and unique
+
+and prints throughput plus p50/p99 latency per operation. The exit status is
+1 if an invariant is broken.
+
+    python benchmarks/stress.py                          # SQLite file in a temp dir
+    python benchmarks/stress.py --database-url postgresql://localhost/erp_stress
+
+A Postgres database is used as-is and must be empty; the tables are created.
+"""
+import argparse
+import http.client
+import os
+import random
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def stock_snapshot(db, Item, BillItem):
+    """{item_id: (stock, billed quantity)} across all bills."""
+    billed = dict(db.session.query(BillItem.item_id, db.func.sum(BillItem.quantity)).group_by(BillItem.item_id))
+    return {item_id: (stock, billed.get(item_id, 0)) for item_id, stock in db.session.query(Item.id, Item.stock)}
+
+
+class Client:
+    """One keep-alive connection; redirects are not followed, a 302 is a handled request."""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def post(self, path, fields):
+        body = urlencode(fields, doseq=True)
+        try:
+            self.conn.request('POST', path, body, {'Content-Type': 'application/x-www-form-urlencoded'})
+            response = self.conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            raise
+        return response.status, response.getheader('Location', '')
+
+
+def run_load(port, args, item_ids, customer_ids, bill_ids, deadline, current_bill_ids):
+    latencies = defaultdict(list)
+    outcomes = defaultdict(int)
+    lock = threading.Lock()
+
+    def lines(rng):
+        chosen = rng.sample(item_ids, rng.randint(1, min(args.max_lines, len(item_ids))))
+        return chosen, [str(rng.randint(1, 5)) for _ in chosen]
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = Client(port)
+        while time.monotonic() < deadline:
+            roll = rng.random()
+            if roll < args.create_share or not bill_ids:
+                op = 'create'
+                chosen, quantities = lines(rng)
+                path = '/create_bill'
+                fields = {'customer_id': rng.choice(customer_ids), 'payment_mode': 'cash',
+                          'items[]': chosen, 'quantities[]': quantities}
+            elif roll < args.create_share + args.edit_share:
+                op = 'edit'
+                chosen, quantities = lines(rng)
+                path = f'/edit_bill/{rng.choice(bill_ids)}'
+                fields = {'customer_id': rng.choice(customer_ids), 'payment_mode': 'upi',
+                          'items[]': chosen, 'quantities[]': quantities,
+                          'prices[]': ['10'] * len(chosen), 'tax_rates[]': ['18'] * len(chosen)}
+            else:
+                op = 'delete'
+                path = f'/delete_bill/{rng.choice(bill_ids)}'
+                fields = {}
+            started = time.perf_counter()
+            try:
+                status, location = client.post(path, fields)
+            except (http.client.HTTPException, OSError) as e:
+                status, location = type(e).__name__, ''
+            elapsed = time.perf_counter() - started
+            # Every handled request redirects; where to tells success from a refused change
+            if status == 302:
+                result = 'ok' if location.rstrip('/').endswith('/bills') else 'refused'
+            else:
+                result = f'error {status}'
+            with lock:
+                latencies[op].append(elapsed)
+                outcomes[op, result] += 1
+
+    def refresh_bill_ids():
+        # Let edits and deletes also hit bills created during the run
+        while time.monotonic() < deadline:
+            bill_ids[:] = current_bill_ids() or bill_ids
+            time.sleep(0.5)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.clients)]
+    threads.append(threading.Thread(target=refresh_bill_ids))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='empty database to use instead of a temporary SQLite file')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load')
+    parser.add_argument('--items', type=int, default=10, help='items competed for')
+    parser.add_argument('--stock', type=int, default=300, help='starting stock of each item')
+    parser.add_argument('--bills', type=int, default=100, help='seeded bills that edits and deletes target')
+    parser.add_argument('--max-lines', type=int, default=4, help='most lines per created or edited bill')
+    parser.add_argument('--create-share', type=float, default=0.6, help='fraction of requests that create')
+    parser.add_argument('--edit-share', type=float, default=0.25, help='fraction that edit; the rest delete')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='erp-stress-')
+    env = dict(os.environ,
+               DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(workdir, 'stress.db')}",
+               PDF_CACHE_DIR=os.path.join(workdir, 'pdf_cache'),
+               IMPORT_DIR=os.path.join(workdir, 'imports'),
+               PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+               SLOW_QUERY_MS='0')
+    os.environ.update(env)
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+
+    from app import app, db, Item, Customer, Bill, BillItem, seed_database  # noqa: E402
+
+    with app.app_context():
+        db.create_all()
+        # days=3 keeps every seeded bill unprocessed, so deletes are allowed
+        seed_database(items=args.items, customers=20, bills=args.bills, max_lines=args.max_lines,
+                      quotations=0, days=3)
+        Item.query.update({Item.stock: args.stock})
+        db.session.commit()
+        item_ids = [item_id for (item_id,) in db.session.query(Item.id)]
+        customer_ids = [customer_id for (customer_id,) in db.session.query(Customer.id)]
+        bill_ids = [bill_id for (bill_id,) in db.session.query(Bill.id)]
+        before = stock_snapshot(db, Item, BillItem)
+        db.session.remove()
+
+    def current_bill_ids():
+        with app.app_context():
+            bill_ids = [bill_id for (bill_id,) in db.session.query(Bill.id)]
+            db.session.remove()
+        return bill_ids
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env)
+    try:
+        for _ in range(100):
+            try:
+                http.client.HTTPConnection('127.0.0.1', port, timeout=1).request('GET', '/metrics')
+                break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            sys.exit('gunicorn did not start')
+
+        started = time.monotonic()
+        latencies, outcomes = run_load(port, args, item_ids, customer_ids, bill_ids, started + args.duration,
+                                       current_bill_ids)
+        elapsed = time.monotonic() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+    with app.app_context():
+        after = stock_snapshot(db, Item, BillItem)
+        invoice_count, distinct_invoices, missing_invoices = db.session.query(
+            db.func.count(Bill.id), db.func.count(db.distinct(Bill.invoice_number)),
+            db.func.sum(db.case((Bill.invoice_number.is_(None), 1), else_=0))
+        ).one()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f'backend: {env["DATABASE_URL"].split(":")[0]}  workers: {args.workers}x{args.threads}  '
+          f'clients: {args.clients}  duration: {elapsed:.1f}s')
+    print(f'throughput: {total / elapsed:.1f} requests/s ({total} requests)')
+    for op in sorted(latencies):
+        values = latencies[op]
+        results = ', '.join(f'{result} {count}' for (name, result), count in sorted(outcomes.items()) if name == op)
+        print(f'  {op:7} n={len(values):6}  p50 {statistics.median(values) * 1000:8.1f} ms  '
+              f'p99 {percentile(values, 0.99) * 1000:8.1f} ms  ({results})')
+
+    failures = []
+    for item_id, (stock, billed) in after.items():
+        initial_stock, initial_billed = before[item_id]
+        if stock < 0:
+            failures.append(f'item {item_id}: stock is negative ({stock})')
+        if stock - initial_stock != -(billed - initial_billed):
+            failures.append(f'item {item_id}: stock moved by {stock - initial_stock} '
+                            f'but billed quantity by {billed - initial_billed}')
+    if missing_invoices:
+        failures.append(f'{missing_invoices} bills have no invoice number')
+    if distinct_invoices != invoice_count - (missing_invoices or 0):
+        failures.append(f'{invoice_count - distinct_invoices} duplicate invoice numbers')
+    shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        print(f'INVARIANT BROKEN {failure}')
+    if failures:
+        sys.exit(1)
+    print(f'Invariants hold: stock matches billed quantities for {len(after)} items, '
+          f'{invoice_count} invoice numbers are unique')
+
+
+if __name__ == '__main__':
+    main()
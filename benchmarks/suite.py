@@ -0,0 +1,211 @@
+"""Time the hot request paths against a seeded database and compare with a baseline.
+
+By default a throwaway SQLite file is created and filled by seed_database()
+at the requested scale; pass --database-url to run against a database you
+seeded with `flask seed` instead (it will be written to: bills are created,
+invoices downloaded and items imported). Each case is warmed up once, then
+timed --runs times through the Flask test client.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --threshold 0.5
+    python benchmarks/suite.py --update-baseline benchmarks/baseline.json
+
+Results are JSON: {"meta": {...}, "results": {case: {"median_ms", "p95_ms", "min_ms", "runs"}}}.
+With --baseline the exit status is 1 if any case's median is more than
+--threshold (a fraction) and --min-delta-ms slower than the baseline's.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Seeded history ends here, so the dataset (and the baseline measured on it) doesn't move with the run date
+SEED_ANCHOR = datetime.datetime(2026, 1, 1)
+
+SCALES = {
+    'small': {'items': 1000, 'customers': 5000, 'bills': 20000, 'quotations': 2000},
+    'medium': {'items': 10000, 'customers': 100000, 'bills': 200000, 'quotations': 20000},
+    'large': {'items': 10000, 'customers': 100000, 'bills': 1000000, 'quotations': 100000},
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def build_cases(client, db, models, rng):
+    """Return {name: callable making one request}. Every request must succeed."""
+    Item, Customer, Bill = models
+    with client.application.app_context():
+        item_ids = [item_id for (item_id,) in db.session.query(Item.id).filter(Item.stock > 100).limit(500)]
+        customer_ids = [customer_id for (customer_id,) in db.session.query(Customer.id).limit(500)]
+        bill_ids = [bill_id for (bill_id,) in db.session.query(Bill.id).order_by(Bill.id.desc()).limit(500)]
+        busiest_item = db.session.query(Item.id).order_by(Item.id).first()[0]
+        last_name = db.session.query(Customer.name).order_by(Customer.id).first()[0].split()[-1]
+    downloads = iter(bill_ids)
+    imports = iter(range(1, 10 ** 6))
+    # The seeded year, then a different start date each run so every request misses the analytics cache
+    anchor = SEED_ANCHOR.date()
+    seeded_year = {'start': (anchor - datetime.timedelta(days=365)).isoformat(), 'end': anchor.isoformat()}
+    cold_starts = (anchor - datetime.timedelta(days=365 + n) for n in range(10 ** 6))
+
+    def create_bill():
+        chosen = rng.sample(item_ids, 5)
+        return client.post('/create_bill', data={'customer_id': rng.choice(customer_ids), 'payment_mode': 'upi',
+                                                 'items[]': [str(item_id) for item_id in chosen],
+                                                 'quantities[]': ['1'] * len(chosen)})
+
+    def import_items():
+        run = next(imports)
+        rows = ['name,description,price,stock,hsn_sac_number,tax_rate']
+        rows += [f'Benchmark Import {run}-{n},Box,{10 + n % 90},{n % 50},8471,18' for n in range(1000)]
+        return client.post('/import_items', data={'file': (io.BytesIO('\n'.join(rows).encode()), 'items.csv')},
+                           content_type='multipart/form-data')
+
+    return {
+        'index': lambda: client.get('/'),
+        'view_bills': lambda: client.get('/bills'),
+        'view_bills_filtered': lambda: client.get('/bills', query_string={'payment_mode': 'card',
+                                                                           'customer_id': customer_ids[0]}),
+        'create_bill': create_bill,
+        'customers_search': lambda: client.get('/customers', query_string={'search': last_name[:4]}),
+        'download_bill': lambda: client.get(f'/download_bill/{next(downloads)}'),
+        'product_sales': lambda: client.get(f'/api/product_sales/{busiest_item}'),
+        'product_sales_summary': lambda: client.get(f'/api/product_sales/{busiest_item}',
+                                                    query_string={'summary': '1'}),
+        'sales_analytics': lambda: client.get('/api/analytics/sales', query_string=seeded_year),
+        'sales_analytics_uncached': lambda: client.get('/api/analytics/sales', query_string={
+            'start': next(cold_starts).isoformat(), 'end': seeded_year['end']}),
+        'export_bills': lambda: client.get('/export/bills'),
+        'export_customers': lambda: client.get('/export/customers'),
+        'export_inventory': lambda: client.get('/export/inventory'),
+        'import_items': import_items,
+    }
+
+
+def run_case(request, runs):
+    def once():
+        started = time.perf_counter()
+        response = request()
+        response.get_data()  # drain streamed bodies inside the timing
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'HTTP {response.status_code}')
+        return elapsed
+
+    once()
+    timings = [once() for _ in range(runs)]
+    return {
+        'runs': runs,
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'min_ms': round(min(timings), 2),
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Return a line per case that regressed against the baseline."""
+    regressions = []
+    for name, result in results['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        limit = max(before['median_ms'] * (1 + threshold), before['median_ms'] + min_delta_ms)
+        if result['median_ms'] > limit:
+            regressions.append(f"{name}: median {result['median_ms']:.2f} ms vs baseline "
+                               f"{before['median_ms']:.2f} ms (limit {limit:.2f} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='dataset to seed')
+    parser.add_argument('--database-url', help='use this already seeded database instead of seeding one')
+    parser.add_argument('--runs', type=int, default=20, help='timed requests per case')
+    parser.add_argument('--only', action='append', help='run just this case (repeatable)')
+    parser.add_argument('--output', '-o', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='fail on regressions against this results file')
+    parser.add_argument('--threshold', type=float, default=0.5, help='allowed slowdown as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=3.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--update-baseline', help='write the results to this baseline file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='erp-bench-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['PDF_CACHE_DIR'] = os.path.join(workdir, 'pdf_cache')
+    os.environ['IMPORT_DIR'] = os.path.join(workdir, 'imports')
+    os.environ.setdefault('SLOW_QUERY_MS', '0')
+
+    from app import app, db, Item, Customer, Bill, seed_database  # noqa: E402
+
+    if not args.database_url:
+        started = time.perf_counter()
+        with app.app_context():
+            db.create_all()
+            seed_database(anchor=SEED_ANCHOR, **SCALES[args.scale])
+        print(f'Seeded {args.scale} dataset in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+    rng = random.Random(1)
+    client = app.test_client()
+    cases = build_cases(client, db, (Item, Customer, Bill), rng)
+    results = {
+        'meta': {
+            'scale': args.scale if not args.database_url else 'external',
+            'seed_anchor': SEED_ANCHOR.isoformat() if not args.database_url else None,
+            'runs': args.runs,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {},
+    }
+    try:
+        for name, request in cases.items():
+            if args.only and name not in args.only:
+                continue
+            results['results'][name] = run_case(request, args.runs)
+            print(f"{name:24} median {results['results'][name]['median_ms']:9.2f} ms  "
+                  f"p95 {results['results'][name]['p95_ms']:9.2f} ms", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2) + '\n'
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    if args.update_baseline:
+        with open(args.update_baseline, 'w') as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['scale'] != results['meta']['scale']:
+            sys.exit(f"Baseline was recorded at scale {baseline['meta']['scale']!r}, "
+                     f"not {results['meta']['scale']!r}")
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold:.0%} of the baseline', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
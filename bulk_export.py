@@ -0,0 +1,208 @@
+"""Bulk PDF export: render documents across cores and stream them as a ZIP.
+
+Nothing here holds the whole archive: at most `window` rendered PDFs are in
+flight, and each one is written to the ZIP and handed to the caller as soon
+as it finishes. Inside a web worker, exports share one ExportPool, which
+bounds both the render processes and the number of exports running at once.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import timed_render
+from pdf_cache import PDFCache
+from pdf_renderer import render_document
+
+
+def render_pdf(directory, max_bytes, key, document):
+    """Render one document, keep it in the PDF cache and return its bytes. Runs in a pool process."""
+    with timed_render(document['kind']):
+        data = render_document(document).getvalue()
+    PDFCache(directory, max_bytes).put(key, data)
+    return data
+
+
+def _spawn_pool(workers):
+    # spawn, not fork: gunicorn workers are threaded and hold DB connections
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+class ExportBusy(Exception):
+    """Raised when this process already runs max_exports exports."""
+
+
+class ExportPool:
+    """One render pool per process, shared by up to max_exports concurrent exports."""
+
+    def __init__(self, max_workers=2, max_exports=2):
+        self.max_workers = max_workers
+        self.max_exports = max_exports
+        self._slots = threading.BoundedSemaphore(max_exports)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take an export slot without waiting; raises ExportBusy when none is free."""
+        if not self._slots.acquire(blocking=False):
+            raise ExportBusy()
+
+    def release(self):
+        self._slots.release()
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = _spawn_pool(self.max_workers)
+            return self._executor
+
+    def discard(self, executor):
+        """Drop a broken executor so the next export starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def render_in_parallel(named_documents, cache, workers=None, window=None, pool=None):
+    """Yield (name, pdf bytes) for each (name, document), rendering cache misses on a process pool.
+
+    With `pool` (an ExportPool) the renders go to its shared executor; otherwise a pool of
+    `workers` processes is started for this call and shut down afterwards.
+    Results come back in completion order, not input order.
+    """
+    workers = pool.max_workers if pool else workers or os.cpu_count() or 1
+    window = window or workers * 2
+    executor = None
+    in_flight = {}
+    try:
+        for name, document in named_documents:
+            key = cache.key(document)
+            path = cache.get(key)
+            if path is not None:
+                with open(path, 'rb') as f:
+                    yield name, f.read()
+                continue
+            if executor is None:
+                executor = pool.executor() if pool else _spawn_pool(workers)
+            in_flight[executor.submit(render_pdf, cache.directory, cache.max_bytes, key, document)] = name
+            if len(in_flight) >= window:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+        for future in list(in_flight):
+            yield in_flight.pop(future), future.result()
+    except BrokenProcessPool:
+        if pool:
+            pool.discard(executor)
+        raise
+    finally:
+        if pool:
+            # The executor is shared: only take back this export's queued renders
+            for future in in_flight:
+                future.cancel()
+        elif executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that collects what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files):
+    """Yield the bytes of a ZIP archive of (name, data) pairs, one member at a time."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+class ExportProgress:
+    """Progress of one export, saved as JSON so any worker (or a CLI) can report it."""
+
+    def __init__(self, path, total, interval=0.5):
+        self.path = path
+        self.total = total
+        self.done = 0
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._saved = 0.0
+        self.save(force=True)
+
+    @property
+    def docs_per_sec(self):
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self, finished=False):
+        return {
+            'done': self.done,
+            'total': self.total,
+            'docs_per_sec': round(self.docs_per_sec, 2),
+            'elapsed': round(time.perf_counter() - self.started, 2),
+            'finished': finished,
+        }
+
+    def advance(self):
+        self.done += 1
+        self.save()
+
+    @staticmethod
+    def prune(directory, max_age):
+        """Delete progress files last written more than max_age seconds ago."""
+        cutoff = time.time() - max_age
+        try:
+            with os.scandir(directory) as entries:
+                stale = [entry.path for entry in entries
+                         if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff]
+        except FileNotFoundError:
+            return
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def save(self, finished=False, force=False):
+        now = time.perf_counter()
+        if not (force or finished) and now - self._saved < self.interval:
+            return
+        self._saved = now
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(finished), f)
+        os.replace(tmp_path, self.path)
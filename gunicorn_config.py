@@ -1,4 +1,24 @@
+import os
+import shutil
+import tempfile
+
+# Metrics from every worker (and the PDF render processes they spawn) are written here and
+# summed on scrape. It has to be set before prometheus_client is imported anywhere.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'erp-prometheus'))
+
+from prometheus_client import multiprocess
+
 bind = "0.0.0.0:10000"
 workers = 4
 threads = 4
-timeout = 120 
\ No newline at end of file
+timeout = 120
+
+
+def on_starting(server):
+    # Start from zero rather than adding to the counters of a previous run
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,79 @@
+"""Prometheus metrics for the web app, its PDF renderers and item imports.
+
+With PROMETHEUS_MULTIPROC_DIR set (gunicorn_config.py does this) every
+process, including spawned PDF render processes, writes its samples to that
+directory and a scrape of any worker reports the sum over all of them. The
+variable must be set before prometheus_client is first imported. Without it
+the metrics are simply those of the current process.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+
+REQUESTS = Counter('erp_http_requests_total', 'HTTP requests handled.', ['endpoint', 'method', 'status'])
+REQUEST_ERRORS = Counter('erp_http_request_errors_total', 'Requests that ended in a 5xx or an unhandled exception.',
+                         ['endpoint'])
+REQUEST_LATENCY = Histogram('erp_http_request_duration_seconds', 'Time to produce a response (before streaming).',
+                            ['endpoint'],
+                            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+RESPONSE_SIZE = Histogram('erp_http_response_size_bytes', 'Body size of responses with a known length.',
+                          ['endpoint'], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216))
+
+POOL_CHECKED_OUT = Gauge('erp_db_pool_checked_out', 'Database connections in use, summed over live workers.',
+                         multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge('erp_db_pool_overflow', 'Connections opened beyond pool_size, summed over live workers.',
+                      multiprocess_mode='livesum')
+
+PDF_RENDER_SECONDS = Histogram('erp_pdf_render_seconds', 'Time to render one PDF; _count is the number rendered.',
+                               ['kind'], buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+IMPORT_ROWS = Counter('erp_import_rows_total', 'CSV rows processed by item imports.', ['result'])
+IMPORT_SECONDS = Counter('erp_import_seconds_total', 'Time spent in item imports; rate(rows) / rate(seconds) is rows/sec.')
+IMPORT_ROWS_PER_SECOND = Gauge('erp_import_rows_per_second', 'Throughput of the most recent import chunk.',
+                               multiprocess_mode='mostrecent')
+
+
+def observe_request(endpoint, method, status, seconds, size):
+    REQUESTS.labels(endpoint, method, str(status)).inc()
+    REQUEST_LATENCY.labels(endpoint).observe(seconds)
+    if size is not None:
+        RESPONSE_SIZE.labels(endpoint).observe(size)
+    if status >= 500:
+        REQUEST_ERRORS.labels(endpoint).inc()
+
+
+def observe_pool(pool):
+    """Record checked-out/overflow counts of a QueuePool; other pool classes don't track them."""
+    if hasattr(pool, 'checkedout'):
+        POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, 'overflow'):
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+@contextmanager
+def timed_render(kind):
+    started = time.perf_counter()
+    yield
+    PDF_RENDER_SECONDS.labels(kind).observe(time.perf_counter() - started)
+
+
+def observe_import_chunk(added, updated, errors, seconds):
+    IMPORT_ROWS.labels('added').inc(added)
+    IMPORT_ROWS.labels('updated').inc(updated)
+    IMPORT_ROWS.labels('error').inc(errors)
+    IMPORT_SECONDS.inc(seconds)
+    if seconds > 0:
+        IMPORT_ROWS_PER_SECOND.set((added + updated + errors) / seconds)
+
+
+def latest():
+    """The exposition text for a scrape and its content type."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,28 @@
+"""Add bill listing indexes for keyset pagination and filters
+
+Revision ID: 354882e95957
+Revises: e92204d57133
+Create Date: 2026-10-18 10:03:17.288406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '354882e95957'
+down_revision = 'e92204d57133'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_bill_created_at_id', 'bill', ['created_at', 'id'], unique=False)
+    op.create_index('ix_bill_customer_id_created_at', 'bill', ['customer_id', 'created_at'], unique=False)
+    op.create_index('ix_bill_payment_mode_created_at', 'bill', ['payment_mode', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_bill_payment_mode_created_at', table_name='bill')
+    op.drop_index('ix_bill_customer_id_created_at', table_name='bill')
+    op.drop_index('ix_bill_created_at_id', table_name='bill')
@@ -0,0 +1,28 @@
+"""Add case-insensitive item name prefix index
+
+Revision ID: 5c1f0e7a9b3d
+Revises: 7e3264b33754
+Create Date: 2026-10-18 19:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f0e7a9b3d'
+down_revision = '7e3264b33754'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('CREATE INDEX IF NOT EXISTS ix_item_name_lower ON item (lower(name))')
+    elif dialect == 'postgresql':
+        op.execute('CREATE INDEX IF NOT EXISTS ix_item_name_lower ON item (lower(name) text_pattern_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_item_name_lower')
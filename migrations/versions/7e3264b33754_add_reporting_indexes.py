@@ -0,0 +1,32 @@
+"""Add foreign key and stock indexes used by reporting queries
+
+Revision ID: 7e3264b33754
+Revises: dbaa22ca41be
+Create Date: 2026-10-18 13:21:09.640391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3264b33754'
+down_revision = 'dbaa22ca41be'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_item_stock', 'item', ['stock'], unique=False)
+    op.create_index('ix_bill_item_bill_id', 'bill_item', ['bill_id'], unique=False)
+    op.create_index('ix_bill_item_item_id', 'bill_item', ['item_id'], unique=False)
+    op.create_index('ix_quotation_item_quotation_id', 'quotation_item', ['quotation_id'], unique=False)
+    op.create_index('ix_quotation_item_item_id', 'quotation_item', ['item_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_quotation_item_item_id', table_name='quotation_item')
+    op.drop_index('ix_quotation_item_quotation_id', table_name='quotation_item')
+    op.drop_index('ix_bill_item_item_id', table_name='bill_item')
+    op.drop_index('ix_bill_item_bill_id', table_name='bill_item')
+    op.drop_index('ix_item_stock', table_name='item')
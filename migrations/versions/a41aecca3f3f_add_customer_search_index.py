@@ -0,0 +1,50 @@
+"""Add customer name index and backend-specific customer search index
+
+Revision ID: a41aecca3f3f
+Revises: 354882e95957
+Create Date: 2026-10-18 11:26:05.914072
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41aecca3f3f'
+down_revision = '354882e95957'
+branch_labels = None
+depends_on = None
+
+PG_DOCUMENT = (
+    "(coalesce(name, '') || ' ' || coalesce(phone, '') || ' ' || "
+    "coalesce(email, '') || ' ' || coalesce(gstin, ''))"
+)
+
+
+def upgrade():
+    op.create_index('ix_customer_name', 'customer', ['name'], unique=False)
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS customer_search "
+            "USING fts5(name, phone, email, gstin, tokenize='trigram')"
+        )
+        op.execute(
+            "INSERT INTO customer_search (rowid, name, phone, email, gstin) "
+            "SELECT id, name, phone, email, gstin FROM customer"
+        )
+    elif dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_customer_search_trgm ON customer "
+            f"USING gin ({PG_DOCUMENT} gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS customer_search')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_customer_search_trgm')
+    op.drop_index('ix_customer_name', table_name='customer')
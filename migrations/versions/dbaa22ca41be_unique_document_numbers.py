@@ -0,0 +1,49 @@
+"""Make invoice and quotation numbers unique
+
+Revision ID: dbaa22ca41be
+Revises: a41aecca3f3f
+Create Date: 2026-10-18 12:40:52.117630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dbaa22ca41be'
+down_revision = 'a41aecca3f3f'
+branch_labels = None
+depends_on = None
+
+DOCUMENT_NUMBERS = (
+    ('bill', 'invoice_number', 'uq_bill_invoice_number'),
+    ('quotation', 'quotation_number', 'uq_quotation_quotation_number'),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, column, index in DOCUMENT_NUMBERS:
+        if bind.dialect.name != 'sqlite':
+            op.alter_column(table, column, type_=sa.String(40), existing_type=sa.String(20),
+                            existing_nullable=True)
+        # Count-based numbering could hand out the same number twice (e.g. after a
+        # delete). Keep the oldest document's number and suffix the others with their id.
+        duplicates = bind.execute(sa.text(
+            f"SELECT id, {column} FROM {table} t WHERE {column} IS NOT NULL AND EXISTS ("
+            f"SELECT 1 FROM {table} o WHERE o.{column} = t.{column} AND o.id < t.id)"
+        )).fetchall()
+        for id, number in duplicates:
+            bind.execute(sa.text(f"UPDATE {table} SET {column} = :number WHERE id = :id"),
+                         {'number': f'{number}/{id}', 'id': id})
+        op.create_index(index, table, [column], unique=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, column, index in DOCUMENT_NUMBERS:
+        op.drop_index(index, table_name=table)
+        if bind.dialect.name != 'sqlite':
+            # Fails if a number no longer fits in 20 characters; such rows need renumbering first
+            op.alter_column(table, column, type_=sa.String(20), existing_type=sa.String(40),
+                            existing_nullable=True)
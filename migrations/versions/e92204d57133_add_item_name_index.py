@@ -0,0 +1,24 @@
+"""Add (name, id) index on item for keyset pagination
+
+Revision ID: e92204d57133
+Revises: 2315d397d772
+Create Date: 2026-10-18 09:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e92204d57133'
+down_revision = '2315d397d772'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_item_name_id', 'item', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_name_id', table_name='item')
@@ -0,0 +1,82 @@
+"""Content-addressed on-disk cache for rendered PDFs.
+
+Entries are named by a hash of everything that goes into the document (the
+render_document payload plus the renderer version), so any change to a bill,
+its lines, the customer snapshot or the Settings row yields a new key and a
+stale file can never be served. Files are evicted least-recently-used once the
+directory grows past max_bytes; hits refresh the file's mtime.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from pdf_renderer import RENDERER_VERSION
+
+
+class PDFCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, document):
+        payload = json.dumps([RENDERER_VERSION, document], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def get(self, key):
+        """Return the path of a cached PDF, or None on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write under a temporary name and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def discard(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in self._entries():
+            self.discard(entry.name[:-len('.pdf')])
+
+    def evict(self):
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                return [entry for entry in entries if entry.name.endswith('.pdf')]
+        except FileNotFoundError:
+            return []
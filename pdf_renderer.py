@@ -0,0 +1,371 @@
+"""PDF rendering for invoices and quotations.
+
+Documents are described as plain data (see render_document) so the same
+engine can be driven from a request, a worker process or a batch export.
+Styles, colours and the letterhead images are built once per process; the
+letterhead and footer are drawn once per document into form XObjects.
+"""
+import os
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Bump when the layout changes so cached PDFs (pdf_cache) are re-rendered
+RENDERER_VERSION = 1
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+# Letterhead images are resampled to this resolution at their printed size
+IMAGE_DPI = 300
+
+PRIMARY_COLOR = colors.HexColor('#1A8CFF')
+SECONDARY_COLOR = colors.HexColor('#424242')
+ACCENT_COLOR = colors.HexColor('#FF9900')
+LIGHT_BG = colors.HexColor('#F5F5F5')
+TEXT_COLOR = colors.HexColor('#212121')
+
+DOCUMENT_KINDS = {
+    'invoice': {
+        'banner': 'INVOICE',
+        'party_label': 'BILLED TO:',
+        'number_label': 'TAX INVOICE',
+        'footer': 'This is a computer generated invoice, no signature required.',
+    },
+    'quotation': {
+        'banner': 'QUOTATION',
+        'party_label': 'QUOTED TO:',
+        'number_label': 'QUOTATION',
+        'footer': 'This is a computer generated quotation, no signature required.',
+    },
+}
+
+CUSTOMER_FIELDS = (('phone', 'Phone'), ('email', 'Email'), ('address', 'Address'), ('gstin', 'GSTIN'))
+SELLER_FIELDS = (
+    ('address', 'Address'),
+    ('phone', 'Tel'),
+    ('email', 'Email'),
+    ('gstin', 'GSTIN'),
+    ('bank_name', 'Bank Name'),
+    ('bank_account_number', 'Acc No'),
+    ('ifsc_code', 'IFSC'),
+)
+
+STYLES = {
+    'NormalText': ParagraphStyle(name='NormalText', fontSize=8, leading=10, alignment=0,
+                                 fontName='Helvetica', textColor=TEXT_COLOR),
+    'TableHeader': ParagraphStyle(name='TableHeader', fontSize=9, leading=11, alignment=1,
+                                  fontName='Helvetica', textColor=colors.white),
+    'TableCell': ParagraphStyle(name='TableCell', fontSize=8, leading=10, alignment=1,
+                                fontName='Helvetica', textColor=TEXT_COLOR),
+    'TotalAmount': ParagraphStyle(name='TotalAmount', fontSize=9, leading=11, alignment=2,
+                                  fontName='Helvetica', textColor=PRIMARY_COLOR),
+    'CompanyName': ParagraphStyle(name='CenteredCompanyName', fontSize=14, leading=18, alignment=0,
+                                  fontName='Helvetica-Bold', textColor=PRIMARY_COLOR),
+    'PartyLabel': ParagraphStyle(name='BillToMedium', fontSize=12, leading=14, alignment=0,
+                                 fontName='Helvetica-Bold', textColor=PRIMARY_COLOR),
+    'PartyName': ParagraphStyle(name='CustomerMedium', fontSize=11, leading=13, alignment=0,
+                                fontName='Helvetica-Bold', textColor=TEXT_COLOR),
+    'PartyDetail': ParagraphStyle(name='CustomerMedium', fontSize=10, leading=12, alignment=0,
+                                  fontName='Helvetica', textColor=TEXT_COLOR),
+    'SellerHeader': ParagraphStyle(name='SellerDetailsHeader', fontSize=11, leading=13, alignment=0,
+                                   fontName='Helvetica-Bold', textColor=PRIMARY_COLOR),
+    'SellerDetail': ParagraphStyle(name='CompanyDetailCompact', fontSize=9, leading=9, spaceAfter=0,
+                                   fontName='Helvetica', textColor=SECONDARY_COLOR),
+    'DocumentNumber': ParagraphStyle(name='InvoiceLabel', fontSize=11, leading=13, alignment=0,
+                                     fontName='Helvetica-Bold', textColor=ACCENT_COLOR),
+    'ThankYou': ParagraphStyle(name='ThankYou', fontSize=10, alignment=1,
+                               textColor=PRIMARY_COLOR, fontName='Helvetica'),
+    'Footer': ParagraphStyle(name='MinimalFooter', fontSize=6, leading=8, alignment=1,
+                             fontName='Helvetica', textColor=SECONDARY_COLOR),
+}
+
+BANNER_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, 0), PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
+    ('FONTNAME', (0, 0), (0, 0), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (0, 0), 14),
+    ('ALIGNMENT', (0, 0), (0, 0), 'CENTER'),
+    ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (0, 0), 4),
+    ('BOTTOMPADDING', (0, 0), (0, 0), 4),
+])
+LOGO_ROW_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (1, 0), 'CENTER'),
+    ('VALIGN', (0, 0), (1, 0), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (1, 0), 0),
+    ('RIGHTPADDING', (0, 0), (1, 0), 0),
+    ('TOPPADDING', (0, 0), (1, 0), 0),
+    ('BOTTOMPADDING', (0, 0), (1, 0), 0),
+])
+PARTY_BOX_STYLE = TableStyle([
+    ('BOX', (0, 0), (-1, -1), 1, PRIMARY_COLOR),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+SELLER_BOX_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (0, -1), 'MIDDLE'),
+    ('BOX', (0, 0), (-1, -1), 1, PRIMARY_COLOR),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+])
+NUMBER_BOX_STYLE = TableStyle([
+    ('BOX', (0, 0), (-1, -1), 1, ACCENT_COLOR),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 10),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+])
+STACKED_BOXES_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (0, -1), 'TOP'),
+    ('TOPPADDING', (0, 0), (0, 0), 0),
+    ('BOTTOMPADDING', (0, 0), (0, 0), 2),
+    ('TOPPADDING', (0, 1), (0, 1), 2),
+    ('BOTTOMPADDING', (0, 1), (0, 1), 0),
+])
+INFO_ROW_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('VALIGN', (0, 0), (1, 0), 'TOP'),
+    ('LEFTPADDING', (0, 0), (1, 0), 0),
+    ('RIGHTPADDING', (0, 0), (1, 0), 0),
+    ('TOPPADDING', (0, 0), (1, 0), 0),
+    ('BOTTOMPADDING', (0, 0), (1, 0), 0),
+])
+THANK_YOU_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+])
+
+LINE_COLUMNS = ['Item Description', 'HSN/SAC', 'Qty', 'Unit Price', 'Tax %', 'Tax Amt', 'Total']
+LINE_COLUMN_WIDTHS = [150, 70, 50, 70, 50, 70, 120]
+# Numeric cells are plain strings styled by the table rather than one Paragraph each
+LINES_BASE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('LEADING', (0, 0), (-1, 0), 11),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('LEADING', (0, 1), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 1), (-1, -1), TEXT_COLOR),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+    ('TOPPADDING', (0, 0), (-1, 0), 6),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+    ('TOPPADDING', (0, 1), (-1, -1), 6),
+]
+
+
+@lru_cache(maxsize=None)
+def static_image(filename, width, height):
+    """Decode a static image once per process, resampled for printing at width x height points."""
+    path = os.path.join(STATIC_DIR, filename)
+    if not os.path.exists(path):
+        return None
+    with PILImage.open(path) as image:
+        size = (round(width * IMAGE_DPI / 72), round(height * IMAGE_DPI / 72))
+        resampled = image.convert('RGB').resize(size, PILImage.LANCZOS)
+    reader = ImageReader(resampled)
+    reader.getRGBData()  # decode now rather than in the first request
+    return reader
+
+
+class ImageCell(Flowable):
+    """A cached image drawn at a fixed size."""
+
+    def __init__(self, reader, width, height):
+        super().__init__()
+        self.reader = reader
+        self.width = width
+        self.height = height
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.width, self.height)
+
+
+class FormBlock(Flowable):
+    """Stacks flowables into a named form XObject, drawn once per document and placed with doForm."""
+
+    def __init__(self, name, flowables):
+        super().__init__()
+        self.name = name
+        self.flowables = flowables
+
+    def wrap(self, availWidth, availHeight):
+        self._sizes = [flowable.wrap(availWidth, availHeight) for flowable in self.flowables]
+        self.width = availWidth
+        self.height = sum(height for _, height in self._sizes)
+        return self.width, self.height
+
+    def draw(self):
+        canv = self.canv
+        if not canv.hasForm(self.name):
+            canv.beginForm(self.name, 0, 0, self.width, self.height)
+            y = self.height
+            for flowable, (width, height) in zip(self.flowables, self._sizes):
+                y -= height
+                x = 0
+                if getattr(flowable, 'hAlign', 'LEFT') in ('CENTER', 'CENTRE'):
+                    x = (self.width - width) / 2
+                elif getattr(flowable, 'hAlign', 'LEFT') == 'RIGHT':
+                    x = self.width - width
+                flowable.drawOn(canv, x, y)
+            canv.endForm()
+        canv.doForm(self.name)
+
+
+def _text(value):
+    return escape(str(value)) if value else ''
+
+
+def _letterhead(kind, seller):
+    banner = Table([[kind['banner']]], colWidths=[540])
+    banner.setStyle(BANNER_STYLE)
+
+    logo = static_image('logo.png', 40, 40)
+    logo_cell = ImageCell(logo, 40, 40) if logo else Paragraph('', STYLES['NormalText'])
+    company_name = Paragraph(_text(seller.get('company_name')), STYLES['CompanyName'])
+    logo_row = Table([[logo_cell, company_name]], colWidths=[42, 200], hAlign='CENTER')
+    logo_row.setStyle(LOGO_ROW_STYLE)
+    return FormBlock('letterhead', [banner, logo_row])
+
+
+def _info_row(document, kind, seller):
+    customer = document.get('customer') or {}
+    party_rows = [[Paragraph(f"<b>{kind['party_label']}</b>", STYLES['PartyLabel'])]]
+    if customer.get('name'):
+        party_rows.append([Paragraph(f"<b>{_text(customer['name'])}</b>", STYLES['PartyName'])])
+    for field, label in CUSTOMER_FIELDS:
+        if customer.get(field):
+            party_rows.append([Paragraph(f"{label}: {_text(customer[field])}", STYLES['PartyDetail'])])
+    party_box = Table(party_rows, colWidths=[180])
+    party_box.setStyle(PARTY_BOX_STYLE)
+
+    seller_rows = [[Paragraph("<b>SELLER'S DETAILS</b>", STYLES['SellerHeader'])]]
+    for field, label in SELLER_FIELDS:
+        if seller.get(field):
+            seller_rows.append([Paragraph(f"<b>{label}:</b> {_text(seller[field])}", STYLES['SellerDetail'])])
+    seller_box = Table(seller_rows, colWidths=[300])
+    seller_box.setStyle(SELLER_BOX_STYLE)
+
+    number_rows = [[Paragraph(f"<b>{kind['number_label']} #{_text(document.get('number'))}</b>",
+                              STYLES['DocumentNumber'])]]
+    for label, value in document.get('details', []):
+        number_rows.append([Paragraph(f"{label}: {escape(str(value))}", STYLES['NormalText'])])
+    number_box = Table(number_rows, colWidths=[300])
+    number_box.setStyle(NUMBER_BOX_STYLE)
+
+    stacked_boxes = Table([[seller_box], [number_box]], colWidths=[300])
+    stacked_boxes.setStyle(STACKED_BOXES_STYLE)
+    info_row = Table([[party_box, stacked_boxes]], colWidths=[190, 320])
+    info_row.setStyle(INFO_ROW_STYLE)
+    return info_row
+
+
+def _lines_table(document):
+    data = [list(LINE_COLUMNS)]
+    row_styles = list(LINES_BASE_STYLE)
+    for i, line in enumerate(document.get('lines', [])):
+        tax_rate = line.get('tax_rate') or 0
+        net = line['price'] * line['quantity']
+        tax_amount = net * tax_rate / 100
+        if i % 2 == 0:
+            row_styles.append(('BACKGROUND', (0, i + 1), (-1, i + 1), LIGHT_BG))
+        data.append([
+            Paragraph(_text(line.get('name')), STYLES['TableCell']),
+            line.get('hsn') or '',
+            str(line['quantity']),
+            f"{line['price']:.2f}",
+            f"{tax_rate:.1f}%",
+            f"{tax_amount:.2f}",
+            f"{net + tax_amount:.2f}",
+        ])
+
+    totals_row = len(data)
+    data.extend([
+        ['', '', '', '', '', Paragraph('Subtotal:', STYLES['TableCell']),
+         Paragraph(f"{document['subtotal']:.2f}", STYLES['TotalAmount'])],
+        ['', '', '', '', '', Paragraph('Total Tax:', STYLES['TableCell']),
+         Paragraph(f"{document['total_tax']:.2f}", STYLES['TotalAmount'])],
+        ['', '', '', '', '', Paragraph('TOTAL:', STYLES['TableHeader']),
+         Paragraph(f"{document['total']:.2f}", STYLES['TotalAmount'])],
+    ])
+    row_styles.extend([
+        ('BACKGROUND', (5, totals_row), (6, totals_row + 2), colors.white),
+        ('TEXTCOLOR', (5, totals_row + 2), (6, totals_row + 2), TEXT_COLOR),
+        ('SPAN', (0, totals_row), (4, totals_row)),
+        ('SPAN', (0, totals_row + 1), (4, totals_row + 1)),
+        ('SPAN', (0, totals_row + 2), (4, totals_row + 2)),
+        ('ALIGN', (5, totals_row), (6, totals_row + 2), 'RIGHT'),
+        ('LINEABOVE', (5, totals_row), (6, totals_row), 0.5, colors.black),
+    ])
+    table = Table(data, colWidths=LINE_COLUMN_WIDTHS)
+    table.setStyle(TableStyle(row_styles))
+    return table
+
+
+def _footer(kind):
+    sign = static_image('sign.png', 100, 50)
+    sign_row = Table([['', ImageCell(sign, 100, 50) if sign else '']], colWidths=[390, 150], hAlign='RIGHT')
+    thank_you = Table([[Paragraph('THANK YOU FOR YOUR BUSINESS!', STYLES['ThankYou'])]], colWidths=[540])
+    thank_you.setStyle(THANK_YOU_STYLE)
+    return FormBlock('footer', [
+        sign_row,
+        Spacer(1, 20),
+        thank_you,
+        Spacer(1, 5),
+        Paragraph(kind['footer'], STYLES['Footer']),
+    ])
+
+
+def render_document(document):
+    """Render an invoice or quotation to a PDF and return it as a rewound BytesIO.
+
+    `document` is plain data:
+        kind       'invoice' or 'quotation'
+        number     document number
+        details    [(label, value), ...] shown under the number (date, payment mode, ...)
+        customer   dict with name, phone, email, address, gstin
+        seller     dict of Settings fields (company_name, address, phone, ...)
+        lines      [{name, hsn, quantity, price, tax_rate}, ...]
+        subtotal, total_tax, total
+    """
+    kind = DOCUMENT_KINDS[document['kind']]
+    seller = document.get('seller') or {}
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                            rightMargin=20, leftMargin=40,
+                            topMargin=8, bottomMargin=20)
+    doc.build([
+        _letterhead(kind, seller),
+        _info_row(document, kind, seller),
+        Spacer(1, 10),
+        _lines_table(document),
+        Spacer(1, 20),
+        _footer(kind),
+    ])
+    buffer.seek(0)
+    return buffer
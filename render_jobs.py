@@ -0,0 +1,153 @@
+"""Off-request PDF rendering on a process pool.
+
+A job's id is its pdf_cache key, so identical documents share one job and a
+finished job is simply a cached PDF. Job state lives next to the cache files
+(<key>.job while pending, <key>.err after a failure) so any gunicorn worker
+can answer a status request, not only the one that submitted the job. Failed
+and abandoned jobs are forgotten `keep_failed` seconds after they end; their
+markers are removed when next looked at and by the sweep on every submit.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import timed_render
+from pdf_cache import PDFCache
+from pdf_renderer import render_document
+
+
+class RenderQueueFull(Exception):
+    """Raised when this process already has max_pending render jobs in flight."""
+
+
+def render_job(directory, max_bytes, key, document):
+    """Render one document into the cache. Runs in a pool process."""
+    cache = PDFCache(directory, max_bytes)
+    marker = os.path.join(directory, f'{key}.job')
+    try:
+        with timed_render(document['kind']):
+            data = render_document(document).getvalue()
+        cache.put(key, data)
+    except Exception as e:
+        with open(os.path.join(directory, f'{key}.err'), 'w') as f:
+            f.write(f'{type(e).__name__}: {e}')
+        raise
+    finally:
+        try:
+            os.remove(marker)
+        except FileNotFoundError:
+            pass
+
+
+class RenderQueue:
+    def __init__(self, cache, max_workers=2, max_pending=16, timeout=120, keep_failed=3600):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        # A pending marker older than this belongs to a job whose process died
+        self.timeout = timeout
+        self.keep_failed = keep_failed
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _marker(self, key, suffix):
+        return os.path.join(self.cache.directory, f'{key}.{suffix}')
+
+    def _marker_expired(self, path, now):
+        """Remove `path` if it is an .err marker older than keep_failed or a .job marker that
+        also outlived timeout; return whether it is gone."""
+        try:
+            age = now - os.path.getmtime(path)
+        except FileNotFoundError:
+            return True
+        if age < self.keep_failed + (self.timeout if path.endswith('.job') else 0):
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def status(self, key):
+        """'done', 'pending', 'failed', or None for an unknown or expired job."""
+        if os.path.exists(self.cache.path(key)):
+            return 'done'
+        now = time.time()
+        if not self._marker_expired(self._marker(key, 'err'), now):
+            return 'failed'
+        marker = self._marker(key, 'job')
+        try:
+            submitted = os.path.getmtime(marker)
+        except FileNotFoundError:
+            return None
+        if now - submitted < self.timeout:
+            return 'pending'
+        return None if self._marker_expired(marker, now) else 'failed'
+
+    def prune(self):
+        """Remove the markers of every expired job, including ones nobody asks about again."""
+        now = time.time()
+        try:
+            with os.scandir(self.cache.directory) as entries:
+                markers = [entry.path for entry in entries if entry.name.endswith(('.job', '.err'))]
+        except FileNotFoundError:
+            return
+        for path in markers:
+            self._marker_expired(path, now)
+
+    def error(self, key):
+        try:
+            with open(self._marker(key, 'err')) as f:
+                return f.read()
+        except FileNotFoundError:
+            return 'Render timed out' if self.status(key) == 'failed' else None
+
+    def submit(self, document):
+        """Queue a render unless it is cached or already running; return the job id."""
+        key = self.cache.key(document)
+        if self.status(key) in ('done', 'pending'):
+            return key
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise RenderQueueFull()
+            if self._executor is None:
+                # spawn, not fork: gunicorn workers are threaded and hold DB connections
+                self._executor = ProcessPoolExecutor(self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            executor = self._executor
+            self._pending += 1
+
+        os.makedirs(self.cache.directory, exist_ok=True)
+        self.prune()
+        for suffix in ('err', 'job'):
+            try:
+                os.remove(self._marker(key, suffix))
+            except FileNotFoundError:
+                pass
+        open(self._marker(key, 'job'), 'w').close()
+        try:
+            future = executor.submit(render_job, self.cache.directory, self.cache.max_bytes, key, document)
+        except BrokenProcessPool:
+            with self._lock:
+                self._pending -= 1
+                self._executor = None
+            os.remove(self._marker(key, 'job'))
+            raise
+        future.add_done_callback(self._finished)
+        return key
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending -= 1
+            if isinstance(future.exception(), BrokenProcessPool):
+                self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,77 @@
+"""Demand velocity, reorder points and order quantities for every item at once.
+
+Sales history arrives as per-item sums of daily quantity and of daily
+quantity squared, over any split of the window (one row per item and day, or
+already summed per item by the database), in chunks of any size. Each chunk
+is mapped onto the sorted item ids with searchsorted and folded in with
+bincount, so nothing loops per item or holds an items x days matrix, and days
+without sales count as zero demand.
+
+With mean daily demand d, its standard deviation s, lead time L days,
+`cover_days` C of stock to buy after the lead time and service factor z:
+
+    safety stock   z * s * sqrt(L)
+    reorder point  ceil(d * L + safety stock)
+    order-up-to    ceil(d * (L + C) + safety stock)
+
+An item is due for reordering once its stock is at or below its reorder
+point, and the suggested quantity brings it back up to the order-up-to level.
+Items that sold nothing in the window get no suggestion.
+"""
+import numpy as np
+
+
+class DemandHistory:
+    """Per-item daily demand sums over a window of `days` days, for the items in `item_ids`."""
+
+    def __init__(self, item_ids, days):
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        if np.any(self.item_ids[1:] <= self.item_ids[:-1]):
+            raise ValueError('item_ids must be sorted and unique')
+        self.days = days
+        self.total = np.zeros(len(self.item_ids))
+        self.total_squares = np.zeros(len(self.item_ids))
+
+    def add(self, item_ids, totals, total_squares):
+        """Fold in sums of daily quantity and of its square per item id; ids not in the catalog are ignored."""
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if not len(self.item_ids) or not len(item_ids):
+            return
+        index = np.searchsorted(self.item_ids, item_ids)
+        index[index == len(self.item_ids)] = 0
+        known = self.item_ids[index] == item_ids
+        index = index[known]
+        size = len(self.item_ids)
+        self.total += np.bincount(index, weights=np.asarray(totals, dtype=np.float64)[known], minlength=size)
+        self.total_squares += np.bincount(index, weights=np.asarray(total_squares, dtype=np.float64)[known],
+                                          minlength=size)
+
+    def mean(self):
+        return self.total / self.days
+
+    def std(self):
+        mean = self.mean()
+        # Rounding can leave E[q^2] - E[q]^2 slightly negative for constant demand
+        return np.sqrt(np.maximum(self.total_squares / self.days - mean * mean, 0.0))
+
+
+def plan(stock, mean, std, lead_time_days, cover_days, service_z):
+    """Return {name: array} with reorder_point, order_up_to, days_of_cover and suggested_quantity.
+
+    days_of_cover is NaN for items without demand and 0 for items out of stock.
+    """
+    stock = np.asarray(stock, dtype=np.float64)
+    safety = service_z * std * np.sqrt(lead_time_days)
+    reorder_point = np.ceil(mean * lead_time_days + safety)
+    order_up_to = np.ceil(mean * (lead_time_days + cover_days) + safety)
+    selling = mean > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(selling, np.maximum(stock, 0.0) / mean, np.nan)
+    due = selling & (stock <= reorder_point)
+    suggested = np.where(due, np.maximum(order_up_to - stock, 0.0), 0.0)
+    return {
+        'reorder_point': reorder_point.astype(np.int64),
+        'order_up_to': order_up_to.astype(np.int64),
+        'days_of_cover': days_of_cover,
+        'suggested_quantity': suggested.astype(np.int64),
+    }
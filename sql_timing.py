@@ -0,0 +1,83 @@
+"""Statement counting, timing and slow-query capture on SQLAlchemy engines.
+
+QueryTimer listens to before/after_cursor_execute on every Engine and adds
+each statement to whatever QueryStats `current_stats()` returns (None to
+ignore it). Statements slower than `slow_threshold()` seconds are passed to
+`on_slow` together with their EXPLAIN output, which is fetched on the raw
+DBAPI connection so it is neither counted nor timed itself.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+}
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def milliseconds(self):
+        return self.seconds * 1000
+
+    def add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+
+
+def explain(conn, statement, parameters):
+    """Return the plan for a statement as text lines, or None if the backend can't explain it."""
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [' '.join(str(value) for value in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f'EXPLAIN failed: {type(e).__name__}: {e}']
+    finally:
+        cursor.close()
+
+
+class QueryTimer:
+    def __init__(self, current_stats, slow_threshold, on_slow):
+        self.current_stats = current_stats
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+
+    def install(self, target=Engine):
+        event.listen(target, 'before_cursor_execute', self._before)
+        event.listen(target, 'after_cursor_execute', self._after)
+        event.listen(target, 'handle_error', self._failed)
+
+    def uninstall(self, target=Engine):
+        event.remove(target, 'before_cursor_execute', self._before)
+        event.remove(target, 'after_cursor_execute', self._after)
+        event.remove(target, 'handle_error', self._failed)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        elapsed = time.perf_counter() - started
+        stats = self.current_stats()
+        if stats is not None:
+            stats.add(elapsed)
+        threshold = self.slow_threshold()
+        if threshold is not None and elapsed >= threshold:
+            plan = None if executemany else explain(conn, statement, parameters)
+            self.on_slow(statement, parameters, elapsed, plan)
+
+    def _failed(self, context):
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
@@ -1,14 +1,53 @@
+import base64
+import io
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+import zipfile
+import zlib
+from datetime import datetime
 import pytest
-from app import app, db, Item, Customer
+import app as app_module
+from app import app, db, Item, Customer, Bill, BillItem, DailySales, MonthlySales, rebuild_sales_rollups, take_stock, \
+    DocumentSequence, next_invoice_number, QuotationItem, filter_date_range, pdf_cache, \
+    render_queue, ImportJob, run_import_job, ProductSalesSummary, reference_cache, current_settings, seed_database, \
+    Quotation, claim_bill_lines
+from tiered_cache import LocalStore, TieredCache
+from prometheus_client import CollectorRegistry, multiprocess
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    reference_cache.clear()
     with app.test_client() as client:
         with app.app_context():
             db.create_all()
         yield client
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+def add_customer_and_item(client, stock=10):
+    client.post('/add_customer', data={
+        'name': 'Test Customer',
+        'phone': '1234567890',
+        'email': 'test@example.com',
+        'address': '123 Test St',
+        'gstin': 'GST123'
+    }, follow_redirects=True)
+    client.post('/add_item', data={
+        'name': 'Test Item',
+        'description': 'A test item',
+        'price': 100,
+        'stock': stock,
+        'hsn_sac_number': '1234',
+        'tax_rate': 18
+    }, follow_redirects=True)
+    return Customer.query.first(), Item.query.first()
 
 def test_force_delete_item_and_references(client):
     # Add a customer
@@ -68,4 +107,1011 @@ def test_force_delete_item_and_references(client):
     quotation_page = client.get('/quotations')
     assert b'Not Available' in quotation_page.data or b'not available' in quotation_page.data
 
-    # Optionally, check inventory history, etc. 
\ No newline at end of file
+    # Optionally, check inventory history, etc.
+
+def test_sales_rollups_track_bill_writes(client):
+    customer, item = add_customer_and_item(client)
+    for quantity in ('2', '3'):
+        client.post('/create_bill', data={
+            'customer_id': customer.id,
+            'payment_mode': 'Cash',
+            'items[]': [str(item.id)],
+            'quantities[]': [quantity]
+        }, follow_redirects=True)
+
+    month = MonthlySales.query.one()
+    assert month.bill_count == 2
+    assert month.total_amount == pytest.approx(590.0)
+    assert DailySales.query.one().total_amount == pytest.approx(590.0)
+
+    bill = Bill.query.order_by(Bill.id).first()
+    client.post(f'/delete_bill/{bill.id}', follow_redirects=True)
+    assert MonthlySales.query.one().bill_count == 1
+    assert MonthlySales.query.one().total_amount == pytest.approx(354.0)
+
+    page = client.get('/')
+    assert b'354.00' in page.data
+
+    rebuild_sales_rollups()
+    assert MonthlySales.query.one().total_amount == pytest.approx(354.0)
+    assert DailySales.query.one().bill_count == 1
+
+def test_dashboard_totals_track_customer_and_item_writes(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMPORT_DIR', str(tmp_path))
+
+    def assert_totals_match_tables():
+        db.session.expire_all()
+        totals = db.session.get(app_module.DashboardTotals, app_module.DASHBOARD_TOTALS_ID)
+        assert totals.customer_count == Customer.query.count()
+        assert totals.inventory_value == pytest.approx(app_module.inventory_value())
+
+    # Rows written before the rollup existed are counted when the first write creates it
+    db.session.add(Customer(name='Existing Customer'))
+    db.session.add(Item(name='Existing Item', price=2.5, stock=4))
+    db.session.commit()
+    assert b'10.00' in client.get('/').data
+    customer, item = add_customer_and_item(client, stock=10)
+    assert_totals_match_tables()
+
+    client.post('/create_bill', data={'customer_id': customer.id, 'payment_mode': 'cash',
+                                      'items[]': [str(item.id)], 'quantities[]': ['3']})
+    assert_totals_match_tables()
+    client.post(f'/edit_item/{item.id}', data={'name': 'Test Item', 'description': 'A test item', 'price': 80,
+                                              'stock': 9, 'hsn_sac_number': '', 'tax_rate': 18})
+    assert_totals_match_tables()
+    client.post(f'/delete_bill/{Bill.query.one().id}')
+    assert_totals_match_tables()
+    client.post('/import_items', data={'file': (io.BytesIO(b'name,description,price,stock,hsn_sac_number,tax_rate\n'
+                                                           b'Test Item,A test item,90,5,,\nNew Item,,50,3,,\n'),
+                                                'items.csv')}, content_type='multipart/form-data')
+    assert_totals_match_tables()
+    client.post(f'/delete_item/{Item.query.filter_by(name="New Item").one().id}')
+    client.post(f'/delete_customer/{customer.id}')
+    assert_totals_match_tables()
+
+    page = client.get('/').data.decode()
+    assert f'{app_module.inventory_value():.2f}' in page
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    db.event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.get('/')
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', record)
+    assert not any(re.search(r'\bFROM customer\b', statement) for statement in statements)
+    assert not any('item.price * item.stock' in statement for statement in statements)
+
+    rebuild_sales_rollups()
+    assert_totals_match_tables()
+
+def test_items_api_keyset_pagination(client):
+    for name, stock in [('Bolt', 5), ('Anchor', 15), ('Cable', 30), ('Bracket', 8), ('Anvil', 50)]:
+        client.post('/add_item', data={
+            'name': name,
+            'description': '',
+            'price': 10,
+            'stock': stock,
+            'hsn_sac_number': '7318',
+            'tax_rate': 18
+        })
+
+    names = []
+    cursor = None
+    while True:
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        data = client.get('/api/items', query_string=params).get_json()
+        names.extend(item['name'] for item in data['items'])
+        cursor = data['next_cursor']
+        if not data['has_more']:
+            break
+    assert names == ['Anchor', 'Anvil', 'Bolt', 'Bracket', 'Cable']
+
+    data = client.get('/api/items', query_string={'q': 'b', 'stock': 'low'}).get_json()
+    assert [item['name'] for item in data['items']] == ['Bolt', 'Bracket']
+    data = client.get('/api/items', query_string={'q': 'aN'}).get_json()
+    assert [item['name'] for item in data['items']] == ['Anchor', 'Anvil']
+    with app.app_context():
+        plan = db.session.execute(db.text(
+            'EXPLAIN QUERY PLAN SELECT id FROM item WHERE lower(name) >= :low AND lower(name) < :high'
+        ), {'low': 'an', 'high': 'ao'}).all()
+        assert 'ix_item_name_lower' in str(plan)
+
+    for cursor in (app_module.encode_cursor({'a': 1}, 1), app_module.encode_cursor('Anvil', 'x'), 'not-a-cursor'):
+        assert client.get('/api/items', query_string={'cursor': cursor}).status_code == 400
+    assert client.get('/api/items', query_string={'sort': 'stock', 'cursor': app_module.encode_cursor('5', 1)})\
+        .status_code == 400
+
+    data = client.get('/api/items', query_string={'sort': 'stock', 'order': 'desc', 'limit': 3}).get_json()
+    assert [item['stock'] for item in data['items']] == [50, 30, 15]
+    assert client.get('/api/items', query_string={'sort': 'bogus'}).status_code == 400
+
+def test_bills_list_pages_by_cursor_and_filters(client):
+    customer, item = add_customer_and_item(client, stock=100)
+    for payment_mode in ('cash', 'upi', 'cash'):
+        client.post('/create_bill', data={
+            'customer_id': customer.id,
+            'payment_mode': payment_mode,
+            'items[]': [str(item.id)],
+            'quantities[]': ['1']
+        })
+    bills = Bill.query.order_by(Bill.created_at.desc(), Bill.id.desc()).all()
+
+    first = client.get('/bills', query_string={'limit': 2})
+    assert bills[0].invoice_number.encode() in first.data
+    assert bills[2].invoice_number.encode() not in first.data
+    assert b'Older' in first.data
+
+    cursor = re.search(rb'cursor=([\w-]+)', first.data).group(1).decode()
+    second = client.get('/bills', query_string={'limit': 2, 'cursor': cursor})
+    assert bills[2].invoice_number.encode() in second.data
+    assert bills[0].invoice_number.encode() not in second.data
+
+    page = client.get('/bills', query_string={'payment_mode': 'upi'})
+    assert page.data.count(b'Download Bill') == 1
+
+    today = bills[0].created_at.strftime('%Y-%m-%d')
+    page = client.get('/bills', query_string={'start': today, 'end': today, 'customer_id': customer.id})
+    assert page.data.count(b'Download Bill') == 3
+    page = client.get('/bills', query_string={'end': '2000-01-01'})
+    assert b'No bills found.' in page.data
+
+    # Tampered cursors are refused rather than silently restarting from the first page
+    for bad in ('not-a-cursor', app_module.encode_cursor('yesterday', 1), app_module.encode_cursor(5, 1),
+                app_module.encode_cursor(bills[0].created_at, '1'), app_module.encode_cursor(bills[0].created_at)):
+        response = client.get('/bills', query_string={'payment_mode': 'upi', 'cursor': bad})
+        assert response.status_code == 302
+        assert response.headers['Location'].endswith('/bills?payment_mode=upi')
+    assert b'That page link is invalid' in client.get('/bills', query_string={'cursor': 'x'},
+                                                      follow_redirects=True).data
+
+def test_customer_search_uses_index_and_ranks(client):
+    for name, phone, email in [('Ravi Traders', '9876500001', 'ravi@example.com'),
+                               ('Sharma Hardware', '9876500002', 'info@sharma.in'),
+                               ('Ravindra Steel', '9123400003', 'sales@steel.in')]:
+        client.post('/add_customer', data={
+            'name': name, 'phone': phone, 'email': email, 'address': '', 'gstin': ''
+        })
+
+    page = client.get('/customers', query_string={'search': 'ravi'})
+    assert b'Ravi Traders' in page.data
+    assert b'Ravindra Steel' in page.data
+    assert b'Sharma Hardware' not in page.data
+
+    # Substring matches on other columns, and edits are reflected in the index
+    assert b'Sharma Hardware' in client.get('/customers', query_string={'search': 'arma.i'}).data
+    sharma = Customer.query.filter_by(name='Sharma Hardware').first()
+    client.post(f'/edit_customer/{sharma.id}', data={
+        'name': 'Verma Hardware', 'phone': '9876500002', 'email': 'info@verma.in', 'address': '', 'gstin': ''
+    })
+    assert b'Verma Hardware' not in client.get('/customers', query_string={'search': 'sharma'}).data
+    assert b'Verma Hardware' in client.get('/customers', query_string={'search': 'verma'}).data
+
+    # Short terms fall back to a bounded scan
+    assert b'Ravi Traders' in client.get('/customers', query_string={'search': 'Ra'}).data
+
+def test_bill_writes_apply_stock_atomically(client):
+    customer, item = add_customer_and_item(client, stock=10)
+
+    # Quantities for the same item are summed before checking stock
+    client.post('/create_bill', data={
+        'customer_id': customer.id,
+        'payment_mode': 'cash',
+        'items[]': [str(item.id), str(item.id)],
+        'quantities[]': ['6', '6']
+    })
+    assert Bill.query.count() == 0
+    assert db.session.get(Item, item.id).stock == 10
+
+    client.post('/create_bill', data={
+        'customer_id': customer.id,
+        'payment_mode': 'cash',
+        'items[]': [str(item.id), str(item.id)],
+        'quantities[]': ['3', '4']
+    })
+    bill = Bill.query.one()
+    assert BillItem.query.filter_by(bill_id=bill.id).count() == 2
+    assert bill.total_amount == pytest.approx(826.0)
+    assert db.session.get(Item, item.id).stock == 3
+
+    client.post(f'/edit_bill/{bill.id}', data={
+        'customer_id': customer.id,
+        'payment_mode': 'upi',
+        'items[]': [str(item.id)],
+        'quantities[]': ['9'],
+        'prices[]': ['100'],
+        'tax_rates[]': ['18']
+    })
+    db.session.expire_all()
+    assert db.session.get(Item, item.id).stock == 1
+    assert BillItem.query.filter_by(bill_id=bill.id).one().quantity == 9
+
+    # A decrement that would go negative changes nothing
+    assert take_stock({item.id: 2}) is False
+    db.session.rollback()
+    assert db.session.get(Item, item.id).stock == 1
+
+    client.post(f'/delete_bill/{bill.id}')
+    db.session.expire_all()
+    assert db.session.get(Item, item.id).stock == 10
+
+def pdf_content(data):
+    """Check a PDF's header, trailer and xref offset; return its page count and decoded content streams."""
+    assert data.startswith(b'%PDF-') and data.rstrip().endswith(b'%%EOF')
+    startxref = int(re.search(rb'startxref\s+(\d+)\s+%%EOF\s*$', data).group(1))
+    assert data[startxref:startxref + 4] == b'xref'
+    streams = []
+    for stream in re.findall(rb'/Filter \[ /ASCII85Decode /FlateDecode \].*?stream\r?\n(.*?)endstream', data, re.S):
+        streams.append(zlib.decompress(base64.a85decode(stream.strip(), adobe=True)))
+    return len(re.findall(rb'/Type /Page\b', data)), b''.join(streams)
+
+def test_invoice_and_quotation_pdfs_render(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'directory', str(tmp_path))
+    customer, item = add_customer_and_item(client, stock=100)
+    client.post('/add_item', data={'name': 'Nuts & <Bolts>', 'description': '', 'price': 5, 'stock': 100,
+                                   'hsn_sac_number': '7318', 'tax_rate': 0})
+    second = Item.query.filter_by(name='Nuts & <Bolts>').one()
+    # Enough lines to spill onto a second page
+    lines = {'items[]': [str(item.id), str(second.id)] * 30, 'quantities[]': ['1'] * 60}
+    client.post('/create_bill', data={'customer_id': customer.id, 'payment_mode': 'cash', **lines})
+    bill = Bill.query.one()
+
+    invoice = client.get(f'/download_bill/{bill.id}')
+    assert invoice.status_code == 200 and invoice.mimetype == 'application/pdf'
+    pages, content = pdf_content(invoice.data)
+    assert pages >= 2
+    assert bill.invoice_number.encode() in content and b'Test Customer' in content
+    assert b'(Nuts & <' in content and b'&amp;' not in content  # markup in names is escaped, not interpreted
+
+    quotation = client.post('/quotations', data={'customer_id': customer.id, 'valid_until': '2099-12-31',
+                                                 'items[]': [str(item.id)], 'quantities[]': ['3'],
+                                                 'prices[]': ['100']})
+    assert quotation.status_code == 200 and quotation.mimetype == 'application/pdf'
+    pages, content = pdf_content(quotation.data)
+    assert pages == 1
+    assert Quotation.query.one().quotation_number.encode() in content and b'31/12/2099' in content
+
+def test_bill_pdf_cache_serves_etags_and_invalidates(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'directory', str(tmp_path))
+    customer, item = add_customer_and_item(client, stock=10)
+    client.post('/create_bill', data={
+        'customer_id': customer.id,
+        'payment_mode': 'cash',
+        'items[]': [str(item.id)],
+        'quantities[]': ['2']
+    })
+    bill = Bill.query.one()
+
+    first = client.get(f'/download_bill/{bill.id}')
+    assert first.status_code == 200
+    assert first.data.startswith(b'%PDF')
+    etag = first.headers['ETag'].strip('"')
+    assert [path.name for path in tmp_path.iterdir()] == [f'{etag}.pdf']
+
+    repeat = client.get(f'/download_bill/{bill.id}')
+    assert repeat.headers['ETag'].strip('"') == etag
+    assert repeat.data == first.data
+    assert client.get(f'/download_bill/{bill.id}', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+
+    client.post(f'/edit_bill/{bill.id}', data={
+        'customer_id': customer.id,
+        'payment_mode': 'upi',
+        'items[]': [str(item.id)],
+        'quantities[]': ['3'],
+        'prices[]': ['100'],
+        'tax_rates[]': ['18']
+    })
+    assert not (tmp_path / f'{etag}.pdf').exists()
+    edited = client.get(f'/download_bill/{bill.id}', headers={'If-None-Match': f'"{etag}"'})
+    assert edited.status_code == 200
+    assert edited.headers['ETag'].strip('"') != etag
+
+    client.post('/settings', data={'company_name': 'Renamed Traders'})
+    assert list(tmp_path.iterdir()) == []
+
+    # Least recently used entries go first once the cache is over budget
+    monkeypatch.setattr(pdf_cache, 'max_bytes', 10)
+    pdf_cache.put('a' * 64, b'12345678')
+    pdf_cache.put('b' * 64, b'12345678')
+    assert [path.name for path in tmp_path.iterdir()] == ['b' * 64 + '.pdf']
+
+    # A PDF larger than the whole cache is evicted as soon as it is stored but still served
+    tiny = client.get(f'/download_bill/{bill.id}')
+    assert tiny.status_code == 200 and tiny.data.startswith(b'%PDF')
+    assert not (tmp_path / (tiny.headers['ETag'].strip('"') + '.pdf')).exists()
+
+def test_async_render_jobs(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'directory', str(tmp_path))
+    customer, item = add_customer_and_item(client, stock=10)
+    client.post('/create_bill', data={
+        'customer_id': customer.id,
+        'payment_mode': 'cash',
+        'items[]': [str(item.id)],
+        'quantities[]': ['2']
+    })
+    bill = Bill.query.one()
+
+    try:
+        queued = client.get(f'/download_bill/{bill.id}', query_string={'async': '1'})
+        assert queued.status_code == 202
+        job = queued.get_json()
+        assert job['status'] in ('pending', 'done')
+        deadline = time.time() + 60
+        while job['status'] == 'pending' and time.time() < deadline:
+            time.sleep(0.1)
+            job = client.get(job['status_url']).get_json()
+        assert job['status'] == 'done'
+
+        result = client.get(job['result_url'])
+        assert result.status_code == 200
+        assert result.data.startswith(b'%PDF')
+        assert result.headers['ETag'].strip('"') == job['job_id']
+        assert f'bill_{bill.id}.pdf' in result.headers['Content-Disposition']
+        # The synchronous route serves the same cached file
+        assert client.get(f'/download_bill/{bill.id}').data == result.data
+
+        assert client.get('/render_jobs/unknown').status_code == 404
+
+        # A full queue pushes back instead of piling up work
+        client.post('/settings', data={'company_name': 'Renamed Traders'})
+        monkeypatch.setattr(render_queue, 'max_pending', 0)
+        busy = client.get(f'/download_bill/{bill.id}', query_string={'async': '1'})
+        assert busy.status_code == 503
+        assert busy.headers['Retry-After']
+
+        # Failed and abandoned jobs are forgotten once keep_failed has passed
+        (tmp_path / ('e' * 64 + '.err')).write_text('ValueError: bad')
+        (tmp_path / ('f' * 64 + '.job')).touch()
+        assert client.get('/render_jobs/' + 'e' * 64).get_json()['error'] == 'ValueError: bad'
+        expired = time.time() - render_queue.keep_failed - render_queue.timeout - 1
+        for name in ('e' * 64 + '.err', 'f' * 64 + '.job'):
+            os.utime(tmp_path / name, (expired, expired))
+        assert client.get('/render_jobs/' + 'e' * 64).status_code == 404
+        render_queue.prune()
+        assert not list(tmp_path.glob('*.err')) and not list(tmp_path.glob('*.job'))
+
+        # A PDF evicted between the status check and the download is reported, not a 500
+        pdf_cache.discard(job['job_id'])
+        monkeypatch.setattr(render_queue, 'status', lambda key: 'done')
+        evicted = client.get(job['result_url'])
+        assert evicted.status_code == 404
+        assert evicted.get_json()['error'] == 'Render job expired'
+    finally:
+        render_queue.shutdown()
+
+def test_bulk_invoice_export_streams_zip(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'directory', str(tmp_path))
+    customer, item = add_customer_and_item(client, stock=10)
+    for quantity in ('1', '2', '3'):
+        client.post('/create_bill', data={
+            'customer_id': customer.id,
+            'payment_mode': 'cash',
+            'items[]': [str(item.id)],
+            'quantities[]': [quantity]
+        })
+    bills = Bill.query.order_by(Bill.id).all()
+    # One invoice is already cached, the rest are rendered on the pool
+    client.get(f'/download_bill/{bills[0].id}')
+
+    assert client.get('/export/invoices').status_code == 302
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    response = client.get('/export/invoices', query_string={'start': today, 'end': today})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert sorted(archive.namelist()) == sorted(f'{bill.invoice_number}.pdf' for bill in bills)
+        assert all(archive.read(name).startswith(b'%PDF') for name in archive.namelist())
+    response.close()  # as the WSGI server does; frees the export slot
+
+    progress = client.get(response.headers['X-Export-Progress']).get_json()
+    assert progress['done'] == progress['total'] == 3
+    assert progress['finished'] is True
+
+    other = client.get('/export/invoices', query_string={'customer_id': customer.id + 1})
+    with zipfile.ZipFile(io.BytesIO(other.data)) as archive:
+        assert archive.namelist() == []
+    other.close()
+
+    # Finished exports gave their slot back; with every slot taken the next one is refused
+    for _ in range(app_module.export_pool.max_exports):
+        app_module.export_pool.acquire()
+    try:
+        busy = client.get('/export/invoices', query_string={'start': today})
+        assert busy.status_code == 503 and busy.headers['Retry-After']
+    finally:
+        for _ in range(app_module.export_pool.max_exports):
+            app_module.export_pool.release()
+
+    # Progress files expire
+    monkeypatch.setitem(app.config, 'EXPORT_PROGRESS_TTL', 0)
+    time.sleep(0.01)
+    client.get('/export/invoices', query_string={'customer_id': customer.id + 1}).close()
+    assert len(os.listdir(tmp_path / 'exports')) == 1
+
+def test_csv_exports_stream_with_filters(client):
+    customer, item = add_customer_and_item(client, stock=10)
+    with app.app_context():
+        for day in (1, 15, 28):
+            db.session.add(Bill(customer_id=customer.id, customer_name=customer.name, payment_mode='cash',
+                                invoice_number=f'INV-{day}', total_amount=day,
+                                created_at=datetime(2026, 2, day, 10, 30)))
+        db.session.commit()
+
+    response = client.get('/export/bills')
+    assert response.is_streamed
+    rows = response.get_data(as_text=True).splitlines()
+    assert rows[0] == 'Invoice Number,Customer Name,Date,Total Amount,Payment Mode'
+    assert [row.split(',')[0] for row in rows[1:]] == ['INV-28', 'INV-15', 'INV-1']
+
+    ranged = client.get('/export/bills', query_string={'start': '2026-02-15', 'end': '2026-02-28'})
+    assert [row.split(',')[0] for row in ranged.get_data(as_text=True).splitlines()[1:]] == ['INV-28', 'INV-15']
+
+    since = client.get('/export/bills', query_string={'since': '2026-02-15T10:30:00'})
+    assert [row.split(',')[0] for row in since.get_data(as_text=True).splitlines()[1:]] == ['INV-28']
+
+    assert 'Test Item' in client.get('/export/inventory').get_data(as_text=True)
+    assert client.get('/export/customers', query_string={'since': '2999-01-01'}).get_data(as_text=True) \
+        == 'Name,Phone,Email,Address,GSTIN,Created At\r\n'
+
+def test_import_items_batches_rows_and_reports_errors(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMPORT_DIR', str(tmp_path))
+    add_customer_and_item(client, stock=10)
+    csv_text = (
+        'name,description,price,stock,hsn_sac_number,tax_rate\n'
+        'Test Item,A test item,120,5,,\n'
+        'New Item,,50,3,9999,12\n'
+        'New Item,,,2,,\n'
+        ',,10,1,,\n'
+        'Broken,,abc,1,,\n'
+    )
+
+    def upload(dry_run=False):
+        data = {'file': (io.BytesIO(csv_text.encode()), 'items.csv')}
+        if dry_run:
+            data['dry_run'] = '1'
+        return client.post('/import_items', data=data, content_type='multipart/form-data')
+
+    preview = upload(dry_run=True)
+    assert b'Dry run' in preview.data
+    assert b'1 new items would be added' in preview.data
+    assert b'2 items updated' in preview.data
+    assert Item.query.count() == 1
+
+    response = upload()
+    assert b'2 rows were skipped' in response.data
+    existing = Item.query.filter_by(name='Test Item').one()
+    assert (existing.price, existing.stock, existing.tax_rate) == (120.0, 15, 18.0)
+    new_item = Item.query.filter_by(name='New Item').one()
+    assert (new_item.price, new_item.stock, new_item.hsn_sac_number, new_item.tax_rate) == (50.0, 5, '9999', 12.0)
+
+    report_id = re.search(rb'/import_items/errors/(\w+)', response.data).group(1).decode()
+    report = client.get(f'/import_items/errors/{report_id}').get_data(as_text=True).splitlines()
+    assert report[0] == 'line,error,name,description,price,stock,hsn_sac_number,tax_rate'
+    assert report[1].startswith('5,name is required')
+    assert report[2].startswith('6,"price must be a number, got \'abc\'",Broken')
+
+def test_background_import_job_progress_and_resume(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMPORT_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'IMPORT_WORKER', 'external')
+    csv_text = 'name,price,stock\nFirst,10,1\nSecond,20,2\nBad,x,1\nThird,30,3\n'
+    response = client.post('/import_items', data={
+        'file': (io.BytesIO(csv_text.encode()), 'big.csv'),
+        'background': '1'
+    }, content_type='multipart/form-data')
+    job_id = response.headers['Location'].rstrip('/').split('/')[-1]
+    progress = client.get(f'/import_jobs/{job_id}/progress').get_json()
+    assert (progress['status'], progress['total_rows'], progress['rows']) == ('queued', 4, 0)
+
+    # Pretend a worker committed the first chunk (line 2) and then died
+    job = db.session.get(ImportJob, job_id)
+    job.status, job.line_num, job.rows, job.added = 'running', 2, 1, 1
+    job.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+    assert run_import_job(job_id) is False  # still looks alive
+    job.heartbeat_at = datetime(2000, 1, 1)
+    db.session.commit()
+    assert client.get(f'/import_jobs/{job_id}/progress').get_json()['status'] == 'stalled'
+
+    assert run_import_job(job_id) is True
+    db.session.expire_all()
+    assert sorted(name for (name,) in db.session.query(Item.name)) == ['Second', 'Third']
+    progress = client.get(f'/import_jobs/{job_id}/progress').get_json()
+    assert progress['status'] == 'done'
+    assert (progress['rows'], progress['added'], progress['errors']) == (4, 3, 1)
+    assert progress['eta_seconds'] is None
+    assert 'Bad' in client.get(progress['error_report']).get_data(as_text=True)
+    assert not (tmp_path / f'{job_id}.csv').exists()
+
+def test_product_sales_pages_and_cached_summary(client, monkeypatch):
+    customer, item = add_customer_and_item(client, stock=100)
+    customer_id, item_id = customer.id, item.id
+    with app.app_context():
+        for day, quantity in ((5, 1), (6, 2), (12, 3)):  # 2026-01-05 is a Monday
+            bill = Bill(customer_id=customer_id, customer_name=customer.name, payment_mode='cash',
+                        invoice_number=f'INV-{day}', total_amount=0, created_at=datetime(2026, 1, day, 9))
+            db.session.add(bill)
+            db.session.flush()
+            db.session.add(BillItem(bill_id=bill.id, item_id=item_id, quantity=quantity, price=100, tax_rate=18))
+        db.session.commit()
+
+    first = client.get(f'/api/product_sales/{item_id}', query_string={'limit': 2}).get_json()
+    assert [sale['invoice_number'] for sale in first['sales']] == ['INV-12', 'INV-6']
+    assert first['has_more']
+    second = client.get(f'/api/product_sales/{item_id}', query_string={'limit': 2, 'cursor': first['next_cursor']})
+    assert [sale['invoice_number'] for sale in second.get_json()['sales']] == ['INV-5']
+    ranged = client.get(f'/api/product_sales/{item_id}', query_string={'start': '2026-01-06', 'end': '2026-01-06'})
+    assert [sale['invoice_number'] for sale in ranged.get_json()['sales']] == ['INV-6']
+
+    summary = client.get(f'/api/product_sales/{item_id}', query_string={'summary': '1'}).get_json()
+    assert (summary['total_quantity'], summary['revenue'], summary['distinct_customers'], summary['bill_count']) \
+        == (6, 600.0, 1, 3)
+    assert [bucket['start'] for bucket in summary['daily']] == ['2026-01-05', '2026-01-06', '2026-01-12']
+    assert [(bucket['start'], bucket['quantity']) for bucket in summary['weekly']] \
+        == [('2026-01-05', 3), ('2026-01-12', 3)]
+    assert ProductSalesSummary.query.count() == 1
+
+    # A new bill for the item invalidates the cached summary
+    client.post('/create_bill', data={
+        'customer_id': customer_id,
+        'payment_mode': 'cash',
+        'items[]': [str(item_id)],
+        'quantities[]': ['4']
+    })
+    refreshed = client.get(f'/api/product_sales/{item_id}', query_string={'summary': '1'}).get_json()
+    assert (refreshed['total_quantity'], refreshed['bill_count']) == (10, 4)
+
+    # Arbitrary ranges only keep the most recently computed summaries
+    monkeypatch.setitem(app.config, 'SUMMARY_CACHE_MAX_ROWS', 2)
+    for day in (5, 6, 7, 8):
+        client.get(f'/api/product_sales/{item_id}', query_string={'summary': '1', 'start': f'2026-01-0{day}'})
+    assert ProductSalesSummary.query.count() == 2
+
+def analytics_rollup_rows():
+    return {model.__name__: sorted(tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+                                   for row in db.session.query(*model.__table__.columns))
+            for model in (app_module.DailyPaymentSales, app_module.DailyItemSales, app_module.MonthlyItemSales,
+                          app_module.DailyCustomerSales, app_module.MonthlyCustomerSales)}
+
+def test_sales_analytics_from_rollups_and_invalidation(client, monkeypatch):
+    customer, item = add_customer_and_item(client, stock=100)
+    customer_id, item_id = customer.id, item.id
+    client.post('/add_item', data={'name': 'Cheap Item', 'description': '', 'price': 10, 'stock': 100,
+                                   'hsn_sac_number': '', 'tax_rate': 0})
+    with app.app_context():
+        cheap_id = Item.query.filter_by(name='Cheap Item').one().id
+        # Older bills straight into the table; the rebuild derives their rollups
+        for day, mode, lines in ((datetime(2020, 1, 30, 9), 'cash', [(item_id, 1, 100, 18)]),
+                                 (datetime(2020, 2, 3, 9), 'upi', [(item_id, 2, 100, 18), (cheap_id, 30, 10, 0)])):
+            total = sum(quantity * price * (1 + tax / 100) for _, quantity, price, tax in lines)
+            bill = Bill(customer_id=customer_id, customer_name='Test Customer', payment_mode=mode,
+                        total_amount=total, created_at=day)
+            db.session.add(bill)
+            db.session.flush()
+            db.session.add_all(BillItem(bill_id=bill.id, item_id=i, quantity=q, price=p, tax_rate=t)
+                               for i, q, p, t in lines)
+        db.session.commit()
+        rebuild_sales_rollups()
+
+    assert app_module.rollup_spans(datetime(2026, 1, 15).date(), datetime(2026, 3, 31).date(),
+                                   datetime(2026, 6, 1).date()) \
+        == ((datetime(2026, 2, 1).date(), datetime(2026, 3, 1).date()),
+            [(datetime(2026, 1, 15).date(), datetime(2026, 1, 31).date())])
+    data = client.get('/api/analytics/sales', query_string={'start': '2020-01-01', 'end': '2020-02-29',
+                                                            'granularity': 'week'}).get_json()
+    assert data['totals'] == {'total': 654.0, 'revenue': 600.0, 'tax': 54.0, 'bills': 2, 'average_bill': 327.0}
+    assert [(point['start'], point['total'], point['tax']) for point in data['series']] \
+        == [('2020-01-27', 118.0, 18.0), ('2020-02-03', 536.0, 36.0)]
+    assert [(row['name'], row['revenue']) for row in data['top_items_by_revenue']] \
+        == [('Test Item', 300.0), ('Cheap Item', 300.0)]
+    assert [(row['name'], row['quantity']) for row in data['top_items_by_quantity']] \
+        == [('Cheap Item', 30), ('Test Item', 3)]
+    assert [(row['name'], row['bills']) for row in data['top_customers']] == [('Test Customer', 2)]
+    assert [(row['payment_mode'], row['share']) for row in data['payment_modes']] \
+        == [('upi', round(536 / 654, 4)), ('cash', round(118 / 654, 4))]
+    # Partial months come from the daily rollups
+    february = client.get('/api/analytics/sales', query_string={'start': '2020-02-03', 'end': '2020-02-10'}).get_json()
+    assert february['totals']['bills'] == 1 and february['top_items_by_revenue'][0]['revenue'] == 300.0
+    assert client.get('/api/analytics/sales', query_string={'granularity': 'year'}).status_code == 400
+
+    # Bill writes keep the rollups in step and invalidate cached ranges of their month only
+    assert client.get('/api/analytics/sales').get_json()['totals']['bills'] == 0
+    client.post('/create_bill', data={'customer_id': customer_id, 'payment_mode': 'card',
+                                      'items[]': [str(item_id), str(cheap_id)], 'quantities[]': ['1', '5']})
+    with app.app_context():
+        bill_id = Bill.query.filter_by(payment_mode='card').one().id
+    current = client.get('/api/analytics/sales', query_string={'limit': 1}).get_json()
+    assert current['totals'] == {'total': 168.0, 'revenue': 150.0, 'tax': 18.0, 'bills': 1, 'average_bill': 168.0}
+    assert [row['item_id'] for row in current['top_items_by_revenue']] == [item_id]
+    client.post(f'/edit_bill/{bill_id}', data={'customer_id': customer_id, 'payment_mode': 'cash',
+                                               'items[]': [str(cheap_id)], 'quantities[]': ['2'],
+                                               'prices[]': ['10'], 'tax_rates[]': ['0']})
+    edited = client.get('/api/analytics/sales').get_json()
+    assert edited['totals']['total'] == 20.0
+    assert [row['payment_mode'] for row in edited['payment_modes']] == ['cash', 'card']
+    assert [row['bills'] for row in edited['payment_modes']] == [1, 0]
+    assert [row['item_id'] for row in edited['top_items_by_revenue']] == [cheap_id]
+    with app.app_context():
+        assert app_module.SalesAnalyticsSummary.query.filter_by(range_key='2020-01-01:2020-02-29').count() == 1
+        live = analytics_rollup_rows()
+        rebuild_sales_rollups()
+        rebuilt = analytics_rollup_rows()
+    # Rows a write emptied stay behind as zeros; otherwise the live rollups equal a rebuild
+    live = {name: [row for row in rows if any(row[2:])] for name, rows in live.items()}
+    rebuilt = {name: [row for row in rows if any(row[2:])] for name, rows in rebuilt.items()}
+    assert live == rebuilt
+
+    client.post(f'/delete_bill/{bill_id}')
+    assert client.get('/api/analytics/sales').get_json()['totals']['bills'] == 0
+
+    monkeypatch.setitem(app.config, 'SUMMARY_CACHE_MAX_ROWS', 2)
+    for limit in (1, 2, 3):
+        client.get('/api/analytics/sales', query_string={'start': '2020-01-01', 'end': '2020-01-31', 'limit': limit})
+    with app.app_context():
+        assert app_module.SalesAnalyticsSummary.query.count() == 2
+
+def test_replenishment_from_daily_demand(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'REPLENISH_LEAD_TIME_DAYS', 2)
+    monkeypatch.setitem(app.config, 'REPLENISH_COVER_DAYS', 5)
+    monkeypatch.setitem(app.config, 'REPLENISH_SERVICE_Z', 1)
+    customer, item = add_customer_and_item(client, stock=5)
+    customer_id, item_id = customer.id, item.id
+    client.post('/add_item', data={'name': 'Idle Item', 'description': '', 'price': 10, 'stock': 1,
+                                   'hsn_sac_number': '', 'tax_rate': 0})
+    assert b'Low Stock Items' in client.get('/').data
+    today = datetime(2020, 6, 30).date()
+    with app.app_context():
+        idle_id = Item.query.filter_by(name='Idle Item').one().id
+        # 4 a day on every other day of a 10-day window (mean 2, std 2), and a sale just before it
+        for day in [30, 28, 26, 24, 22, 20]:
+            bill = Bill(customer_id=customer_id, customer_name='Test Customer', total_amount=400,
+                        created_at=datetime(2020, 6, day, 12))
+            db.session.add(bill)
+            db.session.flush()
+            db.session.add(BillItem(bill_id=bill.id, item_id=item_id, quantity=4 if day > 20 else 50, price=100))
+        db.session.commit()
+        rebuild_sales_rollups()
+        assert app_module.compute_replenishment(today=today, window_days=10) == (2, 1)
+        busy = db.session.get(app_module.ItemReplenishment, item_id)
+        assert (busy.avg_daily_demand, busy.demand_std, busy.days_of_cover) == (2.0, 2.0, 2.5)
+        # Lead time demand 4 plus safety stock 2 * sqrt(2); order up to 7 days of demand plus safety stock
+        assert (busy.reorder_point, busy.order_up_to, busy.suggested_quantity) == (7, 17, 12)
+        idle = db.session.get(app_module.ItemReplenishment, idle_id)
+        assert (idle.avg_daily_demand, idle.days_of_cover, idle.suggested_quantity) == (0.0, None, 0)
+
+    # The dashboard compares live stock against the stored reorder points
+    page = client.get('/').data
+    assert b'Items to Reorder' in page and b'<td>Test Item</td>' in page and b'<td>12</td>' in page
+    assert b'Idle Item' not in page
+    client.post('/create_bill', data={'customer_id': customer_id, 'payment_mode': 'cash',
+                                      'items[]': [str(item_id)], 'quantities[]': ['2']})
+    assert b'<td>14</td>' in client.get('/').data
+
+    history = app_module.replenishment.DemandHistory([3, 7], days=4)
+    history.add([7, 9, 3, 7], [2, 5, 1, 6], [4, 25, 1, 36])
+    assert history.mean().tolist() == [0.25, 2.0] and history.std().tolist()[1] == pytest.approx(6 ** 0.5)
+
+def test_reference_cache_is_invalidated_across_workers(client, monkeypatch):
+    shared = LocalStore()
+    worker_a, worker_b = TieredCache(shared), TieredCache(shared)
+    monkeypatch.setattr(app_module, 'reference_cache', worker_a)
+    client.post('/settings', data={'company_name': 'First Traders'})
+    with app.test_request_context():
+        assert current_settings()['company_name'] == 'First Traders'
+
+    # Worker B finds worker A's entry in the shared tier, then changes the settings
+    monkeypatch.setattr(app_module, 'reference_cache', worker_b)
+    with app.test_request_context():
+        assert worker_b.get('settings', app_module.reference_versions()['settings'], lambda: pytest.fail()) \
+            == current_settings()
+    client.post('/settings', data={'company_name': 'Second Traders'})
+
+    # Worker A still holds the old value locally but sees the new version on its next read
+    monkeypatch.setattr(app_module, 'reference_cache', worker_a)
+    with app.test_request_context():
+        assert current_settings()['company_name'] == 'Second Traders'
+
+    # Dropdown lists follow item and customer writes; sales leave them cached but the form shows live stock
+    customer, item = add_customer_and_item(client, stock=10)
+    customer_id, item_id = customer.id, item.id
+    assert b'data-stock="10"' in client.get('/create_bill').data
+    with app.app_context():
+        items_version = app_module.cache_version('items')
+    client.post('/create_bill', data={'customer_id': customer_id, 'payment_mode': 'cash',
+                                      'items[]': [str(item_id)], 'quantities[]': ['3']})
+    assert b'data-stock="7"' in client.get('/create_bill').data
+    with app.app_context():
+        assert app_module.cache_version('items') == items_version
+        bill_id = Bill.query.one().id
+    assert b'data-stock="7"' in client.get(f'/edit_bill/{bill_id}').data
+    client.post(f'/edit_item/{item_id}', data={'name': 'Renamed Item', 'description': '', 'price': 100,
+                                              'stock': 7, 'hsn_sac_number': '1234', 'tax_rate': 18})
+    assert b'Renamed Item' in client.get('/create_bill').data
+    client.post(f'/edit_customer/{customer_id}', data={'name': 'Renamed Customer', 'phone': '1', 'email': '',
+                                                        'address': '', 'gstin': ''})
+    assert b'Renamed Customer' in client.get('/quotations').data
+
+def count_statements(action):
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    with app.app_context():
+        engine = db.engine
+    db.event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = action()
+    finally:
+        db.event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code in (200, 302), response.status_code
+    return len(statements)
+
+def test_bill_and_quotation_views_run_constant_queries(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'directory', str(tmp_path))
+    customer, _ = add_customer_and_item(client, stock=1000)
+    customer_id = customer.id
+    with app.app_context():
+        db.session.bulk_insert_mappings(Item, [{'name': f'Item {n}', 'price': 10, 'stock': 1000, 'tax_rate': 5}
+                                               for n in range(300)])
+        db.session.commit()
+        item_ids = [item_id for (item_id,) in db.session.query(Item.id).order_by(Item.id)]
+
+    def make_bill(lines):
+        client.post('/create_bill', data={'customer_id': customer_id, 'payment_mode': 'cash',
+                                          'items[]': [str(item_id) for item_id in item_ids[:lines]],
+                                          'quantities[]': ['1'] * lines})
+        with app.app_context():
+            return db.session.query(db.func.max(Bill.id)).scalar()
+
+    def quote(lines):
+        return client.post('/quotations', data={'customer_id': customer_id, 'valid_until': '2099-12-31',
+                                                'items[]': [str(item_id) for item_id in item_ids[:lines]],
+                                                'quantities[]': ['1'] * lines, 'prices[]': ['10'] * lines})
+
+    counts = {}
+    for lines in (1, 3, 300):  # the first round warms the reference data cache
+        bill_id = make_bill(lines)
+        counts[lines] = [
+            count_statements(lambda: client.get(f'/view_bill/{bill_id}')),
+            count_statements(lambda: client.get(f'/download_bill/{bill_id}')),
+            count_statements(lambda: client.get(f'/edit_bill/{bill_id}')),
+            count_statements(lambda: quote(lines)),
+        ]
+    assert counts[3] == counts[300]
+
+    # A customer with bills is refused with an EXISTS check instead of loading every bill
+    assert count_statements(lambda: client.get(f'/delete_customer/{customer_id}')) <= 2
+    with app.app_context():
+        assert Customer.query.get(customer_id) is not None
+
+def test_sql_instrumentation_reports_timing_and_slow_queries(client, monkeypatch, caplog):
+    add_customer_and_item(client)
+    response = client.get('/api/items')
+    timings = response.headers.getlist('Server-Timing')
+    db_timing = next(timing for timing in timings if timing.startswith('db;'))
+    assert re.match(r'db;desc="[1-9]\d* queries";dur=\d+\.\d$', db_timing)
+    assert any(timing.startswith('app;dur=') for timing in timings)
+    assert b'id="sql-debug"' not in client.get('/').data
+
+    monkeypatch.setitem(app.config, 'SQL_DEBUG_TOOLBAR', True)
+    assert re.search(rb'id="sql-debug".*?\d+ queries', client.get('/').data, re.S)
+
+    monkeypatch.setitem(app.config, 'SLOW_QUERY_MS', 1e-6)
+    with caplog.at_level('WARNING', logger='erp.slow_queries'):
+        client.get('/customers', query_string={'search': 'Test'})
+    logged = '\n'.join(record.getMessage() for record in caplog.records)
+    assert 'Slow query' in logged and 'in customers:' in logged
+    assert "parameters: ('" in logged
+    assert 'plan:' in logged and 'customer_search' in logged
+
+def test_metrics_endpoint_reports_requests_renders_and_imports(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, 'directory', str(tmp_path))
+    customer, item = add_customer_and_item(client)
+    client.post('/create_bill', data={'customer_id': customer.id, 'payment_mode': 'cash',
+                                      'items[]': [str(item.id)], 'quantities[]': ['1']})
+    with app.app_context():
+        bill_id = Bill.query.first().id
+    client.get(f'/download_bill/{bill_id}')
+    client.post('/import_items', data={'file': (io.BytesIO(b'name,description,price,stock\nBolt,M6,2,100\n'),
+                                                'items.csv')}, content_type='multipart/form-data')
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'erp_http_requests_total{endpoint="download_bill",method="GET",status="200"}' in body
+    assert 'erp_http_request_duration_seconds_bucket{endpoint="download_bill",le="+Inf"}' in body
+    assert 'erp_http_response_size_bytes_count{endpoint="download_bill"}' in body
+    assert 'erp_pdf_render_seconds_count{kind="invoice"}' in body
+    assert re.search(r'^erp_import_rows_total\{result="added"\} [1-9]', body, re.M)
+    assert 'erp_db_pool_checked_out' in body
+
+def test_metrics_aggregate_across_worker_processes(tmp_path):
+    worker = (
+        "from app import app\n"
+        "client = app.test_client()\n"
+        "client.get('/metrics')\n"
+        "client.get('/metrics')\n"
+    )
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), DATABASE_URL='sqlite://')
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', worker], env=env, cwd=os.path.dirname(__file__), check=True)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+    assert registry.get_sample_value('erp_http_requests_total',
+                                     {'endpoint': 'prometheus_metrics', 'method': 'GET', 'status': '200'}) == 4
+
+def test_seed_generates_reproducible_consistent_data(client):
+    def seed_and_fingerprint():
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seed_database(items=20, customers=30, bills=300, max_lines=8, quotations=25, days=90, seed=7,
+                          anchor=datetime(2025, 3, 1))
+            assert (Item.query.count(), Customer.query.count(), Bill.query.count(), Quotation.query.count()) \
+                == (20, 30, 300, 25)
+            assert 1 <= db.session.query(db.func.count(BillItem.id)).group_by(BillItem.bill_id)\
+                .order_by(db.func.count(BillItem.id).desc()).first()[0] <= 8
+            assert db.session.query(db.func.count(db.distinct(Bill.invoice_number))).scalar() == 300
+            assert db.session.query(db.func.sum(MonthlySales.bill_count)).scalar() == 300
+            assert round(db.session.query(db.func.sum(MonthlySales.total_amount)).scalar(), 2) \
+                == round(db.session.query(db.func.sum(Bill.total_amount)).scalar(), 2)
+            return [(bill.invoice_number, bill.customer_name, bill.total_amount, bill.created_at)
+                    for bill in Bill.query.order_by(Bill.id).limit(50)]
+
+    assert seed_and_fingerprint() == seed_and_fingerprint()
+
+    # The app keeps working on seeded data: numbering continues after the seeded invoices
+    with app.app_context():
+        customer_id, item_id = Customer.query.first().id, Item.query.order_by(Item.stock.desc()).first().id
+    client.post('/create_bill', data={'customer_id': customer_id, 'payment_mode': 'cash',
+                                      'items[]': [str(item_id)], 'quantities[]': ['1']})
+    with app.app_context():
+        assert Bill.query.count() == 301
+
+def test_bill_lines_are_claimed_once(client, tmp_path, monkeypatch):
+    # Interleavings are simulated in sequence here; benchmarks/stress.py drives real concurrent requests
+    monkeypatch.setattr(pdf_cache, 'directory', str(tmp_path))
+    customer, item = add_customer_and_item(client, stock=10)
+    customer_id, item_id = customer.id, item.id
+    client.post('/create_bill', data={'customer_id': customer_id, 'payment_mode': 'cash',
+                                      'items[]': [str(item_id)], 'quantities[]': ['4']})
+    with app.app_context():
+        bill = Bill.query.first()
+        assert len(bill.items) == 1
+        # Another request deletes the bill's lines after this one read them
+        db.session.execute(BillItem.__table__.delete())
+        assert claim_bill_lines(bill) is None
+        db.session.rollback()
+
+        bill = Bill.query.first()
+        assert claim_bill_lines(bill) == {item_id: 4}
+        db.session.rollback()
+
+    # Only the first download of an unprocessed bill takes stock (again, as downloads always have)
+    with app.app_context():
+        bill_id = Bill.query.first().id
+    client.get(f'/download_bill/{bill_id}')
+    client.get(f'/download_bill/{bill_id}')
+    with app.app_context():
+        assert db.session.get(Item, item_id).stock == 2
+    client.post(f'/delete_bill/{bill_id}')
+    with app.app_context():
+        assert Bill.query.count() == 1 and db.session.get(Item, item_id).stock == 2
+
+def test_file_sqlite_runs_in_wal_mode_with_a_connection_pool(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'erp.db'}")
+    with app.app_context():
+        assert type(db.engine.pool).__name__ == 'QueuePool'
+        assert db.engine.pool.size() == app.config['DB_POOL_SIZE']
+        db.create_all()
+        pragma = lambda name: db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT_MS']
+        assert pragma('cache_size') == -app.config['SQLITE_CACHE_SIZE_KIB']
+        assert pragma('mmap_size') == app.config['SQLITE_MMAP_SIZE']
+        db.session.add(Item(name='Pooled', price=1, stock=1))
+        db.session.commit()
+        db.session.remove()
+
+    result = app.test_cli_runner().invoke(args=['maintain-database'])
+    assert result.exit_code == 0, result.output
+    assert 'frames written back' in result.output and 'Planner statistics refreshed' in result.output
+    assert os.path.getsize(tmp_path / 'erp.db-wal') == 0
+    with app.app_context():
+        assert db.session.execute(db.text("SELECT count(*) FROM sqlite_stat1 WHERE tbl = 'item'")).scalar() > 0
+        db.engine.dispose()
+
+def test_reporting_routes_read_from_replica_with_fallback(client, tmp_path, monkeypatch):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{primary}')
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_BINDS', {'replica': f'sqlite:///{replica}'})
+    monkeypatch.setitem(app_module._replica_state, 'down_until', 0.0)
+    with app.app_context():
+        db.create_all()
+    assert not replica.exists()
+
+    writer = app.test_client()
+    writer.post('/add_item', data={'name': 'Replicated', 'description': '', 'price': 1, 'stock': 5,
+                                      'hsn_sac_number': '', 'tax_rate': 0})
+    # Stand-in for replication: the replica is a copy of the primary that then falls behind
+    with sqlite3.connect(primary) as source, sqlite3.connect(replica) as target:
+        source.backup(target)
+    writer.post('/add_item', data={'name': 'Not Yet Replicated', 'description': '', 'price': 1, 'stock': 5,
+                                      'hsn_sac_number': '', 'tax_rate': 0})
+
+    reader = app.test_client()
+    body = reader.get('/export/inventory').get_data(as_text=True)
+    assert 'Replicated' in body and 'Not Yet Replicated' not in body
+    assert reader.get('/').status_code == 200
+    assert reader.get('/api/product_sales/1', query_string={'summary': '1'}).get_json()['bill_count'] == 0
+    # The client that just wrote reads its own writes from the primary
+    assert 'Not Yet Replicated' in writer.get('/export/inventory').get_data(as_text=True)
+    # Pages that aren't replica-routed, and all writes, use the primary
+    assert b'Not Yet Replicated' in reader.get('/api/items').data
+    with sqlite3.connect(replica) as conn:
+        assert conn.execute('SELECT count(*) FROM item').fetchone()[0] == 1
+
+    with app.app_context():
+        db.get_engine(app, bind='replica').dispose()
+    replica.unlink()
+    assert 'Not Yet Replicated' in reader.get('/export/inventory').get_data(as_text=True)
+    assert app_module._replica_state['down_until'] > time.monotonic() and not replica.exists()
+    with app.app_context():
+        db.engine.dispose()
+
+def test_invoice_numbers_come_from_counter_and_never_repeat(client):
+    customer, item = add_customer_and_item(client, stock=100)
+
+    def create_bill():
+        client.post('/create_bill', data={
+            'customer_id': customer.id,
+            'payment_mode': 'cash',
+            'items[]': [str(item.id)],
+            'quantities[]': ['1']
+        })
+        return Bill.query.order_by(Bill.id.desc()).first()
+
+    first, second = create_bill(), create_bill()
+    prefix = first.invoice_number.rsplit('-', 1)[0]
+    assert first.invoice_number == f'{prefix}-1'
+    assert second.invoice_number == f'{prefix}-2'
+
+    # Deleting a bill used to make the next count-based number collide
+    client.post(f'/delete_bill/{second.id}')
+    assert create_bill().invoice_number == f'{prefix}-3'
+    assert DocumentSequence.query.filter_by(series='SQE').one().last_value == 3
+
+    # A period without a counter row continues after numbers already issued
+    now = datetime(2030, 1, 15)
+    db.session.add(Bill(customer_name='Legacy', invoice_number='SQE-2030-01-7', total_amount=0))
+    db.session.commit()
+    assert next_invoice_number(now) == 'SQE-2030-01-8'
+    assert next_invoice_number(now) == 'SQE-2030-01-9'
+
+def explain(query):
+    """SQLite query plan details for an ORM query."""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), tuple(params)).fetchall()
+    return [row[-1] for row in rows]
+
+def test_hot_queries_use_indexes(client):
+    start, end = datetime(2026, 1, 1), datetime(2026, 1, 31)
+    plans = {
+        'ix_bill_created_at_id': filter_date_range(Bill.query, Bill.created_at, start, end)
+            .order_by(Bill.created_at.desc(), Bill.id.desc()).limit(51),
+        'ix_bill_customer_id_created_at': Bill.query.filter(Bill.customer_id == 1)
+            .order_by(Bill.created_at.desc()),
+        'ix_bill_item_bill_id': BillItem.query.filter(BillItem.bill_id == 1),
+        'ix_bill_item_item_id': db.session.query(BillItem, Bill).join(Bill, BillItem.bill_id == Bill.id)
+            .filter(BillItem.item_id == 1),
+        'ix_quotation_item_item_id': QuotationItem.query.filter(QuotationItem.item_id == 1),
+        'ix_item_stock': db.session.query(db.func.count(Item.id)).filter(Item.stock < 10),
+        'ix_item_name_id': Item.query.order_by(Item.name, Item.id).limit(51),
+        'uq_bill_invoice_number': Bill.query.filter(Bill.invoice_number == 'SQE-2026-01-1'),
+    }
+    for index, query in plans.items():
+        plan = explain(query)
+        assert any(index in step for step in plan), f'{index} not used: {plan}'
+        # No step may fall back to a full table scan
+        assert all('INDEX' in step for step in plan if step.startswith('SCAN')), plan
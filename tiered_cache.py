@@ -0,0 +1,176 @@
+"""Two-tier cache for reference data (settings, catalog, customer lists).
+
+Values are cached under a name and a version supplied by the caller. The app
+reads versions from its cache_version table, which writers bump in the same
+transaction as their change, so a write in one gunicorn worker invalidates
+every other worker on its next read without any cross-process messaging.
+
+The local tier is a dict per process. The optional shared tier lets workers
+reuse a value another worker already loaded for the current version: a local
+SQLite file (several workers on one host) or Redis. LocalStore stands in for
+either in tests. Values must be JSON-serializable.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStore:
+    """In-process store with per-entry expiry; the stand-in shared tier for tests."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return MISSING
+        return json.loads(entry[0])
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._data = {k: v for k, v in self._data.items() if v[1] >= now}
+            self._data[key] = (json.dumps(value), now + ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
+
+
+class SQLiteStore:
+    """Shared tier in a SQLite file, for the workers of one host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return MISSING
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                     (key, json.dumps(value), now + ttl))
+        conn.execute('DELETE FROM cache WHERE expires < ?', (now,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class RedisStore:
+    """Shared tier in Redis (or anything speaking its protocol). Requires the redis package.
+
+    Keys are namespaced by `prefix`, so the database can be shared with other apps and clear()
+    only removes this cache's entries.
+    """
+
+    def __init__(self, url, prefix='erp:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return MISSING if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, json.dumps(value), ex=max(int(ttl), 1))
+
+    def clear(self):
+        keys = []
+        for key in self._client.scan_iter(match=self.prefix + '*', count=500):
+            keys.append(key)
+            if len(keys) == 500:
+                self._client.delete(*keys)
+                keys = []
+        if keys:
+            self._client.delete(*keys)
+
+
+def store_from_url(url, prefix='erp:'):
+    """'' for no shared tier, 'memory://', 'sqlite:///path/to/cache.db' or 'redis://host:port/db'.
+
+    `prefix` namespaces the keys in Redis; the other stores are private to the cache.
+    """
+    if not url:
+        return None
+    if url.startswith('memory://'):
+        return LocalStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url, prefix)
+    raise ValueError(f'Unsupported cache URL: {url}')
+
+
+class TieredCache:
+    def __init__(self, shared=None, ttl=300):
+        self.shared = shared
+        self.ttl = ttl
+        self._local = {}
+
+    def get(self, name, version, loader, ttl=None):
+        """Return the value cached for (name, version), calling loader() on a miss in both tiers."""
+        ttl = ttl or self.ttl
+        entry = self._local.get(name)
+        if entry is not None and entry[0] == version and entry[2] > time.monotonic():
+            return entry[1]
+        key = f'{name}:{version}'
+        value = self._shared_get(key)
+        if value is MISSING:
+            value = loader()
+            self._shared_set(key, value, ttl)
+        self._local[name] = (version, value, time.monotonic() + ttl)
+        return value
+
+    def clear(self):
+        self._local = {}
+        if self.shared is not None:
+            self.shared.clear()
+
+    # The shared tier is an optimisation: if it is unreachable, fall back to loading
+    def _shared_get(self, key):
+        if self.shared is None:
+            return MISSING
+        try:
+            return self.shared.get(key)
+        except Exception:
+            logger.warning('Shared cache read failed for %s', key, exc_info=True)
+            return MISSING
+
+    def _shared_set(self, key, value, ttl):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(key, value, ttl)
+        except Exception:
+            logger.warning('Shared cache write failed for %s', key, exc_info=True)